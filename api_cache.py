@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CACHE_PATH = os.getenv("OPTIONS_API_CACHE", "options_api_cache.sqlite")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 500_000
+DEFAULT_EVICT_INTERVAL_SECONDS = 600
+
+_MISSING = object()
+
+
+def _normalize(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return repr(float(value))
+    return str(value).strip()
+
+
+def request_key(endpoint, args):
+    """
+    Content-addressed key for one API request: sha256 over the endpoint and
+    the normalized argument tuple (sorted by field name).
+    """
+    normalized = [endpoint] + [[k, _normalize(args[k])] for k in sorted(args)]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+class ApiResultCache:
+    """
+    On-disk SQLite cache of options API results keyed by request_key.
+
+    Entries older than ttl_seconds are treated as misses and purged; once the
+    table exceeds max_entries the least recently used entries are dropped.
+    Eviction scans the whole table, so writes only trigger it every
+    evict_interval_seconds or after max_entries / 10 new entries, whichever
+    comes first; in between the table may briefly exceed max_entries.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 evict_interval_seconds=DEFAULT_EVICT_INTERVAL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_interval_seconds = evict_interval_seconds
+        self._evict_every = max(max_entries // 10, 1)
+        self._writes_since_evict = 0
+        self._last_evict = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS api_results (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_api_results_last_access ON api_results (last_access)")
+        self._conn.commit()
+        self.evict()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get_many(self, keys):
+        """
+        Look up keys. Returns a dict of key -> cached value for the live entries found.
+        """
+        found = {}
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM api_results WHERE key IN ({placeholders}) AND created_at >= ?",
+                    [*chunk, cutoff],
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE api_results SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, endpoint, items):
+        """
+        Store (key, value) pairs for endpoint; values must be JSON serializable.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO api_results (key, endpoint, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                [(key, endpoint, json.dumps(value), now, now) for key, value in items],
+            )
+            self._conn.commit()
+            self._writes_since_evict += len(items)
+            due = self._writes_since_evict >= self._evict_every or now - self._last_evict >= self.evict_interval_seconds
+        if due:
+            self.evict()
+
+    def evict(self):
+        """
+        Purge expired entries, then trim least recently used entries above max_entries.
+        """
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM api_results WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM api_results").fetchone()[0]
+            trimmed = 0
+            if count > self.max_entries:
+                trimmed = self._conn.execute(
+                    "DELETE FROM api_results WHERE key IN (SELECT key FROM api_results ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+            self._conn.commit()
+            self._writes_since_evict = 0
+            self._last_evict = time.time()
+        if expired or trimmed:
+            logger.info(f"Evicted {expired} expired and {trimmed} least recently used cache entries")
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def log_stats(self):
+        get_metrics().set_gauge("api_cache_hit_rate", self.hit_rate())
+        logger.info(f"API cache {self.path}: {self.hits} hits, {self.misses} misses (hit rate {self.hit_rate():.1%})")
+
+
+def cached_call(cache, endpoint, rows, fetch):
+    """
+    Resolve rows through the cache, calling fetch(list_of_missing_rows) only for
+    misses. Successful results are written back; exceptions are not cached.
+
+    Returns:
+        list: One entry per row in input order; the result or an exception
+    """
+    if cache is None:
+        return fetch(rows)
+
+    keys = [request_key(endpoint, row) for row in rows]
+    found = cache.get_many(list(dict.fromkeys(keys)))
+
+    missing_positions = [i for i, key in enumerate(keys) if key not in found]
+    fetched = fetch([rows[i] for i in missing_positions]) if missing_positions else []
+
+    results = [found.get(key, _MISSING) for key in keys]
+    to_store = {}
+    for pos, result in zip(missing_positions, fetched):
+        results[pos] = result
+        if not isinstance(result, Exception):
+            to_store[keys[pos]] = result
+    cache.put_many(endpoint, list(to_store.items()))
+
+    get_metrics().inc("api_cache_hits_total", len(rows) - len(missing_positions), endpoint=endpoint)
+    get_metrics().inc("api_cache_misses_total", len(missing_positions), endpoint=endpoint)
+    logger.info(f"{endpoint}: {len(rows) - len(missing_positions)} cached, {len(missing_positions)} fetched")
+    return results
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_api_cache():
+    """
+    Return the process-wide ApiResultCache, opening it on first use.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ApiResultCache()
+        return _default_cache
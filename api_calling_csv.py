@@ -1,51 +1,50 @@
 import requests
 import pandas as pd
 import logging
+from options_api_client import get_options_api_client
 
-# Configure logging for this module
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
-def call_option_api(payloads):
+def call_option_api(payloads, client=None):
     logger.info(f"Starting API calls for {len(payloads)} payloads")
-    base_url = "https://options-api.mosaic.hartreepartners.com/options/api/v1/getPriceVanilla"
+    client = client or get_options_api_client()
     results = []
     
     successful_calls = 0
     failed_calls = 0
 
-    for i, p in enumerate(payloads):
-        logger.info(f"Processing payload {i+1}/{len(payloads)} - exposure: {p.get('exposure', 'N/A')}")
-        
-        url = f"{base_url}/{p['as_of_date']}/{p['expiration_date']}/{p['strike']}/{p['parity']}/{p['future_value']}/{p['ivol']}/{p['rf_rate']}"
+    def _fetch(c, p):
+        logger.debug(f"Making API request for exposure {p.get('exposure', 'N/A')}")
+        return c.get_price_vanilla(
+            p["as_of_date"], p["expiration_date"], p["strike"], p["parity"],
+            p["future_value"], p["ivol"], p["rf_rate"], scheme=p["scheme"], model=p["model"]
+        )
+
+    responses = client.map(_fetch, payloads)
+
+    for i, (p, response) in enumerate(zip(payloads, responses)):
+        logger.debug(f"Processing payload {i+1}/{len(payloads)} - exposure: {p.get('exposure', 'N/A')}")
         params = {
             "scheme": p["scheme"],
             "model": p["model"]
         }
-        
-        logger.debug(f"API URL: {url}")
-        logger.debug(f"API params: {params}")
 
         try:
-            logger.info(f"Making API request for exposure {p.get('exposure', 'N/A')}")
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            
-            result_data = response.json()
+            if isinstance(response, Exception):
+                raise response
+
+            result_data = response
             result_data["exposure"] = p["exposure"]
             results.append(result_data)
             successful_calls += 1
             
-            logger.info(f"Successfully received API response for exposure {p['exposure']}")
+            logger.debug(f"Successfully received API response for exposure {p['exposure']}")
             logger.debug(f"Response data keys: {list(result_data.keys())}")
             
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed for exposure {p.get('exposure', 'N/A')}: {str(e)}")
-            logger.error(f"URL: {url}")
+            logger.error(f"Payload: {p}")
             logger.error(f"Params: {params}")
             
             error_result = {
@@ -1,201 +1,260 @@
-import pandas as pd
 import logging
 
-# Configure logging for this module
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-
-
+import numpy as np
+import pandas as pd
 
-import requests
-import time
-import urllib3
+from api_cache import cached_call, get_api_cache
+from options_api_client import TransientApiError, get_options_api_client, is_transient_error
+from pricing_models import implied_vol, year_fraction, parity_to_is_call, price_vanilla
+from request_batch import build_ivol_requests, build_price_requests
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+logger = logging.getLogger(__name__)
 
 
-def call_ivol_api_and_add_to_df(df, as_of_date="2025-07-21", scheme="American", model="BSM", sleep_between=0.1):
-    df = df.copy()
-    ivols = []
+IVOL_BACKENDS = ("remote", "local")
+PRICING_BACKENDS = ("remote", "local")
+GREEK_COLUMNS = ["delta", "gamma", "vega", "theta"]
+DEFAULT_RF_RATE = 0.0434
+
+
+def fill_default_rf_rate(df):
+    """
+    Replace null or zero rf_rate values with DEFAULT_RF_RATE.
+
+    The column is replaced as a whole rather than written into, so on a
+    shallow copy of a frame the caller's rf_rate stays untouched.
+
+    Returns:
+        tuple: (null_count, zero_count) before replacement
+    """
+    rf_rate = df["rf_rate"]
+    null = rf_rate.isnull()
+    zero = rf_rate == 0.0
+    df["rf_rate"] = rf_rate.mask(null | zero, DEFAULT_RF_RATE)
+    return null.sum(), zero.sum()
+
+
+def _compute_ivol_local(batch):
+    """
+    Solve implied vols for every request in the batch in-process with the local pricing engine.
+    Rows with no attainable vol come back as NaN, like failed API rows.
+    """
+    r = batch.records
+    ivols = implied_vol(
+        price=r["value"],
+        F=r["future_value"],
+        K=r["strike"],
+        T=year_fraction(batch.as_of_date, r["expiry"]),
+        r=r["rf_rate"],
+        is_call=parity_to_is_call(r["parity"]),
+        scheme=batch.scheme,
+        model=batch.model,
+    )
+    failed = np.isnan(ivols).sum()
+    if failed > 0:
+        logger.warning(f"Local ivol solver found no solution for {failed} rows")
+    return ivols
+
+
+def _raise_on_transient_failures(endpoint, responses):
+    transient = sum(1 for result in responses if isinstance(result, Exception) and is_transient_error(result))
+    if transient:
+        raise TransientApiError(f"{transient} of {len(responses)} {endpoint} requests failed with retryable errors")
+
+
+def call_ivol_api_and_add_to_df(df, as_of_date="2025-07-21", scheme="American", model="BSM", backend="remote", client=None, batch_size=None, batch_format="json", use_cache=True, raise_on_transient=False):
+    if backend not in IVOL_BACKENDS:
+        raise ValueError(f"Unknown ivol backend '{backend}', expected one of {IVOL_BACKENDS}")
+
+    # Only whole columns are replaced or added below, so a shallow copy keeps the caller's frame intact
+    df = df.copy(deep=False)
 
     logger.info("STEP: Cleaning rf_rate column")
 
     # Step 1: Clean rf_rate
-    null_rf_rate_count = df["rf_rate"].isnull().sum()
-    zero_rf_rate_count = (df["rf_rate"] == 0.0).sum()
+    null_rf_rate_count, zero_rf_rate_count = fill_default_rf_rate(df)
     logger.info(f"Rows with null rf_rate: {null_rf_rate_count}")
     logger.info(f"Rows with zero rf_rate: {zero_rf_rate_count}")
 
-    df["rf_rate"] = df["rf_rate"].fillna(0.0434)
-    df.loc[df["rf_rate"] == 0.0, "rf_rate"] = 0.0434
-
     replaced_rf_rate_count = null_rf_rate_count + zero_rf_rate_count
     if replaced_rf_rate_count > 0:
-        logger.info(f"Replaced {replaced_rf_rate_count} null/zero rf_rate values with 0.0434")
+        logger.info(f"Replaced {replaced_rf_rate_count} null/zero rf_rate values with {DEFAULT_RF_RATE}")
+
+    # Step 2: Validate and format request columns once per column
+    batch, rejections = build_ivol_requests(df, as_of_date, scheme, model)
+    ivols = np.full(len(df), np.nan)
+    # Solve each distinct contract once and broadcast back through inverse
+    contracts, inverse = batch.deduplicate()
+    logger.info(f"{len(contracts)} distinct contracts for {len(batch)} rows")
+
+    if backend == "local":
+        logger.info(f"STEP: Solving implied vols locally for {len(contracts)} contracts")
+        ivols[batch.records["row"]] = _compute_ivol_local(contracts)[inverse]
+        df["computed_ivol"] = ivols
+        return df
+
+    logger.info(f"STEP: Calling getIVol API for {len(contracts)} contracts")
+    client = client or get_options_api_client()
+
+    def _fetch(rows):
+        if batch_size:
+            logger.info(f"Sending {len(rows)} getIVol requests in batches of {batch_size}")
+            return client.get_ivol_batch(rows, chunk_size=batch_size, fmt=batch_format)
+        return client.map(lambda c, row: c.get_ivol(**row), rows)
+
+    cache = get_api_cache() if use_cache else None
+    responses = cached_call(cache, "getIVol", contracts.to_request_args(), _fetch)
+    if raise_on_transient:
+        _raise_on_transient_failures("getIVol", responses)
+    responses = [responses[i] for i in inverse]
+
+    for idx, pos, result in zip(batch.index, batch.records["row"], responses):
+        if isinstance(result, Exception):
+            logger.warning(f"Row {idx} failed: {result}")
+        else:
+            ivols[pos] = result
 
-    logger.info("STEP: Calling getIVol API row-by-row")
+    df["computed_ivol"] = ivols
+    return df
 
-    base_url = "https://options-api.mosaic.hartreepartners.com/options/api/v1/getIVol"
 
-    for idx, row in df.iterrows():
-        try:
-            # Check for required fields
-            required_fields = ["option_expiry", "strike", "option_type", "future_value", "market_price", "rf_rate"]
-            missing_fields = [f for f in required_fields if pd.isnull(row.get(f))]
-
-            if missing_fields:
-                logger.warning(f"Row {idx} skipped due to missing fields: {missing_fields}")
-                ivols.append(None)
-                continue
-
-            # Format expiration date as Y-M-D (no leading zeros)
-            expiry = pd.to_datetime(row["option_expiry"])
-            expiration_date = f"{expiry.year}-{expiry.month}-{expiry.day}"
-
-            # Prepare inputs
-            strike = float(row["strike"])
-            parity = str(row["option_type"]).capitalize()
-            future_value = float(row["future_value"])
-            value = float(row["market_price"])
-            rf_rate = float(row["rf_rate"])
-
-            # Construct URL
-            url = f"{base_url}/{as_of_date}/{expiration_date}/{strike}/{parity}/{future_value}/{value}/{rf_rate}"
-            params = {
-                "scheme": scheme,
-                "model": model
-            }
-
-            logger.debug(f"Row {idx} → URL: {url} with params {params}")
-
-            # Make the request (SSL verification disabled for internal certs)
-            response = requests.get(url, params=params, verify=False)
-            response.raise_for_status()
-
-            # Parse response
-            ivol = float(response.text)
-            ivols.append(ivol)
+def compare_ivol_backends(df, as_of_date="2025-07-21", scheme="American", model="BSM", tolerance=1e-4, client=None):
+    """
+    Run both ivol backends on the same rows and report how far the local solver is from the remote service.
 
-        except Exception as e:
-            logger.warning(f"Row {idx} failed: {e}")
-            ivols.append(None)
+    Parameters:
+        df (pd.DataFrame): Positions with the getIVol input columns
+        tolerance (float): Maximum absolute ivol difference counted as a match
 
-        time.sleep(sleep_between)
+    Returns:
+        pd.DataFrame: One row per input row with remote_ivol, local_ivol, abs_diff and within_tolerance
+    """
+    remote = call_ivol_api_and_add_to_df(df, as_of_date, scheme, model, backend="remote", client=client)
+    local = call_ivol_api_and_add_to_df(df, as_of_date, scheme, model, backend="local")
 
-    df["computed_ivol"] = ivols
-    return df
+    report = remote.drop(columns=["computed_ivol"])
+    report["remote_ivol"] = pd.to_numeric(remote["computed_ivol"], errors="coerce")
+    report["local_ivol"] = pd.to_numeric(local["computed_ivol"], errors="coerce")
+    report["abs_diff"] = (report["remote_ivol"] - report["local_ivol"]).abs()
+    report["within_tolerance"] = report["abs_diff"] <= tolerance
 
+    both = report["remote_ivol"].notna() & report["local_ivol"].notna()
+    only_remote = report["remote_ivol"].notna() & report["local_ivol"].isna()
+    only_local = report["remote_ivol"].isna() & report["local_ivol"].notna()
+    logger.info(f"IVOL backend comparison ({scheme}, tolerance {tolerance}):")
+    logger.info(f"  - Rows solved by both: {both.sum()}")
+    logger.info(f"  - Within tolerance: {report['within_tolerance'].sum()}")
+    logger.info(f"  - Max abs diff: {report['abs_diff'].max()}")
+    logger.info(f"  - Mean abs diff: {report['abs_diff'].mean()}")
+    logger.info(f"  - Solved only remotely: {only_remote.sum()}, only locally: {only_local.sum()}")
+    return report
 
 
+def _payloads_from_batch(batch, df, request_args):
+    positions = batch.records["row"]
+    exposures = df["exposure"].to_numpy()[positions].tolist() if "exposure" in df.columns else [None] * len(batch)
+    return [dict(args, exposure=exposure) for args, exposure in zip(request_args, exposures)]
 
-import pandas as pd
-import requests
-import time
-import logging
 
-logger = logging.getLogger(__name__)
+def price_payloads(df, as_of_date="2025-07-21", scheme="American", model="BSM"):
+    """
+    Rebuild the getPriceVanilla payloads for already priced rows (e.g. a checkpointed
+    transform_to_option_api_payloads output) without calling the API again.
+    """
+    batch, _ = build_price_requests(df, as_of_date, scheme, model)
+    return _payloads_from_batch(batch, df, batch.to_request_args())
+
+
+def transform_to_option_api_payloads(df, as_of_date="2025-07-21", scheme="American", model="BSM", output_csv="option_price_results_American.csv", backend="remote", client=None, batch_size=None, batch_format="json", use_cache=True, raise_on_transient=False):
+    if backend not in PRICING_BACKENDS:
+        raise ValueError(f"Unknown pricing backend '{backend}', expected one of {PRICING_BACKENDS}")
 
-def transform_to_option_api_payloads(df, as_of_date="2025-07-21", scheme="American", model="BSM", output_csv="option_price_results_American.csv"):
     logger.info("Starting transformation of DataFrame to option API payloads")
     logger.info(f"Input DataFrame shape: {df.shape}")
     logger.info(f"Parameters - as_of_date: {as_of_date}, scheme: {scheme}, model: {model}")
     
-    df = df.copy()
-    
-    # Filter out rows with missing future_value
+    # Rows with missing future_value are rejected with the request batch below;
+    # the frame is only shallow-copied and taken once, for the accepted rows
     null_future_value_count = df["future_value"].isnull().sum()
     logger.info(f"Rows with null future_value: {null_future_value_count}")
-    df = df[df["future_value"].notnull()]
     
-    if df.empty:
+    if null_future_value_count == len(df):
         logger.warning("No rows remaining after filtering null future_value!")
-        return [], df
+        return [], df.iloc[0:0]
+    df = df.copy(deep=False)
     
     # Replace missing or zero rf_rate
-    null_rf_rate_count = df["rf_rate"].isnull().sum()
-    zero_rf_rate_count = (df["rf_rate"] == 0.0).sum()
-    df["rf_rate"] = df["rf_rate"].fillna(0.0434)
-    df.loc[df["rf_rate"] == 0.0, "rf_rate"] = 0.0434
-    logger.info(f"Replaced {null_rf_rate_count + zero_rf_rate_count} null/zero rf_rate values with 0.0434")
+    null_rf_rate_count, zero_rf_rate_count = fill_default_rf_rate(df)
+    logger.info(f"Replaced {null_rf_rate_count + zero_rf_rate_count} null/zero rf_rate values with {DEFAULT_RF_RATE}")
     
-    payloads = []
-    successful_transformations = 0
-    failed_transformations = 0
-
-    logger.info(f"Starting row-by-row payload creation for {len(df)} rows")
+    # Validate and format request columns once per column
+    logger.info(f"Starting payload creation for {len(df)} rows")
+    batch, rejections = build_price_requests(df, as_of_date, scheme, model)
+    logger.info(f"Payload creation completed: {len(batch)} successful, {len(rejections)} failed")
+
+    positions = batch.records["row"]
+    request_args = batch.to_request_args()
+    payloads = _payloads_from_batch(batch, df, request_args)
+    df = df.take(positions)
+    # Price each distinct contract once and broadcast back through inverse
+    contracts, inverse = batch.deduplicate()
+    logger.info(f"{len(contracts)} distinct contracts for {len(batch)} rows")
+
+    if backend == "local":
+        logger.info(f"Pricing {len(contracts)} contracts locally ({scheme})")
+        r = contracts.records
+        priced = price_vanilla(
+            strike=r["strike"],
+            parity=r["parity"],
+            future_value=r["future_value"],
+            ivol=r["value"],
+            rf_rate=r["rf_rate"],
+            expiry=r["expiry"],
+            as_of_date=as_of_date,
+            scheme=scheme,
+            model=model,
+        )
+        df["computed_value"] = priced["price"].to_numpy()[inverse]
+        for col in GREEK_COLUMNS:
+            df[col] = priced[col].to_numpy()[inverse]
+
+        if output_csv:
+            df.to_csv(output_csv, index=False)
+            logger.info(f"Saved results with computed option prices and greeks to {output_csv}")
+        return payloads, df
 
-    for idx, row in df.iterrows():
-        try:
-            # Validate required fields
-            required_fields = ["option_expiry", "strike", "option_type", "future_value", "computed_ivol", "rf_rate"]
-            missing_fields = [f for f in required_fields if pd.isnull(row.get(f))]
-            if missing_fields:
-                logger.warning(f"Row {idx} skipped due to missing fields: {missing_fields}")
-                failed_transformations += 1
-                continue
-
-            # Format expiration date as YYYY-M-D
-            expiry = pd.to_datetime(row["option_expiry"])
-            expiration_date = f"{expiry.year}-{expiry.month}-{expiry.day}"
-
-            payload = {
-                "as_of_date": as_of_date,
-                "expiration_date": expiration_date,
-                "strike": float(row["strike"]),
-                "parity": str(row["option_type"]).capitalize(),
-                "future_value": float(row["future_value"]),
-                "ivol": float(row["computed_ivol"]),
-                "rf_rate": float(row["rf_rate"]),
-                "scheme": scheme,
-                "model": model,
-                "exposure": row.get("exposure")
-            }
-
-            payloads.append(payload)
-            successful_transformations += 1
-        except Exception as e:
-            logger.error(f"Failed to transform row {idx}: {str(e)}")
-            failed_transformations += 1
-
-    logger.info(f"Payload creation completed: {successful_transformations} successful, {failed_transformations} failed")
-    
     # Step 2: Call API for each payload
     logger.info("Starting option pricing API calls...")
-    base_url = "https://options-api.mosaic.hartreepartners.com/options/api/v1/getPriceVanilla"
-    computed_values = []
-
-    for idx, p in enumerate(payloads):
+    client = client or get_options_api_client()
+
+    def _fetch(rows):
+        if batch_size:
+            logger.info(f"Sending {len(rows)} getPriceVanilla requests in batches of {batch_size}")
+            return client.get_price_vanilla_batch(rows, chunk_size=batch_size, fmt=batch_format)
+        return client.map(lambda c, row: c.get_price_vanilla(**row), rows)
+
+    cache = get_api_cache() if use_cache else None
+    responses = cached_call(cache, "getPriceVanilla", contracts.to_request_args(), _fetch)
+    if raise_on_transient:
+        _raise_on_transient_failures("getPriceVanilla", responses)
+    responses = [responses[i] for i in inverse]
+
+    # df holds the accepted rows only, in batch order; failed rows stay NaN
+    computed_values = np.full(len(df), np.nan)
+    for idx, result in enumerate(responses):
         try:
-            url = f"{base_url}/{p['as_of_date']}/{p['expiration_date']}/{p['strike']}/{p['parity']}/{p['future_value']}/{p['ivol']}/{p['rf_rate']}"
-            params = {
-                "scheme": p["scheme"],
-                "model": p["model"]
-            }
-            response = requests.get(url, params=params, verify=False)
-            response.raise_for_status()
-
-            # ✅ FIXED: parse JSON and extract price
-            response_json = response.json()
-            price = float(response_json["price"])
-
-            computed_values.append(price)
-            logger.debug(f"Row {idx}: Option price = {price}")
-
+            if isinstance(result, Exception):
+                raise result
+            computed_values[idx] = float(result["price"])
+            logger.debug(f"Row {idx}: Option price = {computed_values[idx]}")
         except Exception as e:
             logger.warning(f"Row {idx}: Failed to get price: {str(e)}")
-            computed_values.append(None)
-
-        time.sleep(0.1)  # Throttle
 
-    df = df.iloc[:len(computed_values)].copy()
     df["computed_value"] = computed_values
 
     # Save to CSV
-    df.to_csv(output_csv, index=False)
-    logger.info(f"Saved results with computed option prices to {output_csv}")
+    if output_csv:
+        df.to_csv(output_csv, index=False)
+        logger.info(f"Saved results with computed option prices to {output_csv}")
 
     return payloads, df
@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import pandas as pd
+
+import connections
+import mapping_registry
+from expiry_index import load_expiries
+from get_data import get_data
+from mapping_registry import get_mapping_registry
+from option_main import options_main
+from storage import STORAGE_ROOT
+
+logger = logging.getLogger(__name__)
+
+
+CHECKPOINT_DIR = os.path.join(STORAGE_ROOT, "_backfill")
+
+# Shared per-worker state, set once by _init_worker
+_shared_expiry = None
+
+
+def checkpoint_path(valuation_date, checkpoint_dir=CHECKPOINT_DIR):
+    return os.path.join(checkpoint_dir, f"{valuation_date}.done")
+
+
+def is_done(valuation_date, checkpoint_dir=CHECKPOINT_DIR):
+    return os.path.exists(checkpoint_path(valuation_date, checkpoint_dir))
+
+
+def _write_checkpoint(valuation_date, info, checkpoint_dir):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = checkpoint_path(valuation_date, checkpoint_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(info, f)
+    os.replace(tmp_path, path)
+
+
+def valuation_dates(start_date, end_date, freq="B"):
+    """
+    Valuation dates in [start_date, end_date] as YYYY-MM-DD strings (business days by default).
+    """
+    return pd.date_range(start_date, end_date, freq=freq).strftime("%Y-%m-%d").tolist()
+
+
+def _init_worker(expiry, registry):
+    """
+    Process pool initializer: receive the expiry table and mapping registry once
+    per worker instead of reloading them for every date.
+    """
+    global _shared_expiry
+    # Pooled connections inherited from the parent must not be reused across processes
+    connections.dispose_engines(close=False)
+    _shared_expiry = expiry
+    mapping_registry._default_registry = registry
+
+
+def _run_date(valuation_date, ivol_backend, pricing_backend, use_cache, checkpoint_dir):
+    started = time.time()
+    result = options_main(
+        ivol_backend=ivol_backend,
+        pricing_backend=pricing_backend,
+        use_cache=use_cache,
+        valuation_date=valuation_date,
+        persist=True,
+        load_positions=partial(get_data, valuation_date),
+        expiry=_shared_expiry,
+    )
+    payloads, transformed_df = result if result else ([], pd.DataFrame())
+    info = {
+        "valuation_date": valuation_date,
+        "priced_rows": len(transformed_df),
+        "payloads": len(payloads),
+        "seconds": round(time.time() - started, 3),
+        "mapping_version": mapping_registry.get_mapping_registry().version,
+        "finished_at": pd.Timestamp.now().isoformat(),
+    }
+    _write_checkpoint(valuation_date, info, checkpoint_dir)
+    return info
+
+
+def backfill(start_date, end_date, workers=None, freq="B", ivol_backend="remote", pricing_backend="remote",
+             use_cache=True, force=False, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Run options_main for every valuation date in a range on a process pool.
+
+    Each date loads its own positions (get_data) and persists its stages under
+    its valuation_date partition; a checkpoint marker is written when a date
+    completes, so rerunning the same range resumes with the dates still missing
+    (force=True reruns them all). The expiry index is extended back to the
+    earliest pending date and refreshed once here, and the expiry table and
+    mapping registry are shipped to each worker once.
+
+    Returns:
+        pd.DataFrame: One row per attempted date with status, counts and error
+    """
+    dates = valuation_dates(start_date, end_date, freq)
+    pending = [d for d in dates if force or not is_done(d, checkpoint_dir)]
+    logger.info(f"Backfill {start_date} -> {end_date}: {len(dates)} dates, {len(dates) - len(pending)} already done, {len(pending)} to run")
+    if not pending:
+        return pd.DataFrame(columns=["valuation_date", "status", "priced_rows", "payloads", "seconds", "error"])
+
+    expiry = load_expiries(min(pending))
+    registry = get_mapping_registry()
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(expiry, registry)) as executor:
+        futures = {
+            executor.submit(_run_date, d, ivol_backend, pricing_backend, use_cache, checkpoint_dir): d
+            for d in pending
+        }
+        for future in as_completed(futures):
+            valuation_date = futures[future]
+            try:
+                info = future.result()
+                results.append(dict(info, status="done", error=None))
+                logger.info(f"Backfilled {valuation_date}: {info['priced_rows']} rows in {info['seconds']}s")
+            except Exception as e:
+                results.append({"valuation_date": valuation_date, "status": "failed", "error": str(e)})
+                logger.error(f"Backfill failed for {valuation_date}: {e}")
+
+    summary = pd.DataFrame(results).sort_values("valuation_date").reset_index(drop=True)
+    failed = (summary["status"] == "failed").sum()
+    logger.info(f"Backfill finished: {len(summary) - failed} done, {failed} failed")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Backfill the options workflow over a range of valuation dates")
+    parser.add_argument("start_date", help="First valuation date (YYYY-MM-DD)")
+    parser.add_argument("end_date", help="Last valuation date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--all-days", action="store_true", help="Include weekends instead of business days only")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk options API result cache")
+    parser.add_argument("--force", action="store_true", help="Rerun dates that already have a checkpoint")
+    args = parser.parse_args()
+
+    summary = backfill(
+        args.start_date,
+        args.end_date,
+        workers=args.workers,
+        freq="D" if args.all_days else "B",
+        use_cache=not args.no_cache,
+        force=args.force,
+    )
+    print(summary.to_string(index=False))
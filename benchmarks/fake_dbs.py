@@ -0,0 +1,57 @@
+import contextlib
+import os
+
+from sqlalchemy import create_engine, event
+
+import crate_download
+import get_data
+
+# Schemas the production queries qualify their tables with, attached as SQLite databases
+SCHEMAS = ("position", "settles")
+
+
+def sqlite_engine(directory):
+    """
+    SQLite engine standing in for the back office Postgres and CrateDB: main.db
+    plus one attached database per schema, so position.aggregated_valuations and
+    settles."values" resolve unchanged.
+    """
+    os.makedirs(directory, exist_ok=True)
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'main.db')}")
+
+    @event.listens_for(engine, "connect")
+    def _attach_schemas(dbapi_connection, connection_record):
+        for schema in SCHEMAS:
+            dbapi_connection.execute(f"ATTACH DATABASE '{os.path.join(directory, schema + '.db')}' AS {schema}")
+
+    return engine
+
+
+def load_tables(engine, book_df, settlements_df):
+    """
+    Replace the synthetic positions and settlements tables, indexed like the
+    production lookups (valuation_date; instrument_key + source + date).
+    """
+    with engine.begin() as connection:
+        book_df.to_sql("aggregated_valuations", connection, schema="position", if_exists="replace", index=False)
+        settlements_df.to_sql("values", connection, schema="settles", if_exists="replace", index=False)
+        connection.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS position.idx_av_date ON aggregated_valuations (valuation_date)"
+        )
+        connection.exec_driver_sql(
+            'CREATE INDEX IF NOT EXISTS settles.idx_values_key ON "values" (instrument_key, source, date)'
+        )
+
+
+@contextlib.contextmanager
+def use_engine(engine):
+    """
+    Point get_data and crate_download at engine for the duration of the block.
+    """
+    originals = (get_data.connect_back_office_applictions, crate_download.connect_crate_db)
+    get_data.connect_back_office_applictions = lambda: engine
+    crate_download.connect_crate_db = lambda: engine
+    try:
+        yield engine
+    finally:
+        get_data.connect_back_office_applictions, crate_download.connect_crate_db = originals
@@ -0,0 +1,254 @@
+"""
+Benchmark the options workflow on a synthetic book, without production services.
+
+The positions and settlement tables live in SQLite (benchmarks.fake_dbs), the
+expiry calendar is generated, and getIVol/getPriceVanilla are answered by the
+stand-in server in mock_options_server with an injectable per-request latency.
+Every run appends one JSON line per size to the history file and is compared
+with the latest run of the same configuration at another commit.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --sizes 1000,10000,100000 --latency 0.002
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import options_api_client
+from api_format import call_ivol_api_and_add_to_df, transform_to_option_api_payloads
+from benchmarks.fake_dbs import load_tables, sqlite_engine, use_engine
+from benchmarks.synthetic import generate_book, generate_expiries, generate_settlements, settlement_requests
+from crate_download import fetch_settlements_for_symbols
+from expiry_index import ExpiryIndex
+from get_data import align_option_expiries, get_data
+from metrics import get_metrics
+from mock_options_server import serve_in_thread
+from symbol_keys import OptSymbolIndex
+
+logger = logging.getLogger(__name__)
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY_PATH = os.path.join(BENCHMARK_DIR, "history.jsonl")
+DEFAULT_SIZES = (1_000, 10_000)
+STAGES = ("load", "expiry", "align", "ivol", "price", "settlements")
+# A stage regresses when it is this much slower than the baseline, and by more than the noise floor
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def git_revision():
+    """
+    (commit, dirty) of the working tree, or (None, None) outside a git checkout.
+    """
+    root = os.path.dirname(BENCHMARK_DIR)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root, capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_once(n_options, workdir, base_url, valuation_date, backend, batch_size, seed=0):
+    """
+    Generate a book of n_options, load it into SQLite and time every stage once.
+
+    Returns:
+        dict: stage -> {'seconds', 'rows'}
+    """
+    metrics = get_metrics()
+    timings = {}
+
+    def timed(stage, func, rows=len):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        timings[stage] = {"seconds": round(seconds, 6), "rows": int(rows(result))}
+        metrics.record_stage(stage, seconds, timings[stage]["rows"])
+        logger.info(f"{n_options} options | {stage}: {seconds:.3f}s ({timings[stage]['rows']} rows)")
+        return result
+
+    expiries = generate_expiries(valuation_date, seed=seed)
+    book = generate_book(n_options, valuation_date, seed=seed)
+    engine = sqlite_engine(os.path.join(workdir, f"db-{n_options}"))
+    client = options_api_client.OptionsApiClient(base_url=base_url, rate_per_second=1e9, max_retries=0)
+    index = ExpiryIndex(os.path.join(workdir, f"expiry-{n_options}.sqlite"), fetch=lambda min_expiry: expiries)
+
+    try:
+        with use_engine(engine):
+            # Settlements exist for most of the option symbols in the book
+            aligned = align_option_expiries(book[book["instrument_type"] == "Option"], expiries)
+            requests_df = settlement_requests(aligned)
+            load_tables(engine, book, generate_settlements(requests_df, valuation_date, seed=seed))
+
+            positions = timed("load", lambda: get_data(valuation_date))
+            expiry = timed("expiry", lambda: (index.refresh(full=True), index.load(valuation_date))[1])
+            aligned = timed("align", lambda: align_option_expiries(positions, expiry))
+            ivol_df = timed("ivol", lambda: call_ivol_api_and_add_to_df(
+                aligned, as_of_date=valuation_date, backend=backend, client=client, batch_size=batch_size, use_cache=False
+            ))
+            timed("price", lambda: transform_to_option_api_payloads(
+                ivol_df, as_of_date=valuation_date, backend=backend, client=client, batch_size=batch_size,
+                use_cache=False, output_csv=None,
+            ), rows=lambda result: len(result[1]))
+            def settle():
+                requests_df = settlement_requests(aligned)
+                settlements = fetch_settlements_for_symbols(requests_df, trade_date=valuation_date, persist=False)
+                return OptSymbolIndex.from_frame(requests_df).join(requests_df, settlements)
+
+            timed("settlements", settle)
+    finally:
+        index.close()
+        client.close()
+        engine.dispose()
+    return timings
+
+
+def find_baseline(record, history):
+    """
+    Latest history entry with the same configuration at a different commit.
+    """
+    config = ("options", "backend", "latency", "batch_size")
+    for previous in reversed(history):
+        if all(previous.get(k) == record.get(k) for k in config) and previous.get("commit") != record.get("commit"):
+            return previous
+    return None
+
+
+def find_regressions(record, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Stages slower than baseline by more than threshold (relative) and NOISE_FLOOR_SECONDS (absolute).
+
+    Returns:
+        list: (stage, baseline_seconds, seconds) per regressed stage
+    """
+    regressions = []
+    for stage, timing in record["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before is None:
+            continue
+        if timing["seconds"] > before["seconds"] * (1 + threshold) and timing["seconds"] - before["seconds"] > NOISE_FLOOR_SECONDS:
+            regressions.append((stage, before["seconds"], timing["seconds"]))
+    return regressions
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(record, path):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, latency=0.0, backend="remote", batch_size=1000, repeat=1,
+                   valuation_date="2025-07-21", history_path=DEFAULT_HISTORY_PATH, threshold=REGRESSION_THRESHOLD):
+    """
+    Benchmark every size, keeping the fastest of repeat runs per stage.
+
+    Parameters:
+        sizes (iterable): Option counts of the synthetic books (1k to 1M)
+        latency (float): Seconds the stand-in API sleeps per request
+        backend (str): 'remote' (stand-in API) or 'local' (in-process pricing engine)
+        batch_size (int): Rows per batch request (None for one request per row)
+        history_path (str): JSON lines results history (None to skip recording)
+
+    Returns:
+        tuple: (records, regressions) where regressions maps option count to find_regressions output
+    """
+    commit, dirty = git_revision()
+    history = read_history(history_path) if history_path else []
+    server, base_url = serve_in_thread(latency=latency)
+    records, regressions = [], {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="options-bench-") as workdir:
+            for n_options in sizes:
+                runs = [run_once(n_options, workdir, base_url, valuation_date, backend, batch_size) for _ in range(repeat)]
+                stages = {}
+                for stage in STAGES:
+                    best = min((run[stage] for run in runs), key=lambda t: t["seconds"])
+                    stages[stage] = dict(best, rows_per_second=round(best["rows"] / best["seconds"], 1) if best["seconds"] else None)
+                record = {
+                    "timestamp": pd.Timestamp.now().isoformat(timespec="seconds"),
+                    "commit": commit,
+                    "dirty": dirty,
+                    "options": n_options,
+                    "backend": backend,
+                    "latency": latency,
+                    "batch_size": batch_size,
+                    "repeat": repeat,
+                    "python": platform.python_version(),
+                    "pandas": pd.__version__,
+                    "numpy": np.__version__,
+                    "stages": stages,
+                    "total_seconds": round(sum(t["seconds"] for t in stages.values()), 6),
+                }
+                baseline = find_baseline(record, history)
+                if baseline is not None:
+                    record["baseline_commit"] = baseline["commit"]
+                    regressions[n_options] = find_regressions(record, baseline, threshold)
+                records.append(record)
+                if history_path:
+                    append_history(record, history_path)
+                    history.append(record)
+    finally:
+        server.shutdown()
+    return records, regressions
+
+
+def format_report(records, regressions):
+    rows = [
+        {"options": r["options"], "stage": stage, "seconds": t["seconds"], "rows": t["rows"], "rows_per_second": t["rows_per_second"]}
+        for r in records for stage, t in r["stages"].items()
+    ]
+    lines = [pd.DataFrame(rows).to_string(index=False)]
+    for n_options, found in regressions.items():
+        for stage, before, after in found:
+            lines.append(f"REGRESSION {n_options} options | {stage}: {before:.3f}s -> {after:.3f}s")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Benchmark the options workflow on synthetic data")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated option counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stand-in API sleeps per request")
+    parser.add_argument("--backend", choices=("remote", "local"), default="remote",
+                        help="Price through the stand-in API or the in-process engine")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per batch request (0 for per-row requests)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per size; the fastest is recorded")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="JSON lines results history")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Relative slowdown reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a stage regressed")
+    args = parser.parse_args()
+
+    records, regressions = run_benchmarks(
+        sizes=[int(s) for s in args.sizes.split(",")],
+        latency=args.latency,
+        backend=args.backend,
+        batch_size=args.batch_size or None,
+        repeat=args.repeat,
+        history_path=args.history,
+        threshold=args.threshold,
+    )
+    print(format_report(records, regressions))
+    if args.fail_on_regression and any(regressions.values()):
+        sys.exit(1)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from crate_download import generate_opt_symbol_column
+from mapping_registry import get_mapping_registry
+from pricing_models import option_price, year_fraction
+
+# Strategy ids the positions query selects (a subset of POSITIONS_QUERY's list)
+BENCHMARK_STRATEGIES = [
+    "124", "143", "160", "162", "734", "LN-NG-EB", "4809", "525", "634", "343",
+    "238", "5653", "231", "387", "5192", "1504", "791", "5421", "175", "681",
+    "222", "5646", "US-NG-KT", "US-NG-JH", "US-PWR-FIN-AM", "US-PWR-ERCOT-FIN-JG",
+]
+# Share of rows that are not exposure options and must be filtered out by the query
+NON_OPTION_SHARE = 0.2
+# Share of (symbol, month) expiries left out so some positions do not align
+MISSING_EXPIRY_SHARE = 0.05
+EXPIRY_MONTHS = 24
+
+
+def _month_ends(valuation_date, months):
+    return pd.date_range(pd.Timestamp(valuation_date) + pd.offsets.MonthEnd(1), periods=months, freq="ME")
+
+
+def generate_expiries(valuation_date="2025-07-21", months=EXPIRY_MONTHS, registry=None, seed=0):
+    """
+    Synthetic settles.instruments expiries: one option listing per mapped symbol
+    and contract month, in the shape expiry_date() returns.
+
+    Returns:
+        pd.DataFrame: future_key ('SYM YYYYMM'), future_expiry, option_expiry
+    """
+    rng = np.random.default_rng(seed)
+    registry = registry or get_mapping_registry()
+    symbols = sorted(set(registry.exact.values()) | {symbol for _, symbol in registry.prefixes})
+    month_ends = _month_ends(valuation_date, months)
+
+    symbol = np.repeat(symbols, len(month_ends))
+    month_end = np.tile(month_ends.to_numpy(), len(symbols))
+    future_expiry = pd.DatetimeIndex(month_end) - pd.to_timedelta(rng.integers(0, 5, len(symbol)), unit="D")
+    option_expiry = future_expiry - pd.to_timedelta(rng.integers(2, 8, len(symbol)), unit="D")
+
+    df = pd.DataFrame({
+        "future_key": [f"{s} {d:%Y%m}" for s, d in zip(symbol, pd.DatetimeIndex(month_end))],
+        "future_expiry": future_expiry.strftime("%Y-%m-%d"),
+        "option_expiry": option_expiry.strftime("%Y-%m-%d"),
+    })
+    keep = rng.random(len(df)) >= MISSING_EXPIRY_SHARE
+    return df[keep].reset_index(drop=True)
+
+
+def generate_book(n_options, valuation_date="2025-07-21", months=EXPIRY_MONTHS, registry=None, seed=0):
+    """
+    Synthetic position.aggregated_valuations rows with n_options option exposures.
+
+    Exposures are drawn from the mapping registry, strikes around a per-exposure
+    futures level and market prices from the American model at a random vol, so
+    the IV solve converges for most rows. About NON_OPTION_SHARE extra rows are
+    futures or non-exposure positions, and some rf_rates are missing or zero.
+
+    Returns:
+        pd.DataFrame: Rows with the aggregated_valuations columns the workflow reads
+        plus valuation_date and position_type
+    """
+    rng = np.random.default_rng(seed)
+    registry = registry or get_mapping_registry()
+    exposures = np.array(sorted(registry.exact))
+    levels = dict(zip(exposures, rng.uniform(5, 120, len(exposures))))
+    month_ends = _month_ends(valuation_date, months)
+
+    n_other = int(n_options * NON_OPTION_SHARE / (1 - NON_OPTION_SHARE))
+    n = n_options + n_other
+    exposure = rng.choice(exposures, n)
+    end_date = pd.DatetimeIndex(month_ends[rng.integers(0, len(month_ends), n)])
+    future_value = np.round(pd.Series(exposure).map(levels).to_numpy() * rng.uniform(0.9, 1.1, n), 4)
+    strike = np.round(future_value * np.exp(rng.normal(0, 0.15, n)), 4)
+    is_call = rng.random(n) < 0.5
+    rf_rate = np.where(rng.random(n) < 0.1, np.nan, np.where(rng.random(n) < 0.05, 0.0, 0.04))
+
+    T = year_fraction(valuation_date, end_date - pd.Timedelta(days=5))
+    sigma = rng.uniform(0.15, 0.6, n)
+    market_price = option_price(future_value, strike, T, np.nan_to_num(rf_rate, nan=0.04), sigma, is_call)
+
+    instrument_type = np.full(n, "Option", dtype=object)
+    position_type = np.full(n, "exposure", dtype=object)
+    other = rng.permutation(n)[:n_other]
+    instrument_type[other[: n_other // 2]] = "Future"
+    position_type[other[n_other // 2:]] = "delta"
+
+    return pd.DataFrame({
+        "valuation_date": str(valuation_date),
+        "strategy_id": rng.choice(BENCHMARK_STRATEGIES, n),
+        "exposure": exposure,
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "market_price": np.round(market_price, 6),
+        "instrument_type": instrument_type,
+        "position_type": position_type,
+        "future_value": future_value,
+        "option_type": np.where(is_call, "call", "put"),
+        "strike": strike,
+        "rf_rate": rf_rate,
+    })
+
+
+def settlement_requests(aligned_df, source="ICE"):
+    """
+    fetch_settlements_for_symbols input for aligned positions: opt_symbol_code
+    built from the expiry symbol, contract month, option type and strike.
+    """
+    rows = aligned_df.dropna(subset=["symbol", "ym_key"])
+    rows = pd.DataFrame({
+        "crate_ticks": rows["symbol"].astype(str),
+        "ym_key": rows["ym_key"].astype("int64"),
+        "option_type": rows["option_type"],
+        "strike": rows["strike"],
+    })
+    return generate_opt_symbol_column(rows).assign(source=source)
+
+
+def generate_settlements(requests_df, trade_date="2025-07-21", coverage=0.9, seed=0):
+    """
+    Synthetic settles."values" rows for a share of the requested option symbols.
+
+    Returns:
+        pd.DataFrame: instrument_key, source, date, value, field, label
+    """
+    rng = np.random.default_rng(seed)
+    pairs = requests_df[["opt_symbol_code", "source"]].drop_duplicates()
+    pairs = pairs[rng.random(len(pairs)) < coverage]
+    return pd.DataFrame({
+        "instrument_key": pairs["opt_symbol_code"].to_numpy(),
+        "source": pairs["source"].to_numpy(),
+        "date": str(trade_date),
+        "value": np.round(rng.uniform(0.01, 20, len(pairs)), 4),
+        "field": "Price",
+        "label": "Settlement",
+    })
@@ -0,0 +1,137 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+from storage import STORAGE_ROOT
+
+logger = logging.getLogger(__name__)
+
+
+CHECKPOINT_ROOT = os.path.join(STORAGE_ROOT, "_checkpoints")
+DEFAULT_BATCH_ROWS = 5_000
+
+
+def frame_hash(df):
+    """
+    Content hash of a DataFrame: row values (pd.util.hash_pandas_object), column names and dtypes.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def combine_hash(*parts):
+    """
+    Hash of upstream hashes and stage parameters, used as a stage's checkpoint key.
+    """
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def _artifact_path(stage, valuation_date, key, root):
+    return os.path.join(root, str(valuation_date), f"{stage}-{key[:16]}.parquet")
+
+
+def _discard_stale(stage, valuation_date, key, root):
+    keep = _artifact_path(stage, valuation_date, key, root)
+    for path in glob.glob(os.path.join(root, str(valuation_date), f"{stage}-*")):
+        if not path.startswith(keep):
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(stage, valuation_date, key, root=CHECKPOINT_ROOT):
+    """
+    Checkpointed output of stage for key, or None when there is none.
+    """
+    path = _artifact_path(stage, valuation_date, key, root)
+    if not os.path.exists(path):
+        return None
+    logger.info(f"Stage '{stage}' inputs unchanged, reusing checkpoint {path}")
+    return pd.read_parquet(path)
+
+
+def save_checkpoint(df, stage, valuation_date, key, root=CHECKPOINT_ROOT):
+    """
+    Checkpoint df as the output of stage for key, replacing checkpoints of other keys.
+    """
+    path = _artifact_path(stage, valuation_date, key, root)
+    _discard_stale(stage, valuation_date, key, root)
+    _write_parquet(df, path)
+    logger.info(f"Checkpointed stage '{stage}' ({len(df)} rows) to {path}")
+    return path
+
+
+def run_stage(stage, valuation_date, key, compute, root=CHECKPOINT_ROOT):
+    """
+    Return the checkpointed output of stage for key, or compute() and checkpoint it.
+
+    Parameters:
+        stage (str): Stage name, e.g. 'aligned'
+        key (str): combine_hash of the stage's inputs
+        compute (callable): Produces the stage output DataFrame
+
+    Returns:
+        tuple: (DataFrame, reused) where reused is True when the checkpoint was loaded
+    """
+    df = load_checkpoint(stage, valuation_date, key, root)
+    if df is not None:
+        return df, True
+
+    df = compute()
+    save_checkpoint(df, stage, valuation_date, key, root)
+    return df, False
+
+
+def run_batched_stage(stage, valuation_date, key, df, compute_batch, batch_rows=DEFAULT_BATCH_ROWS, root=CHECKPOINT_ROOT):
+    """
+    run_stage for row-wise API stages: df is processed in slices of batch_rows and
+    every finished slice is persisted, so a rerun after a failure only computes
+    the slices that are still missing.
+
+    Parameters:
+        df (pd.DataFrame): Stage input
+        compute_batch (callable): Maps a slice of df to its output rows
+
+    Returns:
+        tuple: (DataFrame, reused) with the outputs of all slices in input order
+    """
+    path = _artifact_path(stage, valuation_date, key, root)
+    if os.path.exists(path):
+        logger.info(f"Stage '{stage}' inputs unchanged, reusing checkpoint {path}")
+        return pd.read_parquet(path), True
+
+    _discard_stale(stage, valuation_date, key, root)
+    parts_dir = path + ".parts"
+    starts = range(0, len(df), batch_rows)
+    parts = []
+    resumed = 0
+    for n, start in enumerate(starts):
+        part_path = os.path.join(parts_dir, f"batch-{n:05d}.parquet")
+        if os.path.exists(part_path):
+            parts.append(pd.read_parquet(part_path))
+            resumed += 1
+            continue
+        part = compute_batch(df.iloc[start:start + batch_rows])
+        _write_parquet(part, part_path)
+        parts.append(part)
+        logger.debug(f"Stage '{stage}': persisted batch {n + 1}/{len(starts)}")
+    if resumed:
+        logger.info(f"Stage '{stage}': resumed {resumed} of {len(starts)} batches from {parts_dir}")
+
+    result = pd.concat(parts) if parts else compute_batch(df)
+    _write_parquet(result, path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    logger.info(f"Checkpointed stage '{stage}' ({len(result)} rows) to {path}")
+    return result, False
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from symbol_keys import opt_symbol_codes
+
 def read_option_price_results_european():
     """
     Reads the option_price_results_European.csv file and returns the DataFrame.
@@ -23,87 +25,97 @@ def generate_opt_symbol_column(df):
     """
     Creates a new column 'opt_symbol_code' by combining:
     crate_ticks, ym_key, first letter of option_type, and strike (no space before strike).
+    The strike is formatted at the tick precision of the root / 'exchange' column
+    (see symbol_keys), without trailing zeros.
     
-    Example output: 'TFO 202508 P25'
+    Example output: 'TFO 202508 P25', 'B 202510 C10.05'
     """
     df = df.copy()
     
-    df["opt_symbol_code"] = (
-        df["crate_ticks"].astype(str).str.strip() + " " +
-        df["ym_key"].astype(str).str.strip() + " " +
-        df["option_type"].astype(str).str.upper().str[0] +
-        df["strike"].astype(str).str.replace(".0", "", regex=False)  # Remove ".0" if int
+    codes = opt_symbol_codes(
+        df["crate_ticks"], df["ym_key"], df["option_type"], df["strike"],
+        df["exchange"] if "exchange" in df.columns else None,
     )
+    df["opt_symbol_code"] = codes.to_numpy()
     
     return df
 
 
 import pandas as pd
+from sqlalchemy import bindparam, text
 from connections import connect_crate_db
+from metrics import get_metrics
+from storage import export_excel, write_stage
+
+SETTLEMENT_COLUMNS = ["instrument_key", "source", "date", "value"]
+SETTLEMENT_QUERY_CHUNK = 1000
+
+SETTLEMENTS_QUERY = text(f"""
+    SELECT {", ".join(SETTLEMENT_COLUMNS)}
+    FROM settles."values"
+    WHERE instrument_key IN :keys
+      AND field = 'Price'
+      AND label = 'Settlement'
+      AND source = :source
+      AND date = :trade_date
+    ORDER BY date DESC
+""").bindparams(bindparam("keys", expanding=True))
+
 
-def fetch_settlements_for_symbols(df, trade_date="2025-07-21"):
+def fetch_settlements_for_symbols(df, trade_date="2025-07-21", persist=True, output_excel=None):
     """
     Fetch settlement prices from CrateDB for each opt_symbol_code and source in the DataFrame.
 
+    The unique (opt_symbol_code, source) pairs are fetched set-based: one bound
+    query per source and chunk of SETTLEMENT_QUERY_CHUNK symbols, then merged
+    back by key.
+
     Parameters:
         df (pd.DataFrame): Input DataFrame with columns ['opt_symbol_code', 'source']
         trade_date (str): Date for which to pull settlements (YYYY-MM-DD)
+        persist (bool): Store the results as the 'settlements' Parquet stage for trade_date
+        output_excel (str): Optional Excel export path (skipped when None)
 
     Returns:
-        pd.DataFrame: Combined settlement results from CrateDB
+        pd.DataFrame: Settlement rows with 'opt_symbol_code' and 'source' for every matched pair
     """
     if "opt_symbol_code" not in df.columns or "source" not in df.columns:
         raise ValueError("DataFrame must contain 'opt_symbol_code' and 'source' columns")
 
+    pairs = df[["opt_symbol_code", "source"]].dropna().drop_duplicates()
+    print(f"Fetching settlements for {len(pairs)} unique symbols (from {len(df)} rows)")
+
     conn = connect_crate_db()
     results = []
 
-    try:
-        for idx, row in df.iterrows():
-            opt_code = row["opt_symbol_code"]
-            source = row["source"]
-
-            if pd.isnull(opt_code) or pd.isnull(source):
-                continue
-
-            # Exact match query
-            query = f"""
-                SELECT *
-                FROM settles."values"
-                WHERE instrument_key = '{opt_code}'
-                  AND field = 'Price'
-                  AND label = 'Settlement'
-                  AND source = '{source}'
-                  AND date = '{trade_date}'
-                ORDER BY date DESC
-            """
-
-            try:
-                sub_df = pd.read_sql(query, conn)
-                sub_df["opt_symbol_code"] = opt_code
-                sub_df["source"] = source
-                results.append(sub_df)
-            except Exception as e:
-                print(f"❌ Failed for {opt_code} ({source}): {e}")
-    finally:
-        conn.dispose()
-
-    # Export results to Excel
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_excel = f"settlements_output_{timestamp}.xlsx"
+    with conn.connect() as connection:
+        for source, group in pairs.groupby("source", sort=False):
+            keys = group["opt_symbol_code"].astype(str).tolist()
+            for i in range(0, len(keys), SETTLEMENT_QUERY_CHUNK):
+                chunk = keys[i:i + SETTLEMENT_QUERY_CHUNK]
+                try:
+                    with get_metrics().timer("db_query_seconds", query="settlements"):
+                        sub_df = pd.read_sql(
+                            SETTLEMENTS_QUERY, connection,
+                            params={"keys": chunk, "source": source, "trade_date": trade_date},
+                        )
+                    results.append(sub_df)
+                except Exception as e:
+                    print(f"❌ Failed for {len(chunk)} symbols ({source}): {e}")
 
     if results:
-        combined = pd.concat(results, ignore_index=True)
-        combined.to_excel(output_excel, index=False)
-        print(f"✅ Exported settlements to {output_excel} (shape: {combined.shape})")
-        return combined
+        fetched = pd.concat(results, ignore_index=True).rename(columns={"instrument_key": "opt_symbol_code"})
+        combined = pairs.merge(fetched, on=["opt_symbol_code", "source"], how="inner")
+        print(f"✅ Retrieved settlements (shape: {combined.shape})")
     else:
         print("⚠️ No results retrieved from CrateDB.")
-        empty_df = pd.DataFrame()
-        empty_df.to_excel(output_excel, index=False)
-        print(f"⚠️ Exported empty settlements to {output_excel}")
-        return empty_df
+        combined = pd.DataFrame()
+
+    if persist and not combined.empty:
+        write_stage(combined, "settlements", trade_date)
+    if output_excel:
+        export_excel(combined, output_excel)
+    return combined
 
     
 if __name__ == "__main__":
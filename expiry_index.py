@@ -0,0 +1,232 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from get_data import expiry_date
+from mapping_registry import get_mapping_registry
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_INDEX_PATH = os.getenv("OPTIONS_EXPIRY_INDEX", "expiry_index.sqlite")
+DEFAULT_REFRESH_INTERVAL_SECONDS = 12 * 3600
+# Incremental refreshes only see expiries beyond the watermark; a periodic full
+# refresh picks up listings that arrived with an earlier expiry
+DEFAULT_FULL_REFRESH_INTERVAL_SECONDS = 7 * 24 * 3600
+INITIAL_WATERMARK = "2025-07-21"
+
+EXPIRY_COLUMNS = ["future_key", "future_expiry", "option_expiry"]
+
+
+def _iso(date):
+    return pd.Timestamp(date).strftime("%Y-%m-%d")
+
+
+def _to_iso_date(values):
+    return pd.to_datetime(values, errors="coerce").dt.strftime("%Y-%m-%d")
+
+
+def prepare_expiry_rows(expiry_df):
+    """
+    Normalize a raw expiry frame (future_key, future_expiry, option_expiry) into
+    index rows: ISO dates plus the (symbol, ym_key) join key parsed from future_key.
+    """
+    rows = expiry_df[EXPIRY_COLUMNS].copy()
+    rows["future_expiry"] = _to_iso_date(rows["future_expiry"])
+    rows["option_expiry"] = _to_iso_date(rows["option_expiry"])
+    rows["symbol"] = rows["future_key"].str.extract(r"^(\S+)", expand=False)
+    rows["ym_key"] = pd.to_numeric(rows["future_key"].str.extract(r"(\d{6})", expand=False), errors="coerce").astype("Int64")
+    return rows.dropna(subset=["future_key", "future_expiry", "option_expiry", "symbol", "ym_key"])
+
+
+class ExpiryIndex:
+    """
+    Local SQLite copy of the option -> future expiry table keyed by (symbol, ym_key).
+
+    refresh() only pulls instruments whose ExpirationDate lies beyond the synced
+    watermark (the latest option_expiry stored), so day-to-day refreshes fetch
+    the few newly listed expiries instead of the whole calendar. The option
+    roots of the mapping registry are recorded with every refresh; when they
+    change, the next refresh is a full one so added roots are fetched.
+
+    The index covers expiries after its lower bound (INITIAL_WATERMARK until
+    ensure_coverage extends it to an earlier date); load() refuses dates
+    before it rather than returning a calendar with expiries missing.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, fetch=expiry_date, registry=None):
+        self.path = path
+        self.fetch = fetch
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expiries (
+                future_key TEXT NOT NULL,
+                future_expiry TEXT NOT NULL,
+                option_expiry TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                ym_key INTEGER NOT NULL,
+                PRIMARY KEY (future_key, option_expiry)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_expiries_symbol_ym ON expiries (symbol, ym_key)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _get_state(self, name, default=None):
+        row = self._conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, name, value):
+        self._conn.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)", (name, str(value)))
+
+    @property
+    def watermark(self):
+        return self._get_state("watermark", INITIAL_WATERMARK)
+
+    @property
+    def lower_bound(self):
+        return self._get_state("lower_bound", INITIAL_WATERMARK)
+
+    @property
+    def last_refresh(self):
+        return float(self._get_state("refreshed_at", 0.0))
+
+    @property
+    def last_full_refresh(self):
+        return float(self._get_state("full_refreshed_at", 0.0))
+
+    def roots_version(self):
+        """
+        Hash of the option roots the fetch queries, from the mapping registry.
+        """
+        patterns = sorted((self.registry or get_mapping_registry()).option_root_patterns())
+        return hashlib.sha1("\n".join(patterns).encode()).hexdigest()[:16]
+
+    def refresh(self, full=False, lower_bound=None):
+        """
+        Pull expiries beyond the watermark (or everything after the lower bound
+        when full=True) from CrateDB and upsert them. An incremental refresh
+        becomes a full one when the registry's option roots changed since the
+        last refresh.
+
+        Parameters:
+            lower_bound (str): Extend the lower bound to this earlier date (implies full=True)
+
+        Returns:
+            int: Number of rows fetched
+        """
+        roots_version = self.roots_version()
+        if not full and self._get_state("roots_version") != roots_version:
+            logger.info(f"Option roots changed since the last refresh of {self.path}; running a full refresh")
+            full = True
+        if lower_bound is not None:
+            full = True
+            lower_bound = min(_iso(lower_bound), self.lower_bound)
+        else:
+            lower_bound = self.lower_bound
+        watermark = lower_bound if full else self.watermark
+        logger.info(f"Refreshing expiry index {self.path} from watermark {watermark}")
+        rows = prepare_expiry_rows(self.fetch(watermark))
+
+        with self._lock:
+            if full:
+                self._conn.execute("DELETE FROM expiries")
+                self._set_state("lower_bound", lower_bound)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO expiries (future_key, future_expiry, option_expiry, symbol, ym_key) VALUES (?, ?, ?, ?, ?)",
+                rows[["future_key", "future_expiry", "option_expiry", "symbol"]].assign(ym_key=rows["ym_key"].astype(int)).itertuples(index=False, name=None),
+            )
+            if not rows.empty:
+                self._set_state("watermark", max(watermark, rows["option_expiry"].max()))
+            self._set_state("refreshed_at", time.time())
+            self._set_state("roots_version", roots_version)
+            if full:
+                self._set_state("full_refreshed_at", time.time())
+            self._conn.commit()
+        logger.info(f"Expiry index refreshed with {len(rows)} rows (watermark {self.watermark})")
+        return len(rows)
+
+    def refresh_if_stale(self, max_age_seconds=DEFAULT_REFRESH_INTERVAL_SECONDS,
+                         full_max_age_seconds=DEFAULT_FULL_REFRESH_INTERVAL_SECONDS):
+        """
+        Refresh when the index is older than max_age_seconds, fully when the last
+        full refresh is older than full_max_age_seconds.
+        """
+        if time.time() - self.last_full_refresh > full_max_age_seconds:
+            return self.refresh(full=True)
+        if time.time() - self.last_refresh > max_age_seconds:
+            return self.refresh()
+        return 0
+
+    def ensure_coverage(self, as_of_date):
+        """
+        Extend the index with a full refresh when as_of_date is before its lower bound.
+
+        Returns:
+            int: Number of rows fetched (0 when already covered)
+        """
+        if _iso(as_of_date) >= self.lower_bound:
+            return 0
+        logger.info(f"Expiry index {self.path} starts at {self.lower_bound}; extending it back to {_iso(as_of_date)}")
+        return self.refresh(lower_bound=as_of_date)
+
+    def load(self, as_of_date=INITIAL_WATERMARK):
+        """
+        Expiry rows with option_expiry after as_of_date, in the same shape
+        expiry_date() returns plus the symbol and ym_key columns.
+
+        Raises:
+            ValueError: When as_of_date is before the index's lower bound
+        """
+        if _iso(as_of_date) < self.lower_bound:
+            raise ValueError(
+                f"Expiry index {self.path} only covers expiries after {self.lower_bound}; "
+                f"call ensure_coverage('{_iso(as_of_date)}') to load {as_of_date}"
+            )
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT future_key, future_expiry, option_expiry, symbol, ym_key FROM expiries "
+                "WHERE option_expiry > ? ORDER BY option_expiry",
+                self._conn,
+                params=(_iso(as_of_date),),
+            )
+        df["ym_key"] = df["ym_key"].astype("Int64")
+        return df
+
+    def lookup_table(self, as_of_date=INITIAL_WATERMARK):
+        """
+        Dict of (symbol, ym_key) -> tuple of option_expiry strings, for O(1) lookups.
+        """
+        df = self.load(as_of_date)
+        return {
+            (symbol, int(ym_key)): tuple(group)
+            for (symbol, ym_key), group in df.groupby(["symbol", "ym_key"], sort=False)["option_expiry"]
+        }
+
+
+def load_expiries(as_of_date="2025-07-21", path=DEFAULT_INDEX_PATH, max_age_seconds=DEFAULT_REFRESH_INTERVAL_SECONDS):
+    """
+    Drop-in replacement for expiry_date() backed by the local index: extends it
+    back to as_of_date when needed, refreshes incrementally when the index is
+    older than max_age_seconds, then reads locally.
+    """
+    index = ExpiryIndex(path)
+    try:
+        index.ensure_coverage(as_of_date)
+        index.refresh_if_stale(max_age_seconds)
+        return index.load(as_of_date)
+    finally:
+        index.close()
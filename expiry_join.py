@@ -0,0 +1,131 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# ym_key (YYYYMM) < YM_RADIX, so symbol_code * YM_RADIX + ym_key is a unique int64 key
+YM_RADIX = 1_000_000
+
+
+def _factorize(values):
+    """
+    pd.factorize that treats missing values as their own code -1.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    return codes, pd.Series(uniques)
+
+
+def map_values(values, mapping):
+    """
+    Series.map over the distinct values only, broadcast back by factorized codes.
+    """
+    codes, uniques = _factorize(values)
+    mapped = uniques.map(mapping)
+    return pd.Series(mapped.array.take(codes, allow_fill=True), index=getattr(values, "index", None))
+
+
+def to_ym_key(dates):
+    """
+    int32 YYYYMM months for a date Series, parsing each distinct date once; -1 where the date is missing.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        # Typed positions: no parsing, just the month fields
+        dates = pd.Series(dates)
+        ym = (dates.dt.year * 100 + dates.dt.month).to_numpy(dtype=float, na_value=np.nan)
+        return np.where(np.isnan(ym), -1, ym).astype(np.int32)
+    codes, uniques = _factorize(dates)
+    parsed = pd.to_datetime(uniques, errors="coerce")
+    ym = (parsed.dt.year * 100 + parsed.dt.month).to_numpy(dtype=float, na_value=np.nan)
+    ym = np.where(np.isnan(ym), -1, ym).astype(np.int32)
+    return np.where(codes >= 0, ym[codes] if len(ym) else -1, -1).astype(np.int32)
+
+
+class ExpiryJoinIndex:
+    """
+    Integer-keyed lookup from (symbol, ym_key) to option expiries.
+
+    Symbols are encoded as categorical codes and ym_key as int32 months; the
+    expiry rows are sorted once by the combined int64 key, so joining a
+    positions frame is two searchsorted calls instead of a merge on object
+    keys. Build it once per expiry table and reuse it across chunks and days.
+    """
+
+    def __init__(self, symbols, keys, option_expiry):
+        self.symbols = symbols
+        self.keys = keys
+        self.option_expiry = option_expiry
+
+    @classmethod
+    def from_expiries(cls, expiry_df):
+        """
+        Build the index from an expiry frame with future_key and option_expiry
+        (symbol and ym_key are parsed from future_key when not already present).
+        """
+        if "symbol" in expiry_df.columns and "ym_key" in expiry_df.columns:
+            symbol = expiry_df["symbol"]
+            ym_key = pd.to_numeric(expiry_df["ym_key"], errors="coerce")
+        else:
+            symbol = expiry_df["future_key"].str.extract(r"^(\S+)", expand=False)
+            ym_key = pd.to_numeric(expiry_df["future_key"].str.extract(r"(\d{6})", expand=False), errors="coerce")
+
+        valid = (symbol.notna() & ym_key.notna()).to_numpy()
+        categorical = pd.Categorical(symbol[valid])
+        keys = categorical.codes.astype(np.int64) * YM_RADIX + ym_key[valid].to_numpy(dtype=np.int64)
+
+        # Stable sort keeps expiry rows with equal keys in their original order, like a left merge
+        order = np.argsort(keys, kind="stable")
+        # Parsed once here, so joined positions carry datetime64 expiries
+        option_expiry = pd.to_datetime(expiry_df["option_expiry"][valid], errors="coerce").astype("datetime64[ns]").iloc[order].reset_index(drop=True)
+        logger.debug(f"Built expiry join index over {len(keys)} rows and {len(categorical.categories)} symbols")
+        return cls(categorical.categories, keys[order], option_expiry)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def encode(self, symbol, ym_key):
+        """
+        int64 join keys for position symbols and int32 ym_keys; -1 where either is unknown.
+        """
+        codes, uniques = _factorize(symbol)
+        symbol_codes = self.symbols.get_indexer(uniques).astype(np.int64)
+        codes = np.where(codes >= 0, symbol_codes[codes] if len(symbol_codes) else -1, -1)
+        ym_key = np.asarray(ym_key, dtype=np.int64)
+        return np.where((codes >= 0) & (ym_key >= 0), codes * YM_RADIX + ym_key, -1)
+
+    def join(self, positions_df, symbol, ym_key):
+        """
+        Left-join option_expiry onto positions_df.
+
+        Parameters:
+            positions_df (pd.DataFrame): Positions to align
+            symbol (pd.Series): Expiry symbol per position (NaN when unmapped)
+            ym_key (np.ndarray): int32 YYYYMM per position (-1 when unknown)
+
+        Returns:
+            pd.DataFrame: Same rows and column layout as
+            pd.merge(positions + [symbol, ym_key], expiries, on=[symbol, ym_key], how='left'),
+            with ym_key as nullable Int32 and option_expiry as datetime64
+        """
+        keys = self.encode(symbol, ym_key)
+        lo = np.searchsorted(self.keys, keys, side="left")
+        hi = np.searchsorted(self.keys, keys, side="right")
+        matches = np.where(keys >= 0, hi - lo, 0)
+
+        # Unmatched positions keep one row with a missing expiry
+        repeats = np.maximum(matches, 1)
+        rows = np.repeat(np.arange(len(positions_df)), repeats)
+        starts = np.cumsum(repeats) - repeats
+        offset = np.arange(len(rows)) - np.repeat(starts, repeats)
+        matched = np.repeat(matches, repeats) > 0
+        source = np.repeat(lo, repeats) + offset
+
+        merged = positions_df.take(rows).reset_index(drop=True)
+        merged["symbol"] = pd.Series(symbol).array.take(rows)
+        ym = np.asarray(ym_key, dtype=np.int32)[rows]
+        merged["ym_key"] = pd.arrays.IntegerArray(ym, ym < 0)
+        # Position -1 fills unmatched rows with a missing expiry
+        merged["option_expiry"] = self.option_expiry.array.take(np.where(matched, source, -1), allow_fill=True)
+        return merged
@@ -1,93 +1,94 @@
 import pandas as pd
+from sqlalchemy import text
 from connections import connect_back_office_applictions
+from metrics import get_metrics
+from position_frame import as_position_frame
 import logging
 
-# Configure logging for this module
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
-def get_data():
-    logger.info("Starting data retrieval process")
+POSITIONS_QUERY = text("""
+    SELECT DISTINCT
+        strategy_id,
+        exposure,
+        end_date,
+        market_price,
+        instrument_type,
+        future_value,
+        option_type,
+        strike,
+        rf_rate
+    FROM 
+        position.aggregated_valuations av
+    WHERE 
+        valuation_date = :valuation_date
+        AND instrument_type = 'Option'
+        AND position_type = 'exposure'
+        AND strategy_id IN (
+            '124', '143', '160', '162', '5189', '734', '735',
+            '774',
+            'LN-NG-EB',
+            '4809', '525', '694', '739', '740',
+            '634', '635', '636', '637', '741',
+            '343', '345', '348', '349', '4908', '4909', '742', '743', 'LN-NG-GS',
+            '238',
+            '5653', '5654', '5655', '647', '648',
+            '231', '232', '239', '284', '4275', '744',
+            '387', '388', '389', '390', '413', '414', '751', '752',
+            '5192', '5193', '5196', '5685', '749', '750',
+            '1504', '185', '187', '289', '5686', '753', 'LN-NG-PG Cross Commodity-PG',
+            '791', '792',
+            '5421', '5422', '5423', '5426', '5427', '5428', '5429',
+            '175',
+            '681', '682', '683',
+            '222', '224', '280', '291', '404', '4283', 'LN-NG-VG',
+            '5646',
+            'US-PWR-AA-EP-FIXED',
+            'US-NG-Basis-AH',
+            'US-PWR-CLIENT-AM',
+            'US-PWR-FIN-AM',
+            'US-PWR-CLIENT-AO',
+            'US-PWR-FIN-AO',
+            'US-PWR-FTR-AO',
+            'US-PWR-ISONE-PHYS-AO',
+            'US-PWR-PJM-PHYS-AO',
+            'US-NG-CADG',
+            'US-PWR-ERCOT-FIN-JG',
+            'US-PWR-ERCOT-FLOW-JG',
+            'US-PWR-ERCOT-OPT-JG',
+            'US-PWR-ERCOT-PHYS-JG',
+            'US-PWR-ERCOT-SHAPE-JG',
+            'US-NG-JH',
+            'US-NG-MGT-JL',
+            'US-NG-JPTM',
+            'US-PWR-ERCOT-FIN-JS',
+            'US-PWR-ERCOT-FIN-JS-OPT',
+            'US-PWR-ERCOT-PHYS-JS',
+            'US-NG-KT',
+            '478',
+            '5098',
+            'US-PWR-ERCOT-Fin-DI',
+            'US-PWR-FIN-LH',
+            'US-PWR-FIN-PK',
+            'US-PWR-LH-PK1-FUT',
+            'US-PWR-LH-PK3-OPT',
+            'US-NG-MJC',
+            'US-NG-MJC-SPEC',
+            'US-NG-JPMAR',
+            'US-NG-MAR',
+            'US-PWR-WEST-FIN-PKIM',
+            'US-NG-AtmosVirtual-RM',
+            'US-NG-RM',
+            'US-PWR-WEST-FIN-RR'
+                );
+        """)
+
+
+def get_data(valuation_date="2025-07-21"):
+    logger.info(f"Starting data retrieval process for valuation date {valuation_date}")
     
-    query = """
-        SELECT DISTINCT
-            strategy_id,
-            exposure,
-            end_date,
-            market_price,
-            instrument_type,
-            future_value,
-            option_type,
-            strike,
-            rf_rate
-        FROM 
-            position.aggregated_valuations av
-        WHERE 
-            valuation_date = '2025-07-21'
-            AND instrument_type = 'Option'
-            AND position_type = 'exposure'
-            AND strategy_id IN (
-                '124', '143', '160', '162', '5189', '734', '735',
-                '774',
-                'LN-NG-EB',
-                '4809', '525', '694', '739', '740',
-                '634', '635', '636', '637', '741',
-                '343', '345', '348', '349', '4908', '4909', '742', '743', 'LN-NG-GS',
-                '238',
-                '5653', '5654', '5655', '647', '648',
-                '231', '232', '239', '284', '4275', '744',
-                '387', '388', '389', '390', '413', '414', '751', '752',
-                '5192', '5193', '5196', '5685', '749', '750',
-                '1504', '185', '187', '289', '5686', '753', 'LN-NG-PG Cross Commodity-PG',
-                '791', '792',
-                '5421', '5422', '5423', '5426', '5427', '5428', '5429',
-                '175',
-                '681', '682', '683',
-                '222', '224', '280', '291', '404', '4283', 'LN-NG-VG',
-                '5646',
-                'US-PWR-AA-EP-FIXED',
-                'US-NG-Basis-AH',
-                'US-PWR-CLIENT-AM',
-                'US-PWR-FIN-AM',
-                'US-PWR-CLIENT-AO',
-                'US-PWR-FIN-AO',
-                'US-PWR-FTR-AO',
-                'US-PWR-ISONE-PHYS-AO',
-                'US-PWR-PJM-PHYS-AO',
-                'US-NG-CADG',
-                'US-PWR-ERCOT-FIN-JG',
-                'US-PWR-ERCOT-FLOW-JG',
-                'US-PWR-ERCOT-OPT-JG',
-                'US-PWR-ERCOT-PHYS-JG',
-                'US-PWR-ERCOT-SHAPE-JG',
-                'US-NG-JH',
-                'US-NG-MGT-JL',
-                'US-NG-JPTM',
-                'US-PWR-ERCOT-FIN-JS',
-                'US-PWR-ERCOT-FIN-JS-OPT',
-                'US-PWR-ERCOT-PHYS-JS',
-                'US-NG-KT',
-                '478',
-                '5098',
-                'US-PWR-ERCOT-Fin-DI',
-                'US-PWR-FIN-LH',
-                'US-PWR-FIN-PK',
-                'US-PWR-LH-PK1-FUT',
-                'US-PWR-LH-PK3-OPT',
-                'US-NG-MJC',
-                'US-NG-MJC-SPEC',
-                'US-NG-JPMAR',
-                'US-NG-MAR',
-                'US-PWR-WEST-FIN-PKIM',
-                'US-NG-AtmosVirtual-RM',
-                'US-NG-RM',
-                'US-PWR-WEST-FIN-RR'
-                    );
-            """
+    query = POSITIONS_QUERY
     
     logger.info("Executing query to retrieve options data")
     logger.debug(f"Query: {query}")
@@ -96,7 +97,8 @@ def get_data():
     
     try:
         logger.info("Executing SQL query with pandas")
-        df = pd.read_sql(query, conn)
+        with get_metrics().timer("db_query_seconds", query="positions"):
+            df = as_position_frame(pd.read_sql(query, conn, params={"valuation_date": str(valuation_date)}))
         logger.info(f"Successfully retrieved {len(df)} rows of data")
         logger.info(f"DataFrame columns: {list(df.columns)}")
         
@@ -109,33 +111,55 @@ def get_data():
         logger.error(f"Error executing query: {str(e)}")
         logger.error(f"Exception type: {type(e).__name__}")
         raise
-    finally:
-        logger.info("Disposing database connection")
-        conn.dispose()
         
     logger.info("Data retrieval completed successfully")
     return df
 
 
+def get_data_chunks(chunksize=50_000, valuation_date="2025-07-21"):
+    """
+    Stream the positions query in chunks through a server-side cursor.
+
+    Uses stream_results=True so Postgres holds the result set and pandas only
+    materializes chunksize rows at a time. The connection goes back to the
+    shared pool when the generator finishes or is closed.
+
+    Yields:
+        pd.DataFrame: Chunk of POSITIONS_QUERY results, typed by as_position_frame
+    """
+    logger.info(f"Starting streamed data retrieval (chunksize={chunksize})")
+    engine = connect_back_office_applictions()
+    total_rows = 0
+    try:
+        with engine.connect().execution_options(stream_results=True) as connection:
+            params = {"valuation_date": str(valuation_date)}
+            for chunk in pd.read_sql(POSITIONS_QUERY, connection, params=params, chunksize=chunksize):
+                total_rows += len(chunk)
+                logger.debug(f"Fetched chunk of {len(chunk)} rows ({total_rows} so far)")
+                yield as_position_frame(chunk)
+    except Exception as e:
+        logger.error(f"Error streaming query: {str(e)}")
+        logger.error(f"Exception type: {type(e).__name__}")
+        raise
+    logger.info(f"Streamed {total_rows} rows of data")
+
+
 from connections import connect_crate_db  # assuming this function is defined
+from expiry_join import ExpiryJoinIndex, to_ym_key
+from mapping_registry import get_mapping_registry
 
 
 
-def expiry_date():
-    # Define all instrument_key LIKE patterns
-    like_patterns = [
-        "B ______ P%",     # TTF
-        "TFO ______ P%",   # EUA
-        "LO ______ P%",    # WTI
-        "CB5 ______ P%",   # Brent
-        "ON ______ P%",    # Gas
-        "EUA ______ P%",
-        "OG ______ P%",
-        "ERN ______ P%",
-        "PMI ______ P%",
-        "SPM ______ P%",
-        "MDC ______ P%"
-    ]
+def expiry_date(min_expiry="2025-07-21", registry=None):
+    """
+    Fetch the option -> future expiry table from CrateDB for options expiring
+    after min_expiry (YYYY-MM-DD), for every option root in the mapping registry.
+    """
+    registry = registry or get_mapping_registry()
+    # instrument_key LIKE patterns, one per option root, bound as parameters
+    like_patterns = registry.option_root_patterns()
+    params = {f"pattern_{i}": p for i, p in enumerate(like_patterns)}
+    params["min_expiry"] = str(min_expiry)
 
     # Query template
     base_query = """
@@ -144,24 +168,22 @@ def expiry_date():
             properties['UnderlyingInstrument']['ExpirationDate'] AS future_expiry,
             properties['ExpirationDate'] AS option_expiry
         FROM settles.instruments
-        WHERE instrument_key LIKE '{pattern}'
-        AND properties['ExpirationDate'] > '2025-07-21'
+        WHERE instrument_key LIKE :{pattern}
+        AND properties['ExpirationDate'] > :min_expiry
     """
 
     # Combine all queries with UNION ALL
-    union_queries = "\nUNION ALL\n".join([base_query.format(pattern=p) for p in like_patterns])
+    union_queries = "\nUNION ALL\n".join([base_query.format(pattern=f"pattern_{i}") for i in range(len(like_patterns))])
 
-    final_query = f"""
+    final_query = text(f"""
         {union_queries}
         ORDER BY option_expiry
-    """
+    """)
 
     # Execute query
     conn = connect_crate_db()
-    try:
-        df = pd.read_sql(final_query, conn)
-    finally:
-        conn.dispose()
+    with get_metrics().timer("db_query_seconds", query="expiry"):
+        df = pd.read_sql(final_query, conn, params=params)
 
     # ✅ Clean the DataFrame: remove rows with any nulls
     df = df.dropna(subset=["future_key", "future_expiry", "option_expiry"])
@@ -170,53 +192,28 @@ def expiry_date():
 
 
 
-def align_option_expiries(positions_df, expiry_df):
-    import pandas as pd
-
-    # Step 1: Exposure → symbol mapping
-    exposure_map = {
-        "TTF Curve": "TTF",
-        "IPEBRT25Z": "B",
-        "IPEBRT25U": "B", # Couldnt find this exposure in override, assuming it is similar to IPEBRT25Z
-        "ICEEUA25Z": "EUA",
-        "NYMWTI26F": "CL",
-        "ICEV25CCA25Z": "CB5",
-        "NG-HenryHub-EXCH": "NG",
-        "EUA Monthly Curve": "EUA",
-        "CMXGOLD25Q": "GC",
-        "NYMWTI26M": "CL",  # Couldnt find this exposure in override, assuming it is similar to NYMWTI26F
-        "ICEV25CCA25U": "CB5", # Couldnt find this exposure in override, assuming it is similar to ICEV25CCA25Z
-        "ERCOT-HB_NORTH-RT-ERN": "ERN",
-        "PJM-WESTERNHUB-RT-PMI": "PMI",
-        "PJM-WESTERNHUB-RT-P1X": "PMI",
-        "ERCOT-North-345KV_Hub-RT-ENO": "ERN",
-        "CAISO-SP15-DA-SPM": "SPM",
-        "WECC-MIDC-PK-DA-MPD": "MDC",
-        "ERCOT-North-345KV_Hub-DA-NDB": "ERN",
-        "ERCOT-HB_NORTH-RT-EX1": "ERN"
-    }
-
-    # Step 2: Preprocess expiry_df
-    expiry_df = expiry_df.copy()
-    expiry_df["symbol"] = expiry_df["future_key"].str.extract(r"^(\S+)")
-    expiry_df["ym_key"] = expiry_df["future_key"].str.extract(r"(\d{6})")
-    expiry_df["ym_key"] = expiry_df["ym_key"].astype("Int64")  # numeric YYYYMM
-
-    # Step 3: Preprocess positions_df
-    positions_df = positions_df.copy()
-    positions_df["symbol"] = positions_df["exposure"].map(exposure_map)
-    positions_df["ym_key"] = (
-        pd.to_datetime(positions_df["end_date"]).dt.year * 100 +
-        pd.to_datetime(positions_df["end_date"]).dt.month
-    ).astype("Int64")
-
-    # Step 4: Join on symbol and numeric ym_key
-    merged = pd.merge(
-        positions_df,
-        expiry_df[["symbol", "ym_key", "option_expiry"]],
-        on=["symbol", "ym_key"],
-        how="left"
-    )
+def align_option_expiries(positions_df, expiry_df=None, join_index=None, registry=None):
+    """
+    Attach option_expiry to each position by (symbol, ym_key).
+
+    Parameters:
+        positions_df (pd.DataFrame): Positions with 'exposure' and 'end_date'
+        expiry_df (pd.DataFrame): Expiry table; only used when join_index is None
+        join_index (ExpiryJoinIndex): Prebuilt index to reuse across chunks and days
+        registry (MappingRegistry): Exposure -> symbol rules (default: get_mapping_registry())
+
+    Returns:
+        pd.DataFrame: positions_df with symbol, Int32 ym_key and datetime64 option_expiry (left join)
+    """
+    if join_index is None:
+        join_index = ExpiryJoinIndex.from_expiries(expiry_df)
+    registry = registry or get_mapping_registry()
+
+    # Exposure -> symbol mapping and numeric YYYYMM from end_date
+    symbol = registry.map_exposures(positions_df["exposure"])
+    ym_key = to_ym_key(positions_df["end_date"])
+
+    merged = join_index.join(positions_df, symbol, ym_key)
     # output_file = "aligned_option_expiries.csv"
     # merged.to_csv(output_file, index=False)
     # logger.info(f"Saved merged DataFrame to {output_file} with shape: {merged.shape}")
@@ -0,0 +1,113 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from storage import STORAGE_ROOT
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_ROOT = os.path.join(STORAGE_ROOT, "_incremental")
+
+# Stable identity of a position row across intraday snapshots
+ROW_KEY = ["strategy_id", "exposure", "end_date", "strike", "option_type"]
+# Inputs that move intraday; a row is recomputed when any of them changes
+INPUT_COLUMNS = ["market_price", "future_value", "rf_rate", "option_expiry"]
+
+
+def _hash_rows(df, columns):
+    present = [c for c in columns if c in df.columns]
+    return pd.util.hash_pandas_object(df[present].astype(str), index=False).to_numpy()
+
+
+def row_identities(df):
+    """
+    (row_key, occurrence) per row: the ROW_KEY hash and the row's rank among the
+    rows sharing that key, so duplicate keys pair up with the previous snapshot
+    in order instead of collapsing into one row.
+    """
+    row_key = _hash_rows(df, ROW_KEY)
+    occurrence = pd.Series(row_key).groupby(row_key, sort=False).cumcount().to_numpy()
+    return row_key, occurrence
+
+
+def snapshot_path(valuation_date, root=SNAPSHOT_ROOT, scheme="American", model="BSM", ivol_backend="remote", pricing_backend="remote"):
+    """
+    File of the last priced snapshot of valuation_date for one scheme, model and
+    pair of backends; switching any of them reprices every row.
+    """
+    return os.path.join(root, f"{valuation_date}-{scheme}-{model}-{ivol_backend}-{pricing_backend}.parquet")
+
+
+def load_snapshot(valuation_date, root=SNAPSHOT_ROOT, **variant):
+    path = snapshot_path(valuation_date, root, **variant)
+    if not os.path.exists(path):
+        return None
+    previous = pd.read_parquet(path)
+    if "_row_occurrence" not in previous.columns:
+        logger.info(f"Snapshot {path} predates keyed diffs; repricing every row")
+        return None
+    return previous
+
+
+def reprice_incremental(df, valuation_date, reprice, root=SNAPSHOT_ROOT, **variant):
+    """
+    Recompute only the rows whose inputs changed since the last processed snapshot.
+
+    Rows are identified by ROW_KEY (the n-th row of a duplicated key matches the
+    n-th row with that key in the snapshot) and diffed by key: a row is
+    unchanged when the snapshot holds its key with the same INPUT_COLUMNS,
+    changed when the inputs differ, and new when its key is not in the
+    snapshot. Unchanged rows carry their priced row forward from the snapshot;
+    new and changed rows go through reprice (e.g. IV solve + pricing), which
+    may drop rows it cannot price. Such dropped rows are not in the snapshot
+    and count as new next time. The combined result becomes the next snapshot.
+
+    Parameters:
+        df (pd.DataFrame): Aligned positions with a unique index
+        reprice (callable): Maps a subset of df to its priced rows (index preserved)
+        variant: scheme, model, ivol_backend and pricing_backend of reprice
+            (see snapshot_path); each combination keeps its own snapshot
+
+    Returns:
+        pd.DataFrame: Priced rows in df's order
+    """
+    row_key, occurrence = row_identities(df)
+    inputs = _hash_rows(df, INPUT_COLUMNS)
+    previous = load_snapshot(valuation_date, root, **variant)
+
+    if previous is None:
+        logger.info(f"No snapshot for {valuation_date}; pricing all {len(df)} rows")
+        changed = np.ones(len(df), dtype=bool)
+        carried = df.iloc[0:0]
+    else:
+        current = pd.MultiIndex.from_arrays([row_key, occurrence])
+        previous_ids = pd.MultiIndex.from_arrays([previous["_row_key"].to_numpy(), previous["_row_occurrence"].to_numpy()])
+        positions = previous_ids.get_indexer(current)
+        found = positions >= 0
+        same_inputs = found & (previous["_row_inputs"].to_numpy()[np.where(found, positions, 0)] == inputs)
+        changed = ~same_inputs
+        removed = len(previous_ids.difference(current))
+        logger.info(
+            f"Incremental reprice for {valuation_date}: {int((found & changed).sum())} changed, "
+            f"{int((~found).sum())} new, {int(same_inputs.sum())} unchanged, {removed} removed rows"
+        )
+        # Unchanged rows reuse the previously priced row of the same key
+        carried = previous.iloc[positions[same_inputs]].drop(columns=["_row_key", "_row_occurrence", "_row_inputs"])
+        carried.index = df.index[same_inputs]
+
+    fresh = reprice(df[changed]) if changed.any() else df.iloc[0:0]
+    priced = pd.concat([carried, fresh])
+    # Back in df's row order (the index need not be sorted), minus rows reprice dropped
+    priced = priced.loc[df.index[df.index.isin(priced.index)]]
+
+    # Identities and input hashes of the input rows, so rows the pricing step normalised (e.g. rf_rate) still match next time
+    identity = pd.DataFrame({"_row_key": row_key, "_row_occurrence": occurrence, "_row_inputs": inputs}, index=df.index)
+    snapshot = pd.concat([priced, identity.reindex(priced.index)], axis=1)
+    os.makedirs(root, exist_ok=True)
+    path = snapshot_path(valuation_date, root, **variant)
+    snapshot.to_parquet(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return priced
@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from expiry_join import map_values
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAPPING_PATH = os.getenv(
+    "OPTIONS_SYMBOL_MAPPINGS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbol_mappings.csv")
+)
+
+MAPPING_COLUMNS = ["kind", "key", "match", "symbol", "exchange", "scheme", "tempest_code", "commodity_code", "verified", "note"]
+MAPPING_KINDS = ("exposure", "option_root")
+MATCH_TYPES = ("exact", "prefix")
+TEMPEST_COLUMNS = ["opt_symbol", "exchange", "scheme", "tempest_code", "commodity_code"]
+# Columns each kind leaves blank: option roots are listed, not matched or verified
+UNUSED_COLUMNS = {
+    "exposure": ["exchange", "scheme", "tempest_code", "commodity_code"],
+    "option_root": ["match", "symbol", "verified"],
+}
+
+
+class MappingRegistry:
+    """
+    Exposure -> expiry symbol rules and the option roots to pull expiries for,
+    loaded from one mapping file (symbol_mappings.csv).
+
+    'exposure' rows map a position exposure to the symbol of its underlying
+    future, either exactly or by prefix (longest prefix wins, exact beats
+    prefix). 'option_root' rows list the option instrument roots queried
+    for expiries with their tempest attributes (exchange, scheme,
+    tempest_code, commodity_code), one row per root and exchange; roots
+    without known attributes leave them blank. Columns that do not apply to
+    a kind (UNUSED_COLUMNS) must be blank. version is a content hash of the
+    file, so outputs can record which mapping produced them.
+    """
+
+    def __init__(self, table, version=None):
+        self.table = validate_mappings(table)
+        self.version = version
+
+        exposures = self.table[self.table["kind"] == "exposure"]
+        exact = exposures[exposures["match"] == "exact"]
+        prefix = exposures[exposures["match"] == "prefix"]
+        self.exact = dict(zip(exact["key"], exact["symbol"]))
+        # Longest prefix first so the most specific rule wins
+        prefix = prefix.assign(length=prefix["key"].str.len()).sort_values("length", ascending=False)
+        self.prefixes = list(zip(prefix["key"], prefix["symbol"]))
+        self.unverified = set(exposures.loc[~exposures["verified"], "key"])
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_MAPPING_PATH):
+        with open(path, "rb") as f:
+            content = f.read()
+        table = pd.read_csv(path, dtype=str, keep_default_na=False)
+        registry = cls(table, version=hashlib.sha256(content).hexdigest()[:12])
+        logger.info(f"Loaded symbol mapping registry {path} (version {registry.version}, {len(registry.table)} rules)")
+        return registry
+
+    def _resolve(self, exposure):
+        symbol = self.exact.get(exposure)
+        if symbol is not None:
+            return symbol
+        for prefix, prefix_symbol in self.prefixes:
+            if exposure.startswith(prefix):
+                return prefix_symbol
+        return np.nan
+
+    def map_exposures(self, exposures):
+        """
+        Expiry symbol per exposure (NaN where no rule matches). Rules are resolved
+        once per distinct exposure and broadcast back to the rows.
+        """
+        distinct = pd.Series(pd.unique(exposures.dropna()))
+        resolved = {exposure: self._resolve(str(exposure)) for exposure in distinct}
+        unverified = sorted(str(e) for e in distinct if e in self.unverified)
+        if unverified:
+            logger.warning(f"Using unverified exposure mappings: {unverified}")
+        unmapped = sorted(str(e) for e, s in resolved.items() if pd.isnull(s))
+        if unmapped:
+            logger.debug(f"No symbol mapping for exposures: {unmapped}")
+        return map_values(exposures, resolved)
+
+    def option_roots(self):
+        """
+        Option roots with their tempest attributes (None where the file leaves
+        them blank), in the shape fetch_expiry_data_with_exchange expects
+        (opt_symbol, exchange, ...).
+        """
+        roots = self.table[self.table["kind"] == "option_root"]
+        return roots.rename(columns={"key": "opt_symbol"})[TEMPEST_COLUMNS].replace("", None).reset_index(drop=True)
+
+    def option_root_patterns(self):
+        """
+        instrument_key LIKE patterns for the put listings of every option root.
+        """
+        return [f"{root} ______ P%" for root in pd.unique(self.option_roots()["opt_symbol"])]
+
+
+def validate_mappings(table):
+    """
+    Check a raw mapping table and normalize its types.
+
+    Raises:
+        ValueError: On missing columns, unknown kinds/match types, exposure
+        rules without a symbol, values in columns unused by a kind or
+        duplicate rules
+    """
+    missing = [c for c in MAPPING_COLUMNS if c not in table.columns]
+    if missing:
+        raise ValueError(f"Mapping table is missing columns: {missing}")
+
+    table = table[MAPPING_COLUMNS].fillna("").astype(str)
+    table = table.apply(lambda column: column.str.strip())
+    problems = []
+
+    bad_kind = ~table["kind"].isin(MAPPING_KINDS)
+    if bad_kind.any():
+        problems.append(f"unknown kind in rows {table.index[bad_kind].tolist()}")
+    exposure = table["kind"] == "exposure"
+    bad_match = exposure & ~table["match"].isin(MATCH_TYPES)
+    if bad_match.any():
+        problems.append(f"unknown match type in rows {table.index[bad_match].tolist()}")
+    empty_key = table["key"] == ""
+    if empty_key.any():
+        problems.append(f"empty key in rows {table.index[empty_key].tolist()}")
+    no_symbol = exposure & (table["symbol"] == "")
+    if no_symbol.any():
+        problems.append(f"exposure rules without a symbol in rows {table.index[no_symbol].tolist()}")
+    for kind, columns in UNUSED_COLUMNS.items():
+        filled = (table["kind"] == kind) & (table[columns] != "").any(axis=1)
+        if filled.any():
+            problems.append(f"{kind} rows must leave {columns} blank, rows {table.index[filled].tolist()}")
+    # Exposure rules are unique per match type, option roots per exchange
+    variant = table["match"].where(exposure, table["exchange"])
+    duplicated = table.assign(variant=variant).duplicated(subset=["kind", "key", "variant"], keep=False)
+    if duplicated.any():
+        problems.append(f"duplicate rules {sorted(table.loc[duplicated, 'key'].unique().tolist())}")
+    bad_verified = exposure & ~table["verified"].str.lower().isin(["true", "false"])
+    if bad_verified.any():
+        problems.append(f"verified must be true/false in rows {table.index[bad_verified].tolist()}")
+
+    if problems:
+        raise ValueError("Invalid symbol mapping table: " + "; ".join(problems))
+
+    table["verified"] = table["verified"].str.lower() == "true"
+    return table.reset_index(drop=True)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_mapping_registry():
+    """
+    Return the process-wide MappingRegistry, loading DEFAULT_MAPPING_PATH on first use.
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = MappingRegistry.from_csv()
+        return _default_registry
+
+
+def import_tempest_attributes(mapping, path=DEFAULT_MAPPING_PATH):
+    """
+    Fill the option_root rows of the mapping file from a mapping.csv-shaped
+    frame (opt_symbol, exchange, scheme, tempest_code, commodity_code).
+
+    Every root in mapping replaces the registry's rows for that root (one row
+    per exchange, keeping the root's note); roots only in the registry are kept.
+
+    Parameters:
+        mapping (pd.DataFrame): Tempest attributes per option root and exchange.
+        path (str): Mapping file to update (default: DEFAULT_MAPPING_PATH).
+
+    Returns:
+        pd.DataFrame: The validated table written to path.
+    """
+    missing = [c for c in TEMPEST_COLUMNS if c not in mapping.columns]
+    if missing:
+        raise ValueError(f"Tempest mapping is missing columns: {missing}")
+    with open(path, "rb") as f:
+        newline = "\r\n" if b"\r\n" in f.read() else "\n"
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    imported = mapping[TEMPEST_COLUMNS].fillna("").astype(str).drop_duplicates(subset=["opt_symbol", "exchange"])
+    imported = imported.rename(columns={"opt_symbol": "key"})
+
+    roots = table["kind"] == "option_root"
+    notes = table[roots].drop_duplicates(subset="key").set_index("key")["note"]
+    imported = imported.assign(kind="option_root", match="", symbol="", verified="", note=imported["key"].map(notes).fillna(""))
+    kept = table[~(roots & table["key"].isin(imported["key"]))]
+    table = validate_mappings(pd.concat([kept, imported[MAPPING_COLUMNS]], ignore_index=True))
+
+    # Write verified back as it is spelled in the file (blank for option roots)
+    table["verified"] = np.where(table["kind"] == "exposure", table["verified"].map({True: "true", False: "false"}), "")
+    table.to_csv(path, index=False, lineterminator=newline)
+    logger.info(f"Imported tempest attributes for {imported['key'].nunique()} option roots into {path}")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the symbol mapping registry")
+    parser.add_argument("--import-tempest", metavar="MAPPING_CSV", help="Fill option root tempest attributes from a mapping.csv export")
+    parser.add_argument("--path", default=DEFAULT_MAPPING_PATH, help="Mapping file to validate or update")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.import_tempest:
+        import_tempest_attributes(pd.read_csv(args.import_tempest, dtype=str, keep_default_na=False), path=args.path)
+    MappingRegistry.from_csv(args.path)
@@ -0,0 +1,255 @@
+import bisect
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(label_key, extra=None):
+    items = list(label_key) + list(extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Approximate quantile: upper bound of the bucket holding the q-th observation.
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """
+    In-process counters, gauges and latency histograms, keyed by name and labels.
+
+    Cheap enough for per-request use (one lock and a bisect per observation);
+    dump with write_json() or write_prometheus() at the end of a run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """
+        Observe the duration of the block in histogram name (seconds).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_stage(self, stage, seconds, rows=None):
+        """
+        Record one run of a workflow stage: its duration and, when given, its
+        row count and throughput.
+        """
+        self.observe("stage_seconds", seconds, stage=stage)
+        if rows is not None:
+            self.inc("stage_rows_total", rows, stage=stage)
+            self.set_gauge("stage_rows_per_second", rows / seconds if seconds > 0 else 0.0, stage=stage)
+        logger.debug(f"Stage {stage} took {seconds:.3f}s")
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """
+        Time a workflow stage. Set .rows on the yielded object to also record
+        the stage's row count and throughput.
+        """
+        record = _StageRecord()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.record_stage(stage, time.perf_counter() - started, record.rows)
+
+    def report(self):
+        def rows(items, convert):
+            return [dict(name=name, labels=dict(labels), **convert(value)) for (name, labels), value in sorted(items)]
+
+        with self._lock:
+            return {
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "counters": rows(self.counters.items(), lambda v: {"value": v}),
+                "gauges": rows(self.gauges.items(), lambda v: {"value": v}),
+                "histograms": rows(self.histograms.items(), lambda h: h.to_dict()),
+            }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        logger.info(f"Wrote metrics report to {path}")
+
+    def write_prometheus(self, path, prefix="options_"):
+        """
+        Write the metrics in the Prometheus text exposition format (node_exporter textfile collector).
+        """
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f"{prefix}{name}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{prefix}{name}_count{_format_labels(labels)} {histogram.count}")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote Prometheus metrics to {path}")
+
+    def write(self, path):
+        """
+        write_json for *.json paths, write_prometheus otherwise.
+        """
+        if path.endswith(".json"):
+            self.write_json(path)
+        else:
+            self.write_prometheus(path)
+
+    def log_summary(self):
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            stats = histogram.to_dict()
+            logger.info(
+                f"{name}{_format_labels(labels)}: n={stats['count']} total={stats['sum']:.3f}s "
+                f"p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s max={stats['max']:.3f}s"
+            )
+        for (name, labels), value in sorted(self.gauges.items()):
+            logger.info(f"{name}{_format_labels(labels)}: {value:.4g}")
+
+
+class _StageRecord:
+    def __init__(self):
+        self.rows = None
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """
+    Return the process-wide Metrics instance.
+    """
+    return _metrics
+
+
+@contextlib.contextmanager
+def profiled(output=None, sort="cumulative", limit=30):
+    """
+    Profile the block with pyinstrument when installed, else cProfile.
+
+    Parameters:
+        output (str): Save the profile here (.html for pyinstrument, .prof stats
+            for cProfile); the top entries are logged either way
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            logger.info(profiler.output_text(unicode=False, color=False))
+            if output:
+                with open(output, "w") as f:
+                    f.write(profiler.output_html())
+        return
+
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if output:
+            profiler.dump_stats(output)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        logger.info(f"Profile (top {limit} by {sort}):\n{stream.getvalue()}")
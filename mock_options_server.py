@@ -0,0 +1,224 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+from options_api_client import ARROW_CONTENT_TYPE, IVOL_FIELDS, PRICE_FIELDS, decode_arrow_rows, encode_arrow_rows
+from pricing_models import implied_vol, parity_to_is_call, price_vanilla, year_fraction
+
+logger = logging.getLogger(__name__)
+
+
+API_PREFIX = "/options/api/v1"
+
+
+def _solve_ivol_rows(rows):
+    """
+    Implied vols for a list of getIVol argument dicts using the local pricing engine.
+
+    Returns:
+        tuple: (results, errors) lists aligned with rows
+    """
+    df = pd.DataFrame(rows, columns=IVOL_FIELDS)
+    results = [None] * len(df)
+    errors = [None] * len(df)
+    for (as_of_date, scheme, model), group in df.groupby(["as_of_date", "scheme", "model"], sort=False):
+        try:
+            ivols = implied_vol(
+                price=group["value"].astype(float).to_numpy(),
+                F=group["future_value"].astype(float).to_numpy(),
+                K=group["strike"].astype(float).to_numpy(),
+                T=year_fraction(as_of_date, group["expiration_date"]),
+                r=group["rf_rate"].astype(float).to_numpy(),
+                is_call=parity_to_is_call(group["parity"]),
+                scheme=scheme,
+                model=model,
+            )
+        except Exception as e:
+            for pos in group.index:
+                errors[pos] = str(e)
+            continue
+        for pos, ivol in zip(group.index, ivols):
+            if np.isnan(ivol):
+                errors[pos] = "No implied volatility for the given inputs"
+            else:
+                results[pos] = float(ivol)
+    return results, errors
+
+
+def _price_rows(rows):
+    """
+    Prices and Greeks for a list of getPriceVanilla argument dicts.
+
+    Returns:
+        tuple: (results, errors) lists aligned with rows; each result is a dict
+        with price, delta, gamma, vega and theta
+    """
+    df = pd.DataFrame(rows, columns=PRICE_FIELDS)
+    results = [None] * len(df)
+    errors = [None] * len(df)
+    for (as_of_date, scheme, model), group in df.groupby(["as_of_date", "scheme", "model"], sort=False):
+        try:
+            priced = price_vanilla(
+                strike=group["strike"].astype(float).to_numpy(),
+                parity=group["parity"].to_numpy(),
+                future_value=group["future_value"].astype(float).to_numpy(),
+                ivol=group["ivol"].astype(float).to_numpy(),
+                rf_rate=group["rf_rate"].astype(float).to_numpy(),
+                expiry=group["expiration_date"],
+                as_of_date=as_of_date,
+                scheme=scheme,
+                model=model,
+            )
+        except Exception as e:
+            for pos in group.index:
+                errors[pos] = str(e)
+            continue
+        for pos, record in zip(group.index, priced.to_dict("records")):
+            if np.isnan(record["price"]):
+                errors[pos] = "Could not price the given inputs"
+            else:
+                results[pos] = record
+    return results, errors
+
+
+class OptionsApiHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the options API: per-row GET getIVol / getPriceVanilla routes
+    plus POST getIVolBatch / getPriceVanillaBatch, answered by pricing_models.
+    Server attributes `latency` (seconds per request) and `batch_enabled`
+    control behaviour; HTTP statuses appended to `fail_next` are returned, in
+    order, to the next requests instead of an answer (e.g. [503, 429]).
+    """
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _injected_failure(self):
+        with self.server.fail_lock:
+            status = self.server.fail_next.pop(0) if self.server.fail_next else None
+        if status is not None:
+            # Drain any request body so the kept-alive connection stays usable
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send(status, json.dumps({"detail": "Injected failure"}))
+        return status is not None
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        if not parsed.path.startswith(API_PREFIX + "/"):
+            return None, [], {}
+        parts = [unquote(p) for p in parsed.path[len(API_PREFIX) + 1:].split("/")]
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        return parts[0], parts[1:], params
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        if self._injected_failure():
+            return
+        endpoint, args, params = self._route()
+        if endpoint not in ("getIVol", "getPriceVanilla") or len(args) != 7:
+            self._send(404, json.dumps({"detail": "Not Found"}))
+            return
+
+        fields = IVOL_FIELDS if endpoint == "getIVol" else PRICE_FIELDS
+        row = dict(zip(fields, args))
+        row["scheme"] = params.get("scheme", "American")
+        row["model"] = params.get("model", "BSM")
+
+        solve = _solve_ivol_rows if endpoint == "getIVol" else _price_rows
+        results, errors = solve([row])
+        if errors[0]:
+            self._send(422, json.dumps({"detail": errors[0]}))
+        elif endpoint == "getIVol":
+            self._send(200, repr(results[0]), "text/plain")
+        else:
+            self._send(200, json.dumps(results[0]))
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        if self._injected_failure():
+            return
+        endpoint, args, _ = self._route()
+        if not self.server.batch_enabled or endpoint not in ("getIVolBatch", "getPriceVanillaBatch") or args:
+            self._send(404, json.dumps({"detail": "Not Found"}))
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        arrow = self.headers.get("Content-Type") == ARROW_CONTENT_TYPE
+        rows = decode_arrow_rows(body) if arrow else json.loads(body)["rows"]
+
+        solve = _solve_ivol_rows if endpoint == "getIVolBatch" else _price_rows
+        results, errors = solve(rows)
+
+        if arrow:
+            if endpoint == "getIVolBatch":
+                records = [{"result": res, "error": err} for res, err in zip(results, errors)]
+            else:
+                records = [dict(res or {}, error=err) for res, err in zip(results, errors)]
+            self._send(200, encode_arrow_rows(records), ARROW_CONTENT_TYPE)
+        else:
+            self._send(200, json.dumps({"results": results, "errors": errors}))
+
+
+def make_server(host="127.0.0.1", port=8000, latency=0.0, batch_enabled=True):
+    server = ThreadingHTTPServer((host, port), OptionsApiHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.batch_enabled = batch_enabled
+    server.fail_next = []
+    server.fail_lock = threading.Lock()
+    return server
+
+
+def serve_in_thread(host="127.0.0.1", port=0, latency=0.0, batch_enabled=True):
+    """
+    Start a stand-in server on a background thread.
+
+    Returns:
+        tuple: (server, base_url) — pass base_url to OptionsApiClient and call
+        server.shutdown() when done
+    """
+    server = make_server(host, port, latency, batch_enabled)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{server.server_address[0]}:{server.server_address[1]}{API_PREFIX}"
+    logger.info(f"Stand-in options API listening on {base_url}")
+    return server, base_url
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the options API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per request")
+    parser.add_argument("--no-batch", action="store_true", help="Disable the batch routes")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, not args.no_batch)
+    logger.info(f"Stand-in options API listening on http://{args.host}:{args.port}{API_PREFIX}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
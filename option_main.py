@@ -1,76 +1,218 @@
+import argparse
+import asyncio
+import contextlib
+import time
 import pandas as pd
 from connections import connect_back_office_applictions
-from api_format import transform_to_option_api_payloads, call_ivol_api_and_add_to_df
-from get_data import expiry_date, align_option_expiries 
+from api_format import transform_to_option_api_payloads, call_ivol_api_and_add_to_df, price_payloads
+from checkpoints import combine_hash, frame_hash, run_batched_stage, run_stage
+from incremental import reprice_incremental
+from vol_surface import solve_with_surface
+from mapping_registry import get_mapping_registry
+from get_data import align_option_expiries
+from expiry_join import ExpiryJoinIndex
+from expiry_index import load_expiries
 import logging
-from read_aggregated_valuations import read_csv
+from read_aggregated_valuations import read_csv, read_csv_chunks
+from api_cache import get_api_cache
+from option_pipeline_async import run_async_pipeline
+from storage import write_stage, export_excel
+from metrics import get_metrics, profiled
+from position_frame import as_position_frame
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-def options_main():
+PIPELINE_MODES = ("sequential", "async")
+
+
+def _persist_stage(df, stage, valuation_date, persist, append=False):
+    if persist and df is not None and not df.empty:
+        write_stage(df, stage, valuation_date, append=append)
+
+
+def options_main(ivol_backend="remote", pricing_backend="remote", use_cache=True, pipeline="sequential",
+                 valuation_date="2025-07-21", persist=True, excel_output=None, load_positions=read_csv, expiry=None,
+                 checkpoint=True, incremental=False, vol_surface=False):
+    """
+    Run the options IV and pricing workflow for one valuation date.
+
+    load_positions is called with no arguments to fetch the position snapshot
+    (the aggregated valuations extract by default; get_data for a given date).
+    A preloaded expiry table may be passed in to share it across runs; it is
+    filtered to options expiring after valuation_date.
+
+    With checkpoint=True every stage output is checkpointed under a hash of its
+    inputs: a rerun reuses stages whose inputs are unchanged, and the ivol and
+    pricing stages resume from their last persisted row batch.
+
+    With incremental=True only rows whose inputs changed since the last run for
+    valuation_date are IV-solved and priced; unchanged rows are carried forward.
+
+    With vol_surface=True rows whose IV inputs match the cached vol surface of
+    valuation_date reuse its vols, and rows without a market price are priced
+    off their interpolated smile instead of being dropped. Rows whose solve
+    fails keep a missing vol either way.
+
+    pipeline='async' streams rows through the remote options API only: it
+    honours persist and checkpoint (the priced rows as one stage) but rejects
+    local backends and incremental=True, and does not use the vol surface.
+    """
+    if pipeline not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{pipeline}', expected one of {PIPELINE_MODES}")
+
     logger.info("=" * 60)
     logger.info("STARTING OPTIONS MAIN WORKFLOW")
     logger.info("=" * 60)
 
+    if pipeline == "async":
+        if ivol_backend != "remote" or pricing_backend != "remote":
+            raise ValueError("pipeline='async' streams rows through the remote options API; use pipeline='sequential' for local backends")
+        if incremental:
+            raise ValueError("pipeline='async' does not support incremental repricing; use pipeline='sequential'")
+        logger.info("Running streaming async pipeline against the remote options API")
+        return asyncio.run(run_async_pipeline(
+            as_of_date=valuation_date, use_cache=use_cache, load_positions=load_positions,
+            output_csv=None if persist else "option_price_results_American.csv",
+            persist=persist, checkpoint=checkpoint,
+            load_expiries=load_expiries if expiry is None else (
+                lambda as_of: expiry[pd.to_datetime(expiry["option_expiry"]) > pd.Timestamp(as_of)]
+            ),
+        ))
+
+    metrics = get_metrics()
     try:
         # Step 1: Get data
         logger.info("STEP 1: Retrieving data from database")
-        df = read_csv()
+        started = time.perf_counter()
+        df = as_position_frame(load_positions())
+        metrics.record_stage("load", time.perf_counter() - started, len(df))
         logger.info(f"Retrieved data with shape: {df.shape}")
         logger.info(f"Data columns: {list(df.columns)}")
 
         if df.empty:
             logger.error("No data retrieved from database! Terminating workflow.")
             return
+        _persist_stage(df, "positions", valuation_date, persist)
+        positions_key = frame_hash(df)
 
         # Step 1.5: Expiry date
-        logger.info("STEP 1.5: Getting expiry date for options")
-        expiry = expiry_date()
+        started = time.perf_counter()
+        if expiry is None:
+            logger.info("STEP 1.5: Getting expiry date for options from the local expiry index")
+            expiry = load_expiries(valuation_date)
+        else:
+            logger.info("STEP 1.5: Using preloaded expiry data")
+            expiry = expiry[pd.to_datetime(expiry["option_expiry"]) > pd.Timestamp(valuation_date)]
         logger.info(f"Retrieved expiry data with shape: {expiry.shape}")
+        metrics.record_stage("expiry", time.perf_counter() - started, len(expiry))
+        _persist_stage(expiry, "expiry", valuation_date, persist)
+        expiry_key = frame_hash(expiry)
 
         # Step 2: Align option expiries
         logger.info("STEP 2: Aligning option expiries")
-        aligned_df = align_option_expiries(df, expiry)
+        align = lambda: align_option_expiries(df, expiry)
+        aligned_key = combine_hash(positions_key, expiry_key, get_mapping_registry().version)
+        started = time.perf_counter()
+        if checkpoint:
+            aligned_df, _ = run_stage("aligned", valuation_date, aligned_key, align)
+        else:
+            aligned_df = align()
+        metrics.record_stage("align", time.perf_counter() - started, len(aligned_df))
         logger.info(f"DataFrame shape after expiry alignment: {aligned_df.shape}")
+        _persist_stage(aligned_df, "aligned", valuation_date, persist)
 
         # Step 3: Manual entries (optional)
         # logger.info("STEP 3: Applying manual entries")
         # final_df = manual_entries(aligned_df)
         # logger.info(f"DataFrame shape after manual entries: {final_df.shape}")
 
-        # Since manual_entries is commented, use aligned_df as final_df
-        final_df = aligned_df.copy()
+        # Since manual_entries is commented, use aligned_df as final_df; the stages
+        # below never write into their input, so no defensive copy is needed
+        final_df = aligned_df
 
-        # Step 4: Call ivol API
-        if not final_df.empty:
-            logger.info("STEP 4: Calling ivol API and adding results to DataFrame")
-            logger.info(f"Input DataFrame shape before ivol API: {final_df.shape}")
+        if incremental and not final_df.empty:
+            # Steps 4 and 5 only for rows whose inputs changed since the last snapshot
+            logger.info("STEP 4/5: Incremental IV and pricing of changed rows")
+            reprice = lambda rows: transform_to_option_api_payloads(
+                call_ivol_api_and_add_to_df(rows, as_of_date=valuation_date, backend=ivol_backend, use_cache=use_cache),
+                as_of_date=valuation_date, backend=pricing_backend, use_cache=use_cache, output_csv=None,
+            )[1]
+            started = time.perf_counter()
+            transformed_df = reprice_incremental(
+                final_df, valuation_date, reprice, ivol_backend=ivol_backend, pricing_backend=pricing_backend
+            )
+            metrics.record_stage("reprice", time.perf_counter() - started, len(final_df))
+            payloads = price_payloads(transformed_df, as_of_date=valuation_date)
+            logger.info(f"Transformed DataFrame shape: {transformed_df.shape}")
+            _persist_stage(transformed_df, "priced", valuation_date, persist)
+        else:
+            # Step 4: Call ivol API
+            ivol_key = combine_hash(aligned_key, "ivol", ivol_backend, valuation_date)
+            if not final_df.empty:
+                logger.info("STEP 4: Calling ivol API and adding results to DataFrame")
+                logger.info(f"Input DataFrame shape before ivol API: {final_df.shape}")
 
-            final_df = call_ivol_api_and_add_to_df(final_df)
+                solve_ivols = lambda rows: call_ivol_api_and_add_to_df(
+                    rows, as_of_date=valuation_date, backend=ivol_backend, use_cache=use_cache, raise_on_transient=checkpoint
+                )
 
-            logger.info(f"DataFrame shape after ivol API calls: {final_df.shape}")
-        else:
-            logger.warning("Skipping IVOL API call — final_df is empty.")
+                def solve_stage(rows):
+                    if not checkpoint:
+                        return solve_ivols(rows)
+                    # The vol surface may leave only part of the rows to solve
+                    key = ivol_key if rows is final_df else combine_hash(ivol_key, frame_hash(rows))
+                    return run_batched_stage("ivol", valuation_date, key, rows, solve_ivols)[0]
 
-        # Step 5: Transform to payloads
-        if not final_df.empty:
-            logger.info("STEP 5: Transforming DataFrame to API payloads")
-            payloads, transformed_df = transform_to_option_api_payloads(final_df)
-            logger.info(f"Generated {len(payloads)} API payloads")
-            logger.info(f"Transformed DataFrame shape: {transformed_df.shape}")
-        else:
-            logger.warning("Skipping transformation — final_df is empty.")
-            payloads, transformed_df = [], pd.DataFrame()
+                started = time.perf_counter()
+                if vol_surface:
+                    final_df = solve_with_surface(final_df, valuation_date, solve_stage, backend=ivol_backend)
+                    # Reused and interpolated vols depend on the cached surface, not only on the inputs
+                    ivol_key = combine_hash(ivol_key, frame_hash(final_df))
+                else:
+                    final_df = solve_stage(final_df)
+                metrics.record_stage("ivol", time.perf_counter() - started, len(final_df))
+
+                logger.info(f"DataFrame shape after ivol API calls: {final_df.shape}")
+                _persist_stage(final_df, "ivol", valuation_date, persist)
+            else:
+                logger.warning("Skipping IVOL API call — final_df is empty.")
+
+            # Step 5: Transform to payloads
+            if not final_df.empty:
+                logger.info("STEP 5: Transforming DataFrame to API payloads")
+                # Parquet replaces the CSV output when persisting
+                output_csv = None if persist else "option_price_results_American.csv"
+                price_rows = lambda rows: transform_to_option_api_payloads(
+                    rows, as_of_date=valuation_date, backend=pricing_backend, use_cache=use_cache, output_csv=None,
+                    raise_on_transient=True
+                )[1]
+                started = time.perf_counter()
+                if checkpoint:
+                    priced_key = combine_hash(ivol_key, "priced", pricing_backend, valuation_date)
+                    transformed_df, _ = run_batched_stage("priced", valuation_date, priced_key, final_df, price_rows)
+                    payloads = price_payloads(transformed_df, as_of_date=valuation_date)
+                    if output_csv:
+                        transformed_df.to_csv(output_csv, index=False)
+                else:
+                    payloads, transformed_df = transform_to_option_api_payloads(
+                        final_df, as_of_date=valuation_date, backend=pricing_backend, use_cache=use_cache, output_csv=output_csv
+                    )
+                metrics.record_stage("price", time.perf_counter() - started, len(final_df))
+                logger.info(f"Generated {len(payloads)} API payloads")
+                logger.info(f"Transformed DataFrame shape: {transformed_df.shape}")
+                _persist_stage(transformed_df, "priced", valuation_date, persist)
+            else:
+                logger.warning("Skipping transformation — final_df is empty.")
+                payloads, transformed_df = [], pd.DataFrame()
 
         # Step 6 and 7: Placeholder
         logger.info("STEP 6: API calls (currently commented out)")
         logger.info("STEP 7: Merge and export (currently commented out)")
 
+        # Optional terminal export
+        if excel_output and not transformed_df.empty:
+            export_excel(transformed_df, excel_output)
+
         # Final summary
         logger.info("=" * 60)
         logger.info("OPTIONS MAIN WORKFLOW COMPLETED SUCCESSFULLY")
@@ -78,6 +220,9 @@ def options_main():
         logger.info(f"  - Initial data rows: {len(df)}")
         logger.info(f"  - Final processed rows: {len(transformed_df)}")
         logger.info(f"  - API payloads generated: {len(payloads)}")
+        if use_cache:
+            get_api_cache().log_stats()
+        metrics.log_summary()
         logger.info("=" * 60)
 
         return payloads, transformed_df
@@ -91,17 +236,112 @@ def options_main():
         logger.error("=" * 60)
         raise
 
+def options_main_chunked(chunks=None, chunksize=100_000, ivol_backend="remote", pricing_backend="remote", use_cache=True,
+                         valuation_date="2025-07-21", persist=True, output_csv=None):
+    """
+    Run the workflow chunk by chunk with bounded memory.
+
+    Expiries are loaded once; each chunk of positions (read_csv_chunks by default,
+    or any iterable of DataFrames such as get_data_chunks()) is aligned, IV-solved
+    and priced on its own, and its results are appended to the 'priced' Parquet
+    stage (and to output_csv, if given).
+
+    Returns:
+        dict: input_rows, priced_rows, payloads and output_csv totals for the run
+    """
+    logger.info("=" * 60)
+    logger.info("STARTING OPTIONS MAIN WORKFLOW (CHUNKED)")
+    logger.info("=" * 60)
+
+    if chunks is None:
+        chunks = read_csv_chunks(chunksize=chunksize)
+
+    logger.info("STEP 1.5: Getting expiry date for options from the local expiry index")
+    expiry = load_expiries(valuation_date)
+    logger.info(f"Retrieved expiry data with shape: {expiry.shape}")
+    _persist_stage(expiry, "expiry", valuation_date, persist)
+    # Encode and sort the expiry side once for every chunk
+    join_index = ExpiryJoinIndex.from_expiries(expiry)
+
+    summary = {"input_rows": 0, "priced_rows": 0, "payloads": 0, "output_csv": output_csv}
+    wrote_header = False
+    wrote_stage = False
+    for i, chunk in enumerate(chunks):
+        summary["input_rows"] += len(chunk)
+        if chunk.empty:
+            continue
+        logger.info(f"Processing chunk {i + 1} with {len(chunk)} rows")
+
+        aligned_df = align_option_expiries(chunk, join_index=join_index)
+        ivol_df = call_ivol_api_and_add_to_df(aligned_df, as_of_date=valuation_date, backend=ivol_backend, use_cache=use_cache)
+        payloads, transformed_df = transform_to_option_api_payloads(
+            ivol_df, as_of_date=valuation_date, backend=pricing_backend, use_cache=use_cache, output_csv=None
+        )
+
+        if not transformed_df.empty:
+            if persist:
+                _persist_stage(transformed_df, "priced", valuation_date, persist, append=wrote_stage)
+                wrote_stage = True
+            if output_csv:
+                transformed_df.to_csv(output_csv, mode="a" if wrote_header else "w", header=not wrote_header, index=False)
+                wrote_header = True
+        summary["priced_rows"] += len(transformed_df)
+        summary["payloads"] += len(payloads)
+
+    logger.info("=" * 60)
+    logger.info("OPTIONS MAIN WORKFLOW (CHUNKED) COMPLETED SUCCESSFULLY")
+    logger.info(f"  - Input rows: {summary['input_rows']}")
+    logger.info(f"  - Priced rows: {summary['priced_rows']}")
+    logger.info(f"  - API payloads generated: {summary['payloads']}")
+    if use_cache:
+        get_api_cache().log_stats()
+    logger.info("=" * 60)
+    return summary
+
+
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Options IV and pricing workflow")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the on-disk options API result cache")
+    parser.add_argument("--async", dest="pipeline", action="store_const", const="async", default="sequential",
+                        help="Stream rows through IV and pricing concurrently instead of stage by stage")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Process the positions extract in chunks of this many rows")
+    parser.add_argument("--excel", default=None, help="Also export priced results to this Excel file")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Recompute every stage instead of reusing checkpoints")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only reprice rows whose inputs changed since the last run for the valuation date")
+    parser.add_argument("--vol-surface", action="store_true",
+                        help="Reuse cached vols and interpolate rows without a market price from the vol surface")
+    parser.add_argument("--metrics-out", default=None,
+                        help="Write stage/API/DB metrics to this file (.json, otherwise Prometheus text format)")
+    parser.add_argument("--profile", default=None, help="Profile the run and save the profile to this file")
+    args = parser.parse_args()
+
     logger.info("Starting options main execution")
     try:
-        result = options_main()
-        if result:
-            payloads, transformed_df = result
-            logger.info("Main execution completed successfully")
-            logger.info(f"Generated {len(payloads)} payloads and {len(transformed_df)} transformed rows")
-        else:
-            logger.warning("Main execution completed but returned no results")
+        with profiled(args.profile) if args.profile else contextlib.nullcontext():
+            if args.chunksize:
+                summary = options_main_chunked(chunksize=args.chunksize, use_cache=not args.no_cache)
+                logger.info(f"Main execution completed successfully: {summary}")
+            else:
+                result = options_main(use_cache=not args.no_cache, pipeline=args.pipeline, excel_output=args.excel,
+                                      checkpoint=not args.no_checkpoint, incremental=args.incremental,
+                                      vol_surface=args.vol_surface)
+                if result:
+                    payloads, transformed_df = result
+                    logger.info("Main execution completed successfully")
+                    logger.info(f"Generated {len(payloads)} payloads and {len(transformed_df)} transformed rows")
+                else:
+                    logger.warning("Main execution completed but returned no results")
     except Exception as e:
         logger.error(f"Error in main execution: {str(e)}")
         logger.error(f"Exception type: {type(e).__name__}")
         raise
+    finally:
+        if args.metrics_out:
+            get_metrics().write(args.metrics_out)
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from api_cache import get_api_cache, request_key
+from api_format import fill_default_rf_rate, price_payloads
+from checkpoints import combine_hash, frame_hash, load_checkpoint, save_checkpoint
+from expiry_index import load_expiries as load_expiry_index
+from get_data import align_option_expiries
+from mapping_registry import get_mapping_registry
+from options_api_client import get_options_api_client
+from read_aggregated_valuations import read_csv
+from request_batch import build_ivol_requests
+from storage import write_stage
+
+logger = logging.getLogger(__name__)
+
+
+_DONE = object()
+
+CACHE_WRITE_CHUNK = 500
+
+
+class _CacheWriter:
+    """
+    Buffers fetched results of one endpoint and stores them with one put_many
+    per CACHE_WRITE_CHUNK results instead of one write per row.
+    """
+
+    def __init__(self, cache, endpoint, chunk_size=CACHE_WRITE_CHUNK):
+        self.cache = cache
+        self.endpoint = endpoint
+        self.chunk_size = chunk_size
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, key, result):
+        with self._lock:
+            self._pending.append((key, result))
+            if len(self._pending) < self.chunk_size:
+                return
+            pending, self._pending = self._pending, []
+        self.cache.put_many(self.endpoint, pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        self.cache.put_many(self.endpoint, pending)
+
+
+def _cached_single(cache, writer, args, fetch_one):
+    """
+    Resolve one request through the cache (if any), calling fetch_one(args) on a
+    miss; fetched results are queued on writer for the next cache write.
+    """
+    if cache is None:
+        return fetch_one(args)
+    key = request_key(writer.endpoint, args)
+    found = cache.get_many([key])
+    if key in found:
+        return found[key]
+    result = fetch_one(args)
+    writer.add(key, result)
+    return result
+
+
+async def _ivol_worker(ivol_queue, price_queue, ivols, payloads, run_blocking, client, cache, writer):
+    while True:
+        item = await ivol_queue.get()
+        if item is _DONE:
+            ivol_queue.task_done()
+            return
+        pos, idx, args = item
+        try:
+            ivol = await run_blocking(_cached_single, cache, writer, args, lambda a: client.get_ivol(**a))
+            ivols[pos] = ivol
+            price_args = {k: v for k, v in args.items() if k != "value"}
+            price_args["ivol"] = ivol
+            payloads[pos] = price_args
+            # Blocks when the pricing stage falls behind
+            await price_queue.put((pos, idx, price_args))
+        except Exception as e:
+            logger.warning(f"Row {idx} ivol failed: {e}")
+        finally:
+            ivol_queue.task_done()
+
+
+async def _price_worker(price_queue, prices, run_blocking, client, cache, writer):
+    while True:
+        item = await price_queue.get()
+        if item is _DONE:
+            price_queue.task_done()
+            return
+        pos, idx, args = item
+        try:
+            result = await run_blocking(_cached_single, cache, writer, args, lambda a: client.get_price_vanilla(**a))
+            prices[pos] = float(result["price"])
+        except Exception as e:
+            logger.warning(f"Row {idx} price failed: {e}")
+        finally:
+            price_queue.task_done()
+
+
+async def _stream_rows(df, batch, client, cache, workers, queue_size, run_blocking):
+    """
+    Push every request of batch through the getIVol -> getPriceVanilla queues.
+    Fetched results are written to the cache in chunks, and the rest once each
+    stage has drained.
+
+    Returns:
+        tuple: (ivols, prices, payloads) per row of df; payloads[i] is None for rows without a price request
+    """
+    n = len(df)
+    ivols = np.full(n, np.nan)
+    prices = np.full(n, np.nan)
+    payloads = [None] * n
+
+    ivol_queue = asyncio.Queue(maxsize=queue_size)
+    price_queue = asyncio.Queue(maxsize=queue_size)
+    ivol_writer = _CacheWriter(cache, "getIVol")
+    price_writer = _CacheWriter(cache, "getPriceVanilla")
+    ivol_tasks = [asyncio.create_task(_ivol_worker(ivol_queue, price_queue, ivols, payloads, run_blocking, client, cache, ivol_writer)) for _ in range(workers)]
+    price_tasks = [asyncio.create_task(_price_worker(price_queue, prices, run_blocking, client, cache, price_writer)) for _ in range(workers)]
+
+    try:
+        for idx, pos, args in zip(batch.index, batch.records["row"], batch.to_request_args()):
+            await ivol_queue.put((pos, idx, args))
+        for _ in ivol_tasks:
+            await ivol_queue.put(_DONE)
+        await asyncio.gather(*ivol_tasks)
+        for _ in price_tasks:
+            await price_queue.put(_DONE)
+        await asyncio.gather(*price_tasks)
+    finally:
+        if cache is not None:
+            ivol_writer.flush()
+            price_writer.flush()
+    return ivols, prices, payloads
+
+
+async def run_async_pipeline(
+    as_of_date="2025-07-21",
+    scheme="American",
+    model="BSM",
+    client=None,
+    use_cache=True,
+    queue_size=256,
+    output_csv="option_price_results_American.csv",
+    load_positions=read_csv,
+    load_expiries=load_expiry_index,
+    persist=False,
+    checkpoint=False,
+):
+    """
+    Streaming variant of options_main against the remote options API.
+
+    Position loading and the expiry query run concurrently. Each row is then
+    priced as soon as its implied vol arrives: rows flow through bounded
+    asyncio queues from the getIVol workers to the getPriceVanilla workers, so
+    pricing starts before the IV stage has finished the book and a slow stage
+    applies backpressure to the one before it. load_positions and
+    load_expiries default to the same sources options_main uses.
+
+    With persist=True the positions, expiry, aligned and priced frames are
+    written as Parquet stages under as_of_date, like options_main does. With
+    checkpoint=True the priced rows are checkpointed under a hash of the
+    positions, expiries and mapping version, and a rerun with unchanged inputs
+    reuses them without calling the API. Streaming has no row batches to
+    resume from, so an interrupted run starts over.
+
+    Returns:
+        tuple: (payloads, transformed_df) like options_main
+    """
+    client = client or get_options_api_client()
+    cache = get_api_cache() if use_cache else None
+    # Split the client's concurrency between the two API stages
+    workers = max(1, client.max_concurrency // 2)
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=2 * workers)
+
+    async def run_blocking(func, *args):
+        return await loop.run_in_executor(executor, func, *args)
+
+    try:
+        # Step 1 / 1.5: positions and expiries concurrently
+        logger.info("ASYNC STEP 1: Loading positions and expiry data concurrently")
+        df, expiry = await asyncio.gather(run_blocking(load_positions), run_blocking(load_expiries, as_of_date))
+        if df is None or df.empty:
+            logger.error("No data retrieved! Terminating workflow.")
+            return [], pd.DataFrame()
+        logger.info(f"Positions: {df.shape}, expiries: {expiry.shape}")
+        if persist:
+            write_stage(df, "positions", as_of_date)
+            write_stage(expiry, "expiry", as_of_date)
+
+        key = combine_hash(frame_hash(df), frame_hash(expiry), get_mapping_registry().version, scheme, model, as_of_date)
+        transformed_df = load_checkpoint("priced_async", as_of_date, key) if checkpoint else None
+        if transformed_df is not None:
+            payloads = price_payloads(transformed_df, as_of_date, scheme, model)
+        else:
+            # Step 2: Align
+            logger.info("ASYNC STEP 2: Aligning option expiries")
+            df = align_option_expiries(df, expiry)
+            if persist:
+                write_stage(df, "aligned", as_of_date)
+            fill_default_rf_rate(df)
+            batch, rejections = build_ivol_requests(df, as_of_date, scheme, model)
+
+            # Step 3: Stream IV -> price
+            logger.info(f"ASYNC STEP 3: Streaming {len(batch)} rows through IV and pricing with {workers} workers per stage")
+            ivols, prices, payloads = await _stream_rows(df, batch, client, cache, workers, queue_size, run_blocking)
+            df["computed_ivol"] = ivols
+            df["computed_value"] = prices
+
+            # Keep rows that produced a pricing request, matching transform_to_option_api_payloads
+            priced = np.array([p is not None for p in payloads], dtype=bool)
+            exposures = df["exposure"].tolist() if "exposure" in df.columns else [None] * len(df)
+            payloads = [dict(p, exposure=e) for p, e in zip(payloads, exposures) if p is not None]
+            transformed_df = df[priced]
+            if checkpoint:
+                save_checkpoint(transformed_df, "priced_async", as_of_date, key)
+    finally:
+        executor.shutdown(wait=False)
+
+    if persist:
+        write_stage(transformed_df, "priced", as_of_date)
+    if output_csv:
+        transformed_df.to_csv(output_csv, index=False)
+        logger.info(f"Saved {len(transformed_df)} priced rows to {output_csv}")
+    if cache is not None:
+        cache.log_stats()
+    return payloads, transformed_df
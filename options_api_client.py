@@ -0,0 +1,301 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+OPTIONS_API_BASE_URL = "https://options-api.mosaic.hartreepartners.com/options/api/v1"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Responses meaning the server has no batch route
+BATCH_UNSUPPORTED_STATUS_CODES = {404, 405, 501}
+
+BATCH_FORMATS = ("json", "arrow")
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+IVOL_FIELDS = ["as_of_date", "expiration_date", "strike", "parity", "future_value", "value", "rf_rate", "scheme", "model"]
+PRICE_FIELDS = ["as_of_date", "expiration_date", "strike", "parity", "future_value", "ivol", "rf_rate", "scheme", "model"]
+
+
+class BatchNotSupported(Exception):
+    """Raised when the options API does not expose a batch route."""
+
+
+class BatchRowError(Exception):
+    """Error reported by the server for a single row of a batch request."""
+
+
+class TransientApiError(Exception):
+    """Raised when requests failed for reasons a later retry may fix (timeouts, 5xx, 429)."""
+
+
+def is_transient_error(exc):
+    """
+    True for failures worth retrying later: connection problems, timeouts and retryable HTTP statuses.
+    """
+    if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRY_STATUS_CODES
+    return False
+
+
+def encode_arrow_rows(rows):
+    import pyarrow as pa
+
+    table = pa.Table.from_pylist(rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_arrow_rows(payload):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(payload).read_all().to_pylist()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows bursts of up to `capacity` requests and
+    refills at `rate` tokens per second.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class OptionsApiClient:
+    """
+    Shared client for the options API.
+
+    Requests go through one pooled requests.Session, at most `max_concurrency`
+    at a time, paced by a token bucket of `rate_per_second`. Timeouts,
+    connection errors and 429/5xx responses are retried with jittered
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url=OPTIONS_API_BASE_URL,
+        max_concurrency=8,
+        rate_per_second=50.0,
+        burst=None,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_max=8.0,
+        timeout=(5.0, 30.0),
+        verify=False,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.verify = verify
+        self.rate_limiter = TokenBucket(rate_per_second, burst)
+        self.batch_supported = None  # unknown until the first batch request
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform over [0, min(cap, base * 2^attempt)]
+        return random.uniform(0.0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, path, params=None):
+        """
+        GET base_url/path with rate limiting and retries. Raises the last
+        requests exception once retries are exhausted.
+        """
+        return self._request("GET", path, params=params)
+
+    def post(self, path, data=None, json=None, headers=None):
+        """
+        POST base_url/path with the same rate limiting and retries as get().
+        """
+        return self._request("POST", path, data=data, json=json, headers=headers)
+
+    def _request(self, method, path, **kwargs):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        endpoint = path.lstrip("/").split("/", 1)[0]
+        metrics = get_metrics()
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, verify=self.verify, **kwargs)
+                metrics.observe("api_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    logger.debug(f"Retrying {url} after HTTP {response.status_code} (attempt {attempt + 1})")
+                    metrics.inc("api_request_retries_total", endpoint=endpoint)
+                    time.sleep(self._backoff(attempt))
+                    continue
+                if response.status_code >= 400:
+                    metrics.inc("api_request_errors_total", endpoint=endpoint, status=response.status_code)
+                response.raise_for_status()
+                return response
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                metrics.observe("api_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+                if attempt >= self.max_retries:
+                    metrics.inc("api_request_errors_total", endpoint=endpoint, status=type(e).__name__)
+                    raise
+                logger.debug(f"Retrying {url} after {type(e).__name__} (attempt {attempt + 1})")
+                metrics.inc("api_request_retries_total", endpoint=endpoint)
+                time.sleep(self._backoff(attempt))
+
+    def get_ivol(self, as_of_date, expiration_date, strike, parity, future_value, value, rf_rate, scheme="American", model="BSM"):
+        path = f"getIVol/{as_of_date}/{expiration_date}/{strike}/{parity}/{future_value}/{value}/{rf_rate}"
+        response = self.get(path, params={"scheme": scheme, "model": model})
+        return float(response.text)
+
+    def get_price_vanilla(self, as_of_date, expiration_date, strike, parity, future_value, ivol, rf_rate, scheme="American", model="BSM"):
+        path = f"getPriceVanilla/{as_of_date}/{expiration_date}/{strike}/{parity}/{future_value}/{ivol}/{rf_rate}"
+        response = self.get(path, params={"scheme": scheme, "model": model})
+        return response.json()
+
+    def post_batch(self, endpoint, rows, fmt="json"):
+        """
+        POST one chunk of rows to the batch route of `endpoint` (e.g. getIVol -> getIVolBatch).
+
+        Returns:
+            list: One entry per row; the server's result or a BatchRowError
+        Raises:
+            BatchNotSupported: If the server has no batch route
+        """
+        if fmt not in BATCH_FORMATS:
+            raise ValueError(f"Unknown batch format '{fmt}', expected one of {BATCH_FORMATS}")
+        path = f"{endpoint}Batch"
+        try:
+            if fmt == "arrow":
+                response = self.post(path, data=encode_arrow_rows(rows), headers={"Content-Type": ARROW_CONTENT_TYPE, "Accept": ARROW_CONTENT_TYPE})
+                records = decode_arrow_rows(response.content)
+                errors = [r.pop("error", None) for r in records]
+                results = [r["result"] if "result" in r else r for r in records]
+            else:
+                body = self.post(path, json={"rows": rows}).json()
+                results = body["results"]
+                errors = body.get("errors") or [None] * len(results)
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code in BATCH_UNSUPPORTED_STATUS_CODES:
+                raise BatchNotSupported(f"{path} returned HTTP {e.response.status_code}") from e
+            raise
+
+        if len(results) != len(rows):
+            raise ValueError(f"{path} returned {len(results)} results for {len(rows)} rows")
+        return [BatchRowError(err) if err else res for res, err in zip(results, errors)]
+
+    def call_batched(self, endpoint, rows, single_call, chunk_size=500, fmt="json"):
+        """
+        Send rows to `endpoint` in chunks of chunk_size through the batch route,
+        falling back to one single_call(client, row) per row when the server
+        does not support batching.
+
+        Returns:
+            list: One entry per row in input order; the result or an exception
+        """
+        if self.batch_supported is not False and rows:
+            chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+            chunk_results = self.map(lambda c, chunk: c.post_batch(endpoint, chunk, fmt), chunks)
+
+            if not any(isinstance(r, BatchNotSupported) for r in chunk_results):
+                self.batch_supported = True
+                results = []
+                for chunk, chunk_result in zip(chunks, chunk_results):
+                    if isinstance(chunk_result, Exception):
+                        results.extend([chunk_result] * len(chunk))
+                    else:
+                        results.extend(chunk_result)
+                return results
+
+            logger.warning(f"Options API has no batch route for {endpoint}, falling back to per-row calls")
+            self.batch_supported = False
+
+        return self.map(single_call, rows)
+
+    def get_ivol_batch(self, rows, chunk_size=500, fmt="json"):
+        """
+        Implied vols for a list of getIVol argument dicts (see IVOL_FIELDS).
+        """
+        rows = [{k: row[k] for k in IVOL_FIELDS} for row in rows]
+        results = self.call_batched("getIVol", rows, lambda c, row: c.get_ivol(**row), chunk_size, fmt)
+        return [r if isinstance(r, Exception) else float(r) for r in results]
+
+    def get_price_vanilla_batch(self, rows, chunk_size=500, fmt="json"):
+        """
+        Vanilla prices for a list of getPriceVanilla argument dicts (see PRICE_FIELDS).
+        Each result is the same JSON object the per-row route returns.
+        """
+        rows = [{k: row[k] for k in PRICE_FIELDS} for row in rows]
+        return self.call_batched("getPriceVanilla", rows, lambda c, row: c.get_price_vanilla(**row), chunk_size, fmt)
+
+    def map(self, func, items):
+        """
+        Apply func(client, item) to every item with bounded concurrency.
+
+        Returns:
+            list: One entry per item in input order; either the result or the
+            exception raised for that item
+        """
+        def _call(item):
+            try:
+                return func(self, item)
+            except Exception as e:
+                return e
+
+        if self.max_concurrency <= 1:
+            return [_call(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            return list(executor.map(_call, items))
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_options_api_client():
+    """
+    Return the process-wide OptionsApiClient, creating it on first use.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OptionsApiClient()
+        return _default_client
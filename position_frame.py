@@ -0,0 +1,46 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# Typed layout of a positions frame, applied once at ingestion. Labels repeat
+# across rows, so they are categoricals; dates are datetime64 so no stage
+# re-parses strings.
+CATEGORY_COLUMNS = ["strategy_id", "exposure", "option_type", "instrument_type"]
+FLOAT_COLUMNS = ["market_price", "future_value", "strike", "rf_rate"]
+DATE_COLUMNS = ["end_date"]
+
+
+def as_position_frame(df):
+    """
+    Convert the position columns of df in place to their typed layout:
+    CATEGORY_COLUMNS to categoricals (strategy_id with string labels),
+    FLOAT_COLUMNS to float64 and DATE_COLUMNS to datetime64[ns].
+
+    Columns already in their target dtype are left untouched, so calling it on
+    an already typed frame costs nothing. Unparseable values become NaN/NaT.
+
+    Returns:
+        pd.DataFrame: df itself
+    """
+    if df is None:
+        return df
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            values = df[column]
+            if column == "strategy_id":
+                # Numeric ids with gaps arrive as floats; label them '124', not '124.0'
+                if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+                    values = values.astype("Int64")
+                values = values.astype("string")
+            df[column] = values.astype("category")
+    for column in FLOAT_COLUMNS:
+        if column in df.columns and df[column].dtype != np.float64:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(np.float64)
+    for column in DATE_COLUMNS:
+        if column in df.columns and df[column].dtype != "datetime64[ns]":
+            df[column] = pd.to_datetime(df[column], errors="coerce").astype("datetime64[ns]")
+    return df
@@ -0,0 +1,412 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DAYS_PER_YEAR = 365.0
+SUPPORTED_SCHEMES = ("American", "European")
+SUPPORTED_MODELS = ("BSM",)
+
+# Implied vol search bracket
+IVOL_LOWER = 1e-4
+IVOL_UPPER = 5.0
+
+_SQRT_2PI = np.sqrt(2.0 * np.pi)
+
+
+def _npdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def year_fraction(as_of_date, expiry):
+    """
+    ACT/365 year fraction between as_of_date and each expiry.
+
+    Parameters:
+        as_of_date (str | datetime): Valuation date
+        expiry (array-like): Expiry dates (anything pd.to_datetime accepts)
+
+    Returns:
+        np.ndarray: Year fractions as float64 (NaN where expiry is missing)
+    """
+    as_of = pd.Timestamp(as_of_date).normalize()
+    expiry = pd.to_datetime(pd.Series(expiry), errors="coerce").dt.normalize()
+    return ((expiry - as_of).dt.days / DAYS_PER_YEAR).to_numpy(dtype=float)
+
+
+def parity_to_is_call(parity):
+    """
+    Convert an array of option_type / parity strings ('Call', 'put', 'C', ...) to a boolean call mask.
+    """
+    parity = pd.Series(np.asarray(parity, dtype=object)).astype(str).str.strip().str.upper().str[0]
+    return (parity == "C").to_numpy()
+
+
+def _check_scheme(scheme, model="BSM"):
+    if scheme not in SUPPORTED_SCHEMES:
+        raise ValueError(f"Unsupported scheme '{scheme}', expected one of {SUPPORTED_SCHEMES}")
+    if model not in SUPPORTED_MODELS:
+        raise ValueError(f"Unsupported model '{model}' for the local engine, expected one of {SUPPORTED_MODELS}")
+
+
+def _broadcast(*arrays):
+    arrays = [np.atleast_1d(np.asarray(a, dtype=float)) for a in arrays]
+    return [np.array(a) for a in np.broadcast_arrays(*arrays)]
+
+
+def black76_price(F, K, T, r, sigma, is_call):
+    """
+    Black-76 price of a European option on a future.
+
+    All inputs are broadcast against each other; is_call is a boolean mask.
+    Expired options (T <= 0) or zero vol return discounted intrinsic value.
+    """
+    F, K, T, r, sigma = _broadcast(F, K, T, r, sigma)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+
+    T_pos = np.maximum(T, 0.0)
+    discount = np.exp(-r * T_pos)
+    vol_sqrt_t = sigma * np.sqrt(T_pos)
+    live = vol_sqrt_t > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = np.where(live, (np.log(F / K) + 0.5 * vol_sqrt_t ** 2) / vol_sqrt_t, 0.0)
+    d2 = d1 - vol_sqrt_t
+
+    call = discount * (F * ndtr(d1) - K * ndtr(d2))
+    put = discount * (K * ndtr(-d2) - F * ndtr(-d1))
+    price = np.where(is_call, call, put)
+
+    intrinsic = discount * np.where(is_call, np.maximum(F - K, 0.0), np.maximum(K - F, 0.0))
+    return np.where(live, price, intrinsic)
+
+
+def black76_vega(F, K, T, r, sigma):
+    """
+    Black-76 vega (price sensitivity to a unit change in sigma), identical for calls and puts.
+    """
+    F, K, T, r, sigma = _broadcast(F, K, T, r, sigma)
+    T_pos = np.maximum(T, 0.0)
+    vol_sqrt_t = sigma * np.sqrt(T_pos)
+    live = vol_sqrt_t > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = np.where(live, (np.log(F / K) + 0.5 * vol_sqrt_t ** 2) / vol_sqrt_t, 0.0)
+    return np.where(live, F * np.exp(-r * T_pos) * _npdf(d1) * np.sqrt(T_pos), 0.0)
+
+
+def _baw_critical_price(K, T, r, sigma, is_call, max_iter=50, tol=1e-8):
+    """
+    Vectorized Newton search for the Barone-Adesi-Whaley early-exercise boundary
+    of an option on a future (cost of carry b = 0).
+    """
+    vol_sqrt_t = sigma * np.sqrt(T)
+    discount = np.exp(-r * T)
+    M = 2.0 * r / sigma ** 2
+    K_h = 1.0 - discount
+
+    sign = np.where(is_call, 1.0, -1.0)
+    q = 0.5 * (1.0 + sign * np.sqrt(1.0 + 4.0 * M / K_h))
+    q_inf = 0.5 * (1.0 + sign * np.sqrt(1.0 + 4.0 * M))
+    # An infinite vol makes M = 0 and q_inf 0 or 1, so s_inf and the seeds overflow; those rows end up NaN
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s_inf = K / (1.0 - 1.0 / q_inf)
+
+        # Haug's seed values
+        h_call = -2.0 * vol_sqrt_t * K / (s_inf - K)
+        h_put = -2.0 * vol_sqrt_t * K / (K - s_inf)
+    s = np.where(
+        is_call,
+        K + (s_inf - K) * (1.0 - np.exp(h_call)),
+        s_inf + (K - s_inf) * np.exp(h_put),
+    )
+
+    active = np.arange(s.shape[0])
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        sa, Ka, qa, da, va, ca, sg = s[active], K[active], q[active], discount[active], vol_sqrt_t[active], is_call[active], sign[active]
+        d1 = (np.log(sa / Ka) + 0.5 * va ** 2) / va
+        euro = black76_price(sa, Ka, T[active], r[active], sigma[active], ca)
+        n_d1 = ndtr(sg * d1)
+        lhs = sg * (sa - Ka)
+        rhs = euro + sg * (1.0 - da * n_d1) * sa / qa
+        density = da * _npdf(d1) / va
+        slope = np.where(
+            ca,
+            da * n_d1 * (1.0 - 1.0 / qa) + (1.0 - density) / qa,
+            -da * n_d1 * (1.0 - 1.0 / qa) - (1.0 + density) / qa,
+        )
+        step = np.where(ca, (Ka + rhs - slope * sa) / (1.0 - slope), (Ka - rhs + slope * sa) / (1.0 + slope))
+        moving = np.abs(lhs - rhs) / Ka > tol
+        s[active[moving]] = step[moving]
+        active = active[moving]
+
+    return s, q, discount
+
+
+def baw_price(F, K, T, r, sigma, is_call):
+    """
+    Barone-Adesi-Whaley approximation for an American option on a future.
+
+    Falls back to Black-76 where early exercise has no value (r <= 0) and to
+    intrinsic value for expired or zero-vol rows.
+    """
+    F, K, T, r, sigma = _broadcast(F, K, T, r, sigma)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+
+    euro = black76_price(F, K, T, r, sigma, is_call)
+    intrinsic = np.where(is_call, np.maximum(F - K, 0.0), np.maximum(K - F, 0.0))
+
+    early = (T > 0) & (sigma > 0) & (r > 0) & np.isfinite(F) & np.isfinite(K)
+    price = np.where((T > 0) & (sigma > 0), euro, intrinsic)
+    if not early.any():
+        return price
+
+    Ke, Te, re, se, ce = K[early], T[early], r[early], sigma[early], is_call[early]
+    s_crit, q, discount = _baw_critical_price(Ke, Te, re, se, ce)
+    price[early] = _baw_american(F[early], Ke, Te, se, ce, euro[early], s_crit, q, discount)
+    return price
+
+
+def _baw_american(F, K, T, sigma, is_call, euro, s_crit, q, discount):
+    """
+    BAW price from the early-exercise boundary s_crit (with its q and discount)
+    and the Black-76 price euro; inputs broadcast against F.
+    """
+    vol_sqrt_t = sigma * np.sqrt(T)
+    d1 = (np.log(s_crit / K) + 0.5 * vol_sqrt_t ** 2) / vol_sqrt_t
+    sign = np.where(is_call, 1.0, -1.0)
+    A = sign * (s_crit / q) * (1.0 - discount * ndtr(sign * d1))
+
+    exercise = np.where(is_call, F >= s_crit, F <= s_crit)
+    with np.errstate(over="ignore"):
+        american = np.where(exercise, sign * (F - K), euro + A * (F / s_crit) ** q)
+    return np.maximum(american, euro)
+
+
+def baw_price_ladder(F, K, T, r, sigma, is_call):
+    """
+    BAW prices of n contracts at m future levels each.
+
+    F is (n, m) and the other inputs are per contract (n,). The exercise
+    boundary does not depend on F, so it is solved once per contract and
+    shared by all of its levels.
+    """
+    F = np.asarray(F, dtype=float)
+    K, T, r, sigma = (np.broadcast_to(np.asarray(a, dtype=float), F.shape[:1]) for a in (K, T, r, sigma))
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape[:1])
+
+    euro = black76_price(F, K[:, None], T[:, None], r[:, None], sigma[:, None], is_call[:, None])
+    intrinsic = np.where(is_call[:, None], np.maximum(F - K[:, None], 0.0), np.maximum(K[:, None] - F, 0.0))
+
+    early = (T > 0) & (sigma > 0) & (r > 0) & np.isfinite(K)
+    price = np.where(((T > 0) & (sigma > 0))[:, None], euro, intrinsic)
+    if not early.any():
+        return price
+
+    Ke, Te, re, se, ce = K[early], T[early], r[early], sigma[early], is_call[early]
+    s_crit, q, discount = _baw_critical_price(Ke, Te, re, se, ce)
+    columns = [a[:, None] for a in (Ke, Te, se, ce)]
+    price[early] = _baw_american(F[early], *columns, euro[early], s_crit[:, None], q[:, None], discount[:, None])
+    return price
+
+
+def option_price(F, K, T, r, sigma, is_call, scheme="American", model="BSM"):
+    """
+    Price options on futures with the local engine: Black-76 for European,
+    Barone-Adesi-Whaley for American.
+    """
+    _check_scheme(scheme, model)
+    if scheme == "European":
+        return black76_price(F, K, T, r, sigma, is_call)
+    return baw_price(F, K, T, r, sigma, is_call)
+
+
+def option_price_ladder(F, K, T, r, sigma, is_call, scheme="American", model="BSM"):
+    """
+    option_price of n contracts at m future levels each: F is (n, m), the other
+    inputs are per contract (n,).
+    """
+    _check_scheme(scheme, model)
+    if scheme == "European":
+        columns = [np.asarray(a)[:, None] for a in (K, T, r, sigma, is_call)]
+        return black76_price(F, *columns)
+    return baw_price_ladder(F, K, T, r, sigma, is_call)
+
+
+def implied_vol(price, F, K, T, r, is_call, scheme="American", model="BSM", tol=1e-8, max_iter=100):
+    """
+    Vectorized implied volatility solver (Newton steps safeguarded by bisection).
+
+    Each iteration keeps a bracket [lo, hi] around the root and takes a Newton
+    step (analytic Black-76 vega for European, a central-difference vega of the
+    BAW price for American). A step that leaves the bracket or fails to halve
+    the previous step is replaced by bisection, so every row converges even
+    where vega is tiny or the American price has a kink. Rows whose price is
+    outside the attainable range (at or below the IVOL_LOWER price, above the
+    IVOL_UPPER price) or has invalid inputs come back as NaN.
+
+    Returns:
+        np.ndarray: Implied vols as float64
+    """
+    _check_scheme(scheme, model)
+    price, F, K, T, r = _broadcast(price, F, K, T, r)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+
+    def _price(sigma, rows):
+        return option_price(F[rows], K[rows], T[rows], r[rows], sigma, is_call[rows], scheme, model)
+
+    def _vega(sigma, rows):
+        if scheme == "European":
+            return black76_vega(F[rows], K[rows], T[rows], r[rows], sigma)
+        bump = 1e-4 * np.maximum(sigma, 1e-2)
+        return (_price(sigma + bump, rows) - _price(sigma - bump, rows)) / (2.0 * bump)
+
+    result = np.full(F.shape, np.nan)
+    valid = (
+        np.isfinite(price) & np.isfinite(F) & np.isfinite(K) & np.isfinite(T) & np.isfinite(r)
+        & (price > 0) & (F > 0) & (K > 0) & (T > 0)
+    )
+    if not valid.any():
+        return result
+
+    idx = np.flatnonzero(valid)
+    lo = np.full(idx.shape, IVOL_LOWER)
+    hi = np.full(idx.shape, IVOL_UPPER)
+    target = price[idx]
+
+    # Prices at (or below) the low-vol floor carry no vol information, e.g. deep ITM
+    # American options trading at intrinsic
+    in_range = (_price(lo, idx) + tol < target) & (target <= _price(hi, idx))
+    idx, lo, hi, target = idx[in_range], lo[in_range], hi[in_range], target[in_range]
+
+    # Brenner-Subrahmanyam seed, clipped into the bracket
+    sigma = np.sqrt(2.0 * np.pi / T[idx]) * target / F[idx]
+    sigma = np.clip(np.nan_to_num(sigma, nan=0.3), lo * 2, hi / 2)
+    last_step = hi - lo
+
+    converged = np.zeros(idx.shape, dtype=bool)
+    for _ in range(max_iter):
+        active = ~converged
+        if not active.any():
+            break
+        a_idx = idx[active]
+        s = sigma[active]
+        diff = _price(s, a_idx) - target[active]
+
+        a_lo = np.where(diff < 0, s, lo[active])
+        a_hi = np.where(diff > 0, s, hi[active])
+        lo[active], hi[active] = a_lo, a_hi
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton = s - diff / _vega(s, a_idx)
+        step = np.abs(newton - s)
+        use_bisect = (
+            ~np.isfinite(newton) | (newton <= a_lo) | (newton >= a_hi)
+            | (step > 0.5 * last_step[active])
+        )
+        next_sigma = np.where(use_bisect, 0.5 * (a_lo + a_hi), newton)
+        last_step[active] = np.abs(next_sigma - s)
+
+        done = (np.abs(diff) < tol) | (a_hi - a_lo < tol)
+        sigma[active] = np.where(done, s, next_sigma)
+        converged[active] = done
+
+    if not converged.all():
+        logger.warning(f"Implied vol solver did not converge for {(~converged).sum()} rows")
+    result[idx[converged]] = sigma[converged]
+    return result
+
+
+def black76_greeks(F, K, T, r, sigma, is_call):
+    """
+    Analytic Black-76 price and Greeks.
+
+    Greeks are raw partial derivatives: delta and gamma w.r.t. the future price,
+    vega per unit of sigma, theta per year of calendar time (dV/dt = -dV/dT).
+
+    Returns:
+        dict: price, delta, gamma, vega, theta arrays
+    """
+    F, K, T, r, sigma = _broadcast(F, K, T, r, sigma)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+
+    price = black76_price(F, K, T, r, sigma, is_call)
+    T_pos = np.maximum(T, 0.0)
+    sqrt_t = np.sqrt(T_pos)
+    vol_sqrt_t = sigma * sqrt_t
+    live = vol_sqrt_t > 0
+    discount = np.exp(-r * T_pos)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = np.where(live, (np.log(F / K) + 0.5 * vol_sqrt_t ** 2) / vol_sqrt_t, 0.0)
+        density = discount * _npdf(d1)
+        delta = np.where(is_call, discount * ndtr(d1), -discount * ndtr(-d1))
+        gamma = np.where(live, density / (F * vol_sqrt_t), 0.0)
+        vega = np.where(live, F * density * sqrt_t, 0.0)
+        theta = np.where(live, -F * density * sigma / (2.0 * sqrt_t) + r * price, r * price)
+
+    # Expired / zero-vol rows: intrinsic delta, no curvature
+    itm = np.where(is_call, F > K, F < K)
+    delta = np.where(live, delta, np.where(itm, np.where(is_call, discount, -discount), 0.0))
+    return {"price": price, "delta": delta, "gamma": gamma, "vega": vega, "theta": theta}
+
+
+def baw_greeks(F, K, T, r, sigma, is_call):
+    """
+    Barone-Adesi-Whaley price and Greeks by central finite differences.
+
+    Uses the same units as black76_greeks. All bumps are evaluated as whole-array
+    repricings, so the cost is a fixed number of vectorized BAW passes.
+    """
+    F, K, T, r, sigma = _broadcast(F, K, T, r, sigma)
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), F.shape)
+
+    price = baw_price(F, K, T, r, sigma, is_call)
+
+    dF = 1e-3 * np.abs(F)
+    up = baw_price(F + dF, K, T, r, sigma, is_call)
+    down = baw_price(F - dF, K, T, r, sigma, is_call)
+
+    dvol = 1e-4 * np.maximum(sigma, 1e-2)
+    vol_up = baw_price(F, K, T, r, sigma + dvol, is_call)
+    # inf - inf for an infinite vol; that row's price is already NaN
+    with np.errstate(invalid="ignore"):
+        vol_down = baw_price(F, K, T, r, np.maximum(sigma - dvol, 0.0), is_call)
+
+    # One calendar day forward, capped at expiry
+    dT = np.minimum(1.0 / DAYS_PER_YEAR, np.maximum(T, 0.0))
+    decayed = baw_price(F, K, T - dT, r, sigma, is_call)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = (up - down) / (2.0 * dF)
+        gamma = (up - 2.0 * price + down) / dF ** 2
+        vega = (vol_up - vol_down) / (sigma + dvol - np.maximum(sigma - dvol, 0.0))
+        theta = np.where(dT > 0, (decayed - price) / dT, 0.0)
+    return {"price": price, "delta": delta, "gamma": gamma, "vega": vega, "theta": theta}
+
+
+def price_vanilla(strike, parity, future_value, ivol, rf_rate, expiry, as_of_date="2025-07-21", scheme="American", model="BSM"):
+    """
+    Columnar vanilla pricer: one NumPy pass over the whole book.
+
+    Parameters:
+        strike, future_value, ivol, rf_rate (array-like): Numeric inputs per row
+        parity (array-like): 'Call' / 'Put' per row
+        expiry (array-like): Option expiry dates per row
+        as_of_date (str): Valuation date
+        scheme (str): 'American' (Barone-Adesi-Whaley) or 'European' (Black-76)
+
+    Returns:
+        pd.DataFrame: price, delta, gamma, vega, theta per input row
+        (NaN where inputs are missing)
+    """
+    _check_scheme(scheme, model)
+    T = year_fraction(as_of_date, expiry)
+    is_call = parity_to_is_call(parity)
+    greeks = black76_greeks if scheme == "European" else baw_greeks
+    result = greeks(future_value, strike, T, rf_rate, ivol, is_call)
+    return pd.DataFrame(result)
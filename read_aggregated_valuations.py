@@ -1,18 +1,56 @@
 import pandas as pd
 
+from position_frame import as_position_frame
+
 csv_path = r"C:\Users\ktandon\OneDrive - Hartree Partners\Desktop\Options_testing\aggregated_valuations_202507241548.csv"
 
+# Columns the options workflow needs from aggregated_valuations
+POSITION_COLUMNS = [
+    "strategy_id", "exposure", "end_date", "market_price", "instrument_type",
+    "future_value", "option_type", "strike", "rf_rate",
+]
+# Parsed as text so ids like '0743' keep their leading zeros
+TEXT_COLUMNS = {"strategy_id": str}
+
+
 def read_csv():
     try:
-        df = pd.read_csv(csv_path)
+        df = as_position_frame(pd.read_csv(csv_path, dtype=TEXT_COLUMNS))
         print(f"✅ Successfully loaded: {csv_path}")
         print(f"Shape: {df.shape}")
         print(f"Columns: {list(df.columns)}")
-        print(df.head())
         return df
     except Exception as e:
         print(f"❌ Error reading CSV: {e}")
         return None
 
+
+def read_csv_chunks(path=csv_path, chunksize=100_000):
+    """
+    Stream the aggregated valuations extract in chunks.
+
+    Only POSITION_COLUMNS (plus position_type for filtering) are parsed, and each
+    chunk is filtered to instrument_type = 'Option' and position_type = 'exposure'
+    before it is yielded, so memory is bounded by chunksize rather than file size.
+
+    Yields:
+        pd.DataFrame: Filtered chunk with POSITION_COLUMNS, typed by as_position_frame
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in POSITION_COLUMNS + ["position_type"] if c in header]
+
+    total_rows = 0
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=TEXT_COLUMNS, chunksize=chunksize):
+        if "instrument_type" in chunk.columns:
+            chunk = chunk[chunk["instrument_type"] == "Option"]
+        if "position_type" in chunk.columns:
+            chunk = chunk[chunk["position_type"] == "exposure"].drop(columns=["position_type"])
+        total_rows += len(chunk)
+        yield as_position_frame(chunk.reset_index(drop=True))
+    print(f"✅ Streamed {total_rows} option rows from: {path}")
+
+
 if __name__ == "__main__":
-    read_csv()
+    df = read_csv()
+    if df is not None:
+        print(df.head())
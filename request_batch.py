@@ -0,0 +1,164 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+IVOL_REQUIRED_FIELDS = ["option_expiry", "strike", "option_type", "future_value", "market_price", "rf_rate"]
+PRICE_REQUIRED_FIELDS = ["option_expiry", "strike", "option_type", "future_value", "computed_ivol", "rf_rate"]
+
+NUMERIC_FIELDS = ["strike", "future_value", "market_price", "computed_ivol", "rf_rate"]
+
+REQUEST_DTYPE = np.dtype([
+    ("row", np.int64),
+    ("expiration_date", "U10"),
+    ("expiry", "datetime64[ns]"),
+    ("strike", np.float64),
+    ("parity", "U8"),
+    ("future_value", np.float64),
+    ("value", np.float64),
+    ("rf_rate", np.float64),
+])
+# Request inputs that identify a contract-level request (expiry stands in for expiration_date)
+CONTRACT_FIELDS = ["expiry", "strike", "parity", "future_value", "value", "rf_rate"]
+
+
+def format_expiration_dates(expiry):
+    """
+    Format a datetime Series as the API's 'YYYY-M-D' strings (no leading zeros).
+    """
+    return (
+        expiry.dt.year.astype("Int64").astype(str) + "-" +
+        expiry.dt.month.astype("Int64").astype(str) + "-" +
+        expiry.dt.day.astype("Int64").astype(str)
+    )
+
+
+class RequestBatch:
+    """
+    Array-backed batch of options API requests built from a DataFrame.
+
+    records is a numpy structured array (REQUEST_DTYPE), one entry per accepted
+    row; records["row"] holds the row's position in the source DataFrame and
+    records["value"] the per-row price input (market_price for getIVol,
+    computed_ivol for getPriceVanilla). as_of_date, scheme and model are shared
+    by every request in the batch.
+    """
+
+    def __init__(self, records, index, value_field, as_of_date, scheme, model):
+        self.records = records
+        self.index = index
+        self.value_field = value_field
+        self.as_of_date = as_of_date
+        self.scheme = scheme
+        self.model = model
+
+    def __len__(self):
+        return len(self.records)
+
+    def deduplicate(self):
+        """
+        Collapse requests with identical inputs, e.g. the same listed contract held
+        by several strategies, so each distinct request is solved or priced once.
+
+        Returns:
+            tuple: (RequestBatch of the distinct requests in first-seen order, inverse)
+            where inverse[i] is the position of request i in the distinct batch
+        """
+        r = self.records
+        fields = pd.DataFrame({f: r[f] for f in CONTRACT_FIELDS})
+        inverse = fields.groupby(CONTRACT_FIELDS, sort=False).ngroup().to_numpy()
+        # ngroup(sort=False) numbers requests by first appearance: a new one starts where the running max grows
+        first = np.flatnonzero(np.r_[True, inverse[1:] > np.maximum.accumulate(inverse)[:-1]]) if len(inverse) else inverse
+        unique = RequestBatch(r[first], self.index[first], self.value_field, self.as_of_date, self.scheme, self.model)
+        return unique, inverse
+
+    def to_request_args(self):
+        """
+        Per-request argument dicts for OptionsApiClient (getIVol / getPriceVanilla field names).
+        """
+        r = self.records
+        return [
+            {
+                "as_of_date": self.as_of_date,
+                "expiration_date": expiration_date,
+                "strike": strike,
+                "parity": parity,
+                "future_value": future_value,
+                self.value_field: value,
+                "rf_rate": rf_rate,
+                "scheme": self.scheme,
+                "model": self.model,
+            }
+            for expiration_date, strike, parity, future_value, value, rf_rate in zip(
+                r["expiration_date"].tolist(), r["strike"].tolist(), r["parity"].tolist(),
+                r["future_value"].tolist(), r["value"].tolist(), r["rf_rate"].tolist(),
+            )
+        ]
+
+
+def build_request_batch(df, value_column, value_field, required_fields, as_of_date, scheme="American", model="BSM"):
+    """
+    Validate and normalize the request columns of df once per column.
+
+    Parameters:
+        df (pd.DataFrame): Source rows
+        value_column (str): Column carrying the per-row price input
+        value_field (str): API field name for that input ('value' or 'ivol')
+        required_fields (list): Columns that must be present and non-null
+
+    Returns:
+        tuple: (RequestBatch, rejections) where rejections is a DataFrame indexed
+        like df with a 'reason' column for every dropped row
+    """
+    n = len(df)
+    missing = pd.DataFrame(
+        {f: df[f].isnull().to_numpy() if f in df.columns else np.ones(n, dtype=bool) for f in required_fields},
+        index=df.index,
+    )
+
+    numeric = {
+        f: pd.to_numeric(df[f], errors="coerce") if f in df.columns else pd.Series(np.nan, index=df.index)
+        for f in NUMERIC_FIELDS if f in required_fields
+    }
+    expiry = pd.to_datetime(df["option_expiry"], errors="coerce") if "option_expiry" in df.columns else pd.Series(pd.NaT, index=df.index)
+
+    invalid = pd.DataFrame(
+        {f"invalid {f}": (values.isnull() & ~missing[f]).to_numpy() for f, values in numeric.items()},
+        index=df.index,
+    )
+    invalid["invalid option_expiry"] = (expiry.isnull() & ~missing["option_expiry"]).to_numpy()
+    missing.columns = [f"missing {f}" for f in missing.columns]
+    problems = pd.concat([missing, invalid], axis=1)
+
+    rejected = problems.any(axis=1).to_numpy()
+    reasons = problems[rejected].astype(object).dot(problems.columns + ", ").str[:-2]
+    rejections = pd.DataFrame({"reason": reasons.to_numpy(dtype=object)}, index=df.index[rejected])
+
+    accepted = ~rejected
+    records = np.empty(int(accepted.sum()), dtype=REQUEST_DTYPE)
+    records["row"] = np.flatnonzero(accepted)
+    records["expiry"] = expiry[accepted].to_numpy(dtype="datetime64[ns]")
+    records["expiration_date"] = format_expiration_dates(expiry[accepted]).to_numpy(dtype=str)
+    records["strike"] = numeric["strike"][accepted].to_numpy(dtype=float)
+    records["parity"] = df["option_type"][accepted].astype(str).str.capitalize().to_numpy(dtype=str)
+    records["future_value"] = numeric["future_value"][accepted].to_numpy(dtype=float)
+    records["value"] = numeric[value_column][accepted].to_numpy(dtype=float)
+    records["rf_rate"] = numeric["rf_rate"][accepted].to_numpy(dtype=float)
+
+    if len(rejections):
+        logger.warning(f"{len(rejections)} of {n} rows rejected during request preprocessing")
+        logger.debug(f"Rejection report:\n{rejections}")
+
+    batch = RequestBatch(records, df.index[accepted], value_field, as_of_date, scheme, model)
+    return batch, rejections
+
+
+def build_ivol_requests(df, as_of_date, scheme="American", model="BSM"):
+    return build_request_batch(df, "market_price", "value", IVOL_REQUIRED_FIELDS, as_of_date, scheme, model)
+
+
+def build_price_requests(df, as_of_date, scheme="American", model="BSM"):
+    return build_request_batch(df, "computed_ivol", "ivol", PRICE_REQUIRED_FIELDS, as_of_date, scheme, model)
@@ -0,0 +1,226 @@
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pricing_models import DAYS_PER_YEAR, option_price_ladder, parity_to_is_call, year_fraction
+from request_batch import build_price_requests
+from storage import read_stage, write_stage
+
+logger = logging.getLogger(__name__)
+
+
+SCENARIO_COLUMNS = ["spot_shift", "vol_shift", "rate_shift", "time_decay_days"]
+# Contract x scenario evaluations per task / aggregation block; bounds memory per step
+DEFAULT_CHUNK_ELEMENTS = 2_000_000
+MIN_VOL = 1e-4
+
+# Shared per-worker contract arrays, set once by _init_worker
+_worker_contracts = None
+
+
+def spot_ladder(max_shift=0.10, step=0.01):
+    """
+    Relative future_value shifts from -max_shift to +max_shift (0 included), e.g. +-1..10%.
+    """
+    n = int(round(max_shift / step))
+    return np.round(np.arange(-n, n + 1) * step, 10)
+
+
+def scenario_grid(spot_shifts=(0.0,), vol_shifts=(0.0,), rate_shifts=(0.0,), time_decay_days=(0,)):
+    """
+    Cartesian grid of scenarios, spot_shift varying slowest.
+
+    Parameters:
+        spot_shifts: Relative future_value shifts (0.01 = +1%)
+        vol_shifts: Absolute vol shifts (0.01 = +1 vol point)
+        rate_shifts: Absolute rf_rate shifts
+        time_decay_days: Calendar days rolled forward
+
+    Returns:
+        pd.DataFrame: SCENARIO_COLUMNS, indexed by scenario_id
+    """
+    grid = pd.DataFrame(list(itertools.product(spot_shifts, vol_shifts, rate_shifts, time_decay_days)), columns=SCENARIO_COLUMNS)
+    grid.index.name = "scenario_id"
+    return grid
+
+
+def _contracts(df, as_of_date, scheme, model):
+    """
+    Distinct priced contracts of df as arrays, plus the contract id of every accepted row.
+    """
+    # Rows without complete pricing inputs are rejected (and logged) here and left out
+    batch, _ = build_price_requests(df, as_of_date, scheme, model)
+    contracts, inverse = batch.deduplicate()
+    r = contracts.records
+    arrays = {
+        "F": r["future_value"],
+        "K": r["strike"],
+        "T": year_fraction(as_of_date, r["expiry"]),
+        "r": r["rf_rate"],
+        "sigma": r["value"],
+        "is_call": parity_to_is_call(r["parity"]),
+    }
+    return arrays, batch.records["row"], inverse
+
+
+def _init_worker(contracts):
+    global _worker_contracts
+    _worker_contracts = contracts
+
+
+def _price_block(contract_slice, scenarios, scheme, model, contracts=None):
+    """
+    Scenario prices of contracts[contract_slice] under each scenario row
+    (spot, vol, rate, decay).
+
+    Scenarios sharing a vol/rate/decay shift are priced together as one spot
+    ladder, so the early-exercise boundary is solved once per contract for all
+    of their spot levels.
+    """
+    c = contracts if contracts is not None else _worker_contracts
+    F, K, T, r, sigma, is_call = (c[k][contract_slice] for k in ("F", "K", "T", "r", "sigma", "is_call"))
+    prices = np.empty((len(F), len(scenarios)))
+    groups = pd.DataFrame(scenarios[:, 1:]).groupby([0, 1, 2], sort=False).indices
+    for (vol, rate, decay), columns in groups.items():
+        prices[:, columns] = option_price_ladder(
+            F[:, None] * (1.0 + scenarios[columns, 0])[None, :],
+            K,
+            np.maximum(T - decay / DAYS_PER_YEAR, 0.0),
+            r + rate,
+            np.maximum(sigma + vol, MIN_VOL),
+            is_call,
+            scheme=scheme,
+            model=model,
+        )
+    return contract_slice, prices
+
+
+def _blocks(n, size):
+    return [slice(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def price_scenarios(contracts, scenarios, scheme="American", model="BSM", workers=None, chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Price every contract under every scenario.
+
+    The contracts x scenarios evaluation is split into blocks of at most
+    chunk_elements; more than one block is spread over a process pool
+    (workers processes, default one per CPU) that receives the contract
+    arrays once per worker.
+
+    Returns:
+        np.ndarray: (contracts, scenarios) prices
+    """
+    n = len(contracts["F"])
+    values = scenarios[SCENARIO_COLUMNS].to_numpy(dtype=float)
+    prices = np.empty((n, len(values)))
+    rows_per_block = max(1, chunk_elements // max(len(values), 1))
+    blocks = _blocks(n, rows_per_block)
+
+    if workers == 1 or len(blocks) <= 1:
+        for block in blocks:
+            _, prices[block] = _price_block(block, values, scheme, model, contracts)
+        return prices
+
+    workers = min(workers or os.cpu_count() or 1, len(blocks))
+    logger.info(f"Pricing {n} contracts x {len(values)} scenarios in {len(blocks)} blocks on {workers} processes")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(contracts,)) as executor:
+        futures = [executor.submit(_price_block, block, values, scheme, model) for block in blocks]
+        for future in futures:
+            block, block_prices = future.result()
+            prices[block] = block_prices
+    return prices
+
+
+def run_scenarios(df, scenarios, as_of_date="2025-07-21", scheme="American", model="BSM", quantity_column=None,
+                  workers=None, chunk_elements=DEFAULT_CHUNK_ELEMENTS):
+    """
+    Reprice a priced book (computed_ivol per row) under a scenario grid and
+    aggregate the PnL per strategy_id.
+
+    Each distinct contract is priced once per scenario with the local engine;
+    PnL is measured against the same engine's unshifted price, so it holds
+    no model difference to the API price. Rows count once each unless
+    quantity_column gives a position size.
+
+    Returns:
+        pd.DataFrame: PnL with one row per strategy_id and one column per scenario_id
+    """
+    contracts, rows, inverse = _contracts(df, as_of_date, scheme, model)
+    base = _price_block(slice(None), np.zeros((1, 4)), scheme, model, contracts)[1][:, 0]
+    logger.info(f"Scenario run: {len(rows)} rows, {len(base)} contracts, {len(scenarios)} scenarios")
+    pnl_per_contract = price_scenarios(contracts, scenarios, scheme, model, workers, chunk_elements) - base[:, None]
+
+    # Positions reduced to (strategy, contract) weights, sorted by strategy for reduceat
+    strategy_codes, strategies = pd.factorize(df["strategy_id"].astype(str).to_numpy()[rows], sort=True)
+    weights = df[quantity_column].to_numpy(dtype=float)[rows] if quantity_column else np.ones(len(rows))
+    pairs = (
+        pd.DataFrame({"strategy": strategy_codes, "contract": inverse, "weight": weights})
+        .groupby(["strategy", "contract"], sort=True)["weight"].sum()
+        .reset_index()
+    )
+    starts = np.flatnonzero(np.r_[True, np.diff(pairs["strategy"].to_numpy()) != 0])
+    contract_ids = pairs["contract"].to_numpy()
+    pair_weights = pairs["weight"].to_numpy()[:, None]
+
+    cube = np.empty((len(starts), len(scenarios)))
+    scenarios_per_block = max(1, chunk_elements // max(len(pairs), 1))
+    for block in _blocks(len(scenarios), scenarios_per_block):
+        cube[:, block] = np.add.reduceat(pair_weights * pnl_per_contract[contract_ids, block], starts, axis=0)
+
+    index = pd.Index(strategies[pairs["strategy"].to_numpy()[starts]], name="strategy_id")
+    return pd.DataFrame(cube, index=index, columns=scenarios.index)
+
+
+def pnl_cube(pnl, scenarios):
+    """
+    Reshape a run_scenarios result over a full scenario_grid into an array with
+    axes (strategy_id, spot_shift, vol_shift, rate_shift, time_decay_days).
+
+    Returns:
+        tuple: (np.ndarray, dict of axis name -> axis values)
+    """
+    axes = {"strategy_id": pnl.index.to_numpy()}
+    axes.update({c: pd.unique(scenarios[c]) for c in SCENARIO_COLUMNS})
+    shape = tuple(len(values) for values in axes.values())
+    if np.prod(shape[1:]) != len(scenarios):
+        raise ValueError("Scenarios are not a full grid; use the 2-D PnL frame instead")
+    return pnl[scenarios.index].to_numpy().reshape(shape), axes
+
+
+def _parse_floats(values):
+    return [float(v) for v in values.split(",")] if values else [0.0]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Reprice the stored priced book under a scenario grid")
+    parser.add_argument("valuation_date", help="Valuation date of the 'priced' stage to load (YYYY-MM-DD)")
+    parser.add_argument("--spot-max", type=float, default=0.10, help="Largest relative future_value shift of the ladder")
+    parser.add_argument("--spot-step", type=float, default=0.01, help="Step of the future_value ladder")
+    parser.add_argument("--vol-shifts", default="0", help="Comma-separated absolute vol shifts, e.g. --vol-shifts=-0.05,0,0.05")
+    parser.add_argument("--rate-shifts", default="0", help="Comma-separated absolute rf_rate shifts")
+    parser.add_argument("--decay-days", default="0", help="Comma-separated calendar days of time decay")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    book = read_stage("priced", args.valuation_date)
+    grid = scenario_grid(
+        spot_ladder(args.spot_max, args.spot_step),
+        _parse_floats(args.vol_shifts),
+        _parse_floats(args.rate_shifts),
+        _parse_floats(args.decay_days),
+    )
+    pnl = run_scenarios(book, grid, as_of_date=args.valuation_date, workers=args.workers)
+    long_pnl = pnl.stack().rename("pnl").reset_index().join(grid, on="scenario_id")
+    write_stage(long_pnl, "scenario_pnl", args.valuation_date)
+    print(pnl.sum().to_frame("book_pnl").join(grid).to_string())
@@ -0,0 +1,134 @@
+import logging
+import os
+import shutil
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+STORAGE_ROOT = os.getenv("OPTIONS_STORAGE_ROOT", "option_data")
+PARTITION_COLUMNS = ["valuation_date", "strategy_id"]
+
+
+def stage_path(stage, root=STORAGE_ROOT):
+    return os.path.join(root, stage)
+
+
+def _partition_path(stage, valuation_date, root):
+    return os.path.join(stage_path(stage, root), f"valuation_date={valuation_date}")
+
+
+def _partition_fields(path):
+    """
+    PARTITION_COLUMNS that appear as hive directories under path, in nesting order.
+    """
+    fields = []
+    for column in PARTITION_COLUMNS:
+        subdirs = [e.path for e in os.scandir(path) if e.is_dir() and e.name.startswith(f"{column}=")] if os.path.isdir(path) else []
+        if not subdirs:
+            continue
+        fields.append(column)
+        path = subdirs[0]
+    return fields
+
+
+def _fixed_dictionaries(table):
+    """
+    Cast dictionary (categorical) columns to int32 indices, so files written by
+    separate appends share one schema whatever their number of categories.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) and field.type.index_type != pa.int32():
+            dictionary_type = pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered)
+            table = table.set_column(i, field.name, table.column(i).cast(dictionary_type))
+    return table
+
+
+def write_stage(df, stage, valuation_date, root=STORAGE_ROOT, append=False):
+    """
+    Persist a stage output as a Parquet dataset partitioned by valuation_date and
+    strategy_id (when the frame has one), keeping Arrow dtypes. Categorical
+    columns are stored with int32 dictionary indices.
+
+    Parameters:
+        df (pd.DataFrame): Stage output
+        stage (str): Dataset name, e.g. 'positions', 'ivol', 'priced'
+        valuation_date (str): Partition value; replaces any valuation_date column
+        append (bool): Add files to the valuation_date partition instead of replacing it
+
+    Returns:
+        str: Path of the valuation_date partition
+    """
+    valuation_date = str(valuation_date)
+    partition_dir = _partition_path(stage, valuation_date, root)
+    if not append and os.path.isdir(partition_dir):
+        shutil.rmtree(partition_dir)
+
+    df = df.assign(valuation_date=valuation_date)
+    partition_cols = [c for c in PARTITION_COLUMNS if c in df.columns]
+    if "strategy_id" in partition_cols:
+        df["strategy_id"] = df["strategy_id"].astype(str)
+
+    table = _fixed_dictionaries(pa.Table.from_pandas(df, preserve_index=False))
+    pq.write_to_dataset(
+        table,
+        root_path=stage_path(stage, root),
+        partition_cols=partition_cols,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    logger.info(f"Persisted {len(df)} rows of stage '{stage}' to {partition_dir}")
+    return partition_dir
+
+
+def read_stage(stage, valuation_date=None, columns=None, filters=None, root=STORAGE_ROOT):
+    """
+    Read a stage dataset back with column projection and partition pruning.
+    Partition values are read as strings (strategy_id '0743' stays '0743').
+
+    Parameters:
+        valuation_date (str): Only read this partition (None for all dates)
+        columns (list): Columns to load (None for all)
+        filters (list): Extra pyarrow filters, e.g. [("strategy_id", "in", ["124", "143"])]
+
+    Returns:
+        pd.DataFrame: Stage rows (empty if the stage was never written)
+    """
+    path = _partition_path(stage, valuation_date, root) if valuation_date is not None else stage_path(stage, root)
+    if not os.path.exists(path):
+        logger.warning(f"No stored data for stage '{stage}' at {path}")
+        return pd.DataFrame(columns=columns)
+
+    read_columns = columns
+    if valuation_date is not None and columns is not None:
+        read_columns = [c for c in columns if c != "valuation_date"]
+
+    table = pq.read_table(
+        path,
+        columns=read_columns,
+        filters=filters,
+        memory_map=True,
+        partitioning=ds.partitioning(pa.schema([(f, pa.string()) for f in _partition_fields(path)]), flavor="hive"),
+    )
+    df = table.to_pandas()
+    if valuation_date is not None and (columns is None or "valuation_date" in columns):
+        df["valuation_date"] = str(valuation_date)
+    return df
+
+
+def stage_exists(stage, valuation_date, root=STORAGE_ROOT):
+    return os.path.isdir(_partition_path(stage, valuation_date, root))
+
+
+def export_excel(df, output_excel):
+    """
+    Optional terminal step: write a stored frame to Excel for manual inspection.
+    """
+    df.to_excel(output_excel, index=False)
+    logger.info(f"Exported {len(df)} rows to {output_excel}")
+    return output_excel
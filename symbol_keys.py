@@ -0,0 +1,191 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from expiry_join import _factorize, map_values
+
+logger = logging.getLogger(__name__)
+
+
+# Decimals settlement instrument keys carry in the strike, by exchange and by
+# option root (a root entry wins over its exchange)
+DEFAULT_STRIKE_DECIMALS = 4
+STRIKE_DECIMALS_BY_EXCHANGE = {"ICE": 2, "IFEU": 2, "NYMEX": 2, "CME": 2, "EEX": 2}
+STRIKE_DECIMALS_BY_ROOT = {}
+
+
+def _format_scaled(scaled, decimals):
+    sign = "-" if scaled < 0 else ""
+    whole, frac = divmod(abs(int(scaled)), 10 ** int(decimals))
+    frac = str(frac).rjust(int(decimals), "0").rstrip("0") if decimals else ""
+    return f"{sign}{whole}.{frac}" if frac else f"{sign}{whole}"
+
+
+def _to_ticks(strikes, decimals):
+    strikes = np.asarray(strikes, dtype=float)
+    missing = np.isnan(strikes)
+    return np.rint(np.where(missing, 0.0, strikes) * 10.0 ** decimals).astype(np.int64), missing
+
+
+def format_strikes(strikes, decimals=DEFAULT_STRIKE_DECIMALS):
+    """
+    Strike strings rounded to the tick precision, without trailing zeros
+    (25.0 -> '25', 10.05 -> '10.05'); NaN where the strike is missing.
+
+    Strikes are snapped to integer ticks first, so float noise such as
+    68.43000000001 formats the same as 68.43.
+    """
+    decimals = np.broadcast_to(np.asarray(decimals, dtype=np.int64), np.shape(strikes))
+    ticks, missing = _to_ticks(strikes, decimals)
+    result = np.array([_format_scaled(t, d) for t, d in zip(ticks, decimals)], dtype=object)
+    result[missing] = np.nan
+    return result
+
+
+def _factorize_normalized(values, normalize):
+    """
+    Factorize values, merging the distinct values that normalize to the same key.
+    """
+    codes, uniques = _factorize(pd.Series(values).reset_index(drop=True))
+    normalized = normalize(uniques.astype("string"))
+    remap, keys = pd.factorize(normalized, use_na_sentinel=True)
+    remap = np.append(remap, -1)  # code -1 stays missing
+    return remap[codes], np.asarray(keys, dtype=object)
+
+
+def _encode(roots, ym_keys, option_types, strikes, exchanges=None):
+    """
+    Key id per row (-1 where a component is missing), the code of every key id
+    and its (root, ym_key, parity, strike) components.
+
+    The components are encoded as integers (root and parity codes, YYYYMM and
+    strike ticks) and grouped once; only the distinct keys are formatted.
+    """
+    root_codes, root_keys = _factorize_normalized(roots, lambda s: s.str.strip())
+    parity_codes, parity_keys = _factorize_normalized(option_types, lambda s: s.str.strip().str.upper().str[0])
+    ym = pd.to_numeric(pd.Series(ym_keys).reset_index(drop=True), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    # Tick precision per distinct root, then per exchange where a root has no entry
+    decimals = np.append(pd.Series(root_keys).map(STRIKE_DECIMALS_BY_ROOT).to_numpy(dtype=float), np.nan)[root_codes]
+    if exchanges is not None:
+        by_exchange = map_values(pd.Series(exchanges).reset_index(drop=True), STRIKE_DECIMALS_BY_EXCHANGE)
+        decimals = np.where(np.isnan(decimals), by_exchange.to_numpy(dtype=float, na_value=np.nan), decimals)
+    decimals = np.where(np.isnan(decimals), DEFAULT_STRIKE_DECIMALS, decimals).astype(np.int64)
+    ticks, missing = _to_ticks(strikes, decimals)
+
+    valid = (root_codes >= 0) & (parity_codes >= 0) & ~np.isnan(ym) & ~missing
+    parts = pd.DataFrame({
+        "root": root_codes[valid],
+        "ym_key": ym[valid].astype(np.int64),
+        "parity": parity_codes[valid],
+        "ticks": ticks[valid],
+        "decimals": decimals[valid],
+    })
+    row_ids = np.full(len(valid), -1, dtype=np.int64)
+    row_ids[valid] = parts.groupby(list(parts.columns), sort=False).ngroup().to_numpy()
+
+    # ngroup(sort=False) numbers keys by first appearance, so a key's first row is where the running max grows
+    ids = row_ids[valid]
+    first = np.flatnonzero(np.r_[True, ids[1:] > np.maximum.accumulate(ids)[:-1]]) if len(ids) else ids
+    keys = parts.iloc[first]
+    # Strikes repeat across roots and months: format each distinct tick once
+    tick_codes, tick_keys = pd.factorize(pd.MultiIndex.from_arrays([keys["ticks"], keys["decimals"]]))
+    strike = np.array([_format_scaled(t, d) for t, d in tick_keys], dtype=object)[tick_codes]
+    root = root_keys[keys["root"].to_numpy()]
+    parity = parity_keys[keys["parity"].to_numpy()]
+    codes = [f"{r} {y} {p}{k}" for r, y, p, k in zip(root, keys["ym_key"], parity, strike)]
+    components = pd.DataFrame({
+        "root": root,
+        "ym_key": keys["ym_key"].to_numpy(),
+        "parity": parity,
+        "strike": keys["ticks"].to_numpy() / 10.0 ** keys["decimals"].to_numpy(),
+    })
+
+    # The same contract read at different tick precisions (e.g. exchange ICE on one
+    # row, none on another) formats to one code; key ids are per code
+    code_ids, unique_codes = pd.factorize(np.asarray(codes, dtype=object))
+    _, first_of_code = np.unique(code_ids, return_index=True)
+    row_ids[valid] = code_ids[ids]
+    components = components.iloc[first_of_code].reset_index(drop=True)
+    return row_ids, pd.Index(unique_codes, dtype=object), components
+
+
+def opt_symbol_codes(roots, ym_keys, option_types, strikes, exchanges=None):
+    """
+    Settlement instrument keys 'ROOT YYYYMM P<strike>' built column-wise.
+
+    Parameters:
+        roots: Option roots (crate ticks), e.g. 'TFO'
+        ym_keys: Contract months as YYYYMM integers
+        option_types: 'Put'/'Call' (any case; only the first letter is used)
+        strikes: Strike prices, formatted at the tick precision of the
+            root/exchange without trailing zeros
+        exchanges: Optional exchange per row for the tick precision
+
+    Returns:
+        pd.Series: Codes, e.g. 'TFO 202508 P25'; NaN where a component is missing
+    """
+    row_ids, codes, _ = _encode(roots, ym_keys, option_types, strikes, exchanges)
+    return pd.Series(np.append(codes.to_numpy(), np.nan)[row_ids], dtype=object)
+
+
+class OptSymbolIndex:
+    """
+    Hashed index from opt_symbol_code to its (root, ym_key, parity, strike)
+    components and back to the rows that produced it.
+
+    Built from the position side, so settlement rows keyed by instrument_key
+    are matched by a hash lookup on the code and joined to positions by an
+    integer key id, without parsing the code strings.
+    """
+
+    def __init__(self, codes, components, row_ids):
+        self.codes = codes
+        self.components = components
+        self.row_ids = row_ids
+
+    @classmethod
+    def from_columns(cls, roots, ym_keys, option_types, strikes, exchanges=None):
+        """
+        Index the codes of position rows; row_ids maps every row to its key id (-1 if incomplete).
+        """
+        row_ids, codes, components = _encode(roots, ym_keys, option_types, strikes, exchanges)
+        return cls(codes, components, row_ids)
+
+    @classmethod
+    def from_frame(cls, df, root="crate_ticks", ym_key="ym_key", option_type="option_type", strike="strike", exchange="exchange"):
+        return cls.from_columns(
+            df[root], df[ym_key], df[option_type], df[strike], df[exchange] if exchange in df.columns else None
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def key_ids(self, codes):
+        """
+        Integer key id per code (-1 for codes not in the index).
+        """
+        return self.codes.get_indexer(pd.Index(codes, dtype=object))
+
+    def decode(self, codes):
+        """
+        (root, ym_key, parity, strike) per code by hash lookup; NaN for unknown codes.
+        """
+        return self.components.reindex(self.key_ids(codes)).reset_index(drop=True)
+
+    def join(self, rows_df, settlements_df, code_column="opt_symbol_code"):
+        """
+        Attach settlement rows to rows_df (the frame the index was built from) by key id,
+        and by source when both frames have one.
+
+        Returns:
+            pd.DataFrame: rows_df rows with a matching settlement plus the settlement columns
+        """
+        settlement_ids = self.key_ids(settlements_df[code_column])
+        matched = settlement_ids >= 0
+        hit_rate = matched.mean() if len(matched) else 0.0
+        logger.info(f"Matched {int(matched.sum())} of {len(matched)} settlement rows to positions ({hit_rate:.1%})")
+        right = settlements_df[matched].drop(columns=[code_column]).assign(_key_id=settlement_ids[matched])
+        left = rows_df.assign(_key_id=self.row_ids)
+        on = ["_key_id"] + (["source"] if "source" in left.columns and "source" in right.columns else [])
+        return left.merge(right, on=on, how="inner", suffixes=("", "_settlement")).drop(columns=["_key_id"])
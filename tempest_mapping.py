@@ -1,70 +1,102 @@
 import pandas as pd
+from mapping_registry import get_mapping_registry
 
-def read_mapping_csv():
-    filepath = r"C:\Users\ktandon\OneDrive - Hartree Partners\Desktop\Options_testing\mapping.csv"
-    try:
-        df = pd.read_csv(filepath)
-        print(f"✅ Successfully loaded mapping.csv — shape: {df.shape}")
-        return df
-    except Exception as e:
-        print(f"❌ Error reading mapping.csv: {e}")
-        return pd.DataFrame()
+
+def load_option_roots(registry=None):
+    """
+    Option roots with their exchange and tempest attributes, from the symbol
+    mapping registry (opt_symbol, exchange, scheme, tempest_code, commodity_code).
+
+    Attributes are filled in the registry with
+    `python mapping_registry.py --import-tempest mapping.csv`.
+    """
+    df = (registry or get_mapping_registry()).option_roots()
+    missing = df.drop(columns=["opt_symbol"]).isnull().all(axis=1).sum()
+    print(f"✅ Loaded option roots from the mapping registry — shape: {df.shape}")
+    if missing:
+        print(f"⚠️ {missing} registry option roots have no tempest attributes")
+    return df
     
 
 
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
+from sqlalchemy import text
 from connections import connect_crate_db
+from metrics import get_metrics
+
+EXPIRY_QUERY_CHUNK = 200
+EXPIRY_QUERY_WORKERS = 4
+
+# Root symbol = instrument_key minus the trailing ' YYYYMM P<strike>'
+EXPIRY_QUERY = text("""
+    SELECT DISTINCT
+        regexp_replace(instrument_key, ' [0-9]{6} P.*$', '') AS opt_symbol,
+        properties['UnderlyingInstrument']['instrument_key'] AS future_key,
+        properties['UnderlyingInstrument']['ExpirationDate'] AS future_expiry,
+        properties['ExpirationDate'] AS option_expiry
+    FROM settles.instruments
+    WHERE instrument_key ~ :pattern
+        AND properties['ExpirationDate'] BETWEEN :start_date AND :end_date
+        AND properties['UnderlyingInstrument']['ExpirationDate'] IS NOT NULL
+""")
+
+
+def _symbols_pattern(symbols):
+    """
+    One regex matching put instrument keys ('<symbol> YYYYMM P...') for any of symbols.
+    """
+    return "(" + "|".join(re.escape(s) for s in symbols) + ") [0-9]{6} P.*"
 
-def fetch_expiry_data_with_exchange(df, start_date="2025-07-21", end_date="2025-12-31"):
+
+def _fetch_expiry_chunk(conn, symbols, start_date, end_date):
+    with conn.connect() as connection, get_metrics().timer("db_query_seconds", query="tempest_expiry"):
+        sub_df = pd.read_sql(
+            EXPIRY_QUERY, connection,
+            params={"pattern": _symbols_pattern(symbols), "start_date": start_date, "end_date": end_date},
+        )
+    # The regex may match longer roots ending in one of the symbols; keep exact roots only
+    return sub_df[sub_df["opt_symbol"].isin(symbols)]
+
+
+def fetch_expiry_data_with_exchange(df=None, start_date="2025-07-21", end_date="2025-12-31"):
     """
-    For each unique opt_symbol in the input DataFrame, dynamically query CrateDB for instrument_key matches
-    and attach the associated exchange from the original df to the resulting CrateDB rows.
+    Query CrateDB for the option/future expiries of every unique opt_symbol in the input
+    DataFrame and attach the exchange and mapping columns from the original df.
+
+    Symbols are matched with a single regex predicate per chunk of EXPIRY_QUERY_CHUNK
+    symbols, and chunks run concurrently, so a refresh costs a handful of queries
+    instead of one LIKE scan per symbol. Results are mapped back by opt_symbol.
 
     Parameters:
-        df (pd.DataFrame): Input DataFrame with at least 'opt_symbol' and 'exchange' columns.
+        df (pd.DataFrame): Input DataFrame with at least 'opt_symbol' and 'exchange' columns
+            (default: load_option_roots()).
         start_date (str): Start date for expiration filter (default: '2025-07-21').
         end_date (str): End date for expiration filter (default: '2025-12-31').
-        always_fresh (bool): If True, always return a new DataFrame (even if no results). Default: True.
 
     Returns:
         pd.DataFrame: Combined result from CrateDB queries with exchange mapped back in, or a fresh DataFrame if no results.
     """
-    always_fresh = True  # Set to True to always return a new DataFrame if no results
-
+    if df is None:
+        df = load_option_roots()
     if "opt_symbol" not in df.columns or "exchange" not in df.columns:
         raise ValueError("Input DataFrame must contain 'opt_symbol' and 'exchange' columns.")
 
     unique_mappings = df.drop_duplicates(subset=["opt_symbol", "exchange"])
+    symbols = unique_mappings["opt_symbol"].dropna().astype(str).unique().tolist()
+    chunks = [symbols[i:i + EXPIRY_QUERY_CHUNK] for i in range(0, len(symbols), EXPIRY_QUERY_CHUNK)]
     results = []
 
     conn = connect_crate_db()
-    try:
-        for _, row in unique_mappings.iterrows():
-            opt_symbol = row["opt_symbol"]
-            exchange = row["exchange"]
-
-            like_pattern = f"{opt_symbol} ______ P%"
-
-            query = f"""
-            SELECT DISTINCT 
-                properties['UnderlyingInstrument']['instrument_key'] AS future_key,
-                properties['UnderlyingInstrument']['ExpirationDate'] AS future_expiry,
-                properties['ExpirationDate'] AS option_expiry
-            FROM settles.instruments
-            WHERE instrument_key LIKE '{like_pattern}'
-                AND properties['ExpirationDate'] BETWEEN '{start_date}' AND '{end_date}'
-                AND properties['UnderlyingInstrument']['ExpirationDate'] IS NOT NULL
-            ORDER BY option_expiry
-                """
-
+    with ThreadPoolExecutor(max_workers=EXPIRY_QUERY_WORKERS) as executor:
+        futures = [executor.submit(_fetch_expiry_chunk, conn, chunk, start_date, end_date) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
             try:
-                sub_df = pd.read_sql(query, conn)
-                sub_df["exchange"] = exchange
-                results.append(sub_df)
+                results.append(future.result())
             except Exception as e:
-                print(f"❌ Failed to fetch for symbol {opt_symbol}: {e}")
-    finally:
-        conn.dispose()
+                print(f"❌ Failed to fetch {len(chunk)} symbols ({chunk[0]} ... {chunk[-1]}): {e}")
 
     required_columns = [
         "opt_symbol", "future_key", "future_expiry", "option_expiry",
@@ -76,15 +108,10 @@ def fetch_expiry_data_with_exchange(df, start_date="2025-07-21", end_date="2025-
     output_csv = f"expiry_data_output_{timestamp}.csv"
 
     if results:
-        combined = pd.concat(results, ignore_index=True)
-        # Add missing columns from the input DataFrame if available
-        for col in ["opt_symbol", "scheme", "tempest_code", "commodity_code"]:
-            if col in df.columns and col not in combined.columns:
-                # Map from unique_mappings to combined using exchange as key if possible
-                mapping = df.set_index("exchange")[col].to_dict()
-                combined[col] = combined["exchange"].map(mapping)
-            elif col not in combined.columns:
-                combined[col] = None
+        found = pd.concat(results, ignore_index=True).sort_values("option_expiry", kind="stable")
+        # Map the input columns back by opt_symbol (one row per symbol/exchange pair)
+        mapping_columns = [c for c in ["opt_symbol", "exchange", "scheme", "tempest_code", "commodity_code"] if c in df.columns]
+        combined = found.merge(unique_mappings[mapping_columns], on="opt_symbol", how="inner")
         # Ensure all required columns are present
         for col in required_columns:
             if col not in combined.columns:
@@ -104,7 +131,7 @@ def fetch_expiry_data_with_exchange(df, start_date="2025-07-21", end_date="2025-
 
 if __name__ == "__main__":
     # Example usage
-    df = read_mapping_csv()
+    df = load_option_roots()
     if not df.empty:
         expiry_data = fetch_expiry_data_with_exchange(df)
         print(f"Fetched expiry data shape: {expiry_data.shape}")
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# The pipeline modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_options_server import serve_in_thread
+from options_api_client import OptionsApiClient
+
+AS_OF_DATE = "2025-07-21"
+
+
+@pytest.fixture
+def option_rows():
+    """
+    Small aligned book: every getIVol/getPriceVanilla input column, calls and
+    puts across strikes and expiries, and the same contracts held by two strategies.
+    """
+    strikes = [80.0, 95.0, 100.0, 105.0, 120.0]
+    rows = pd.DataFrame({
+        "strategy_id": ["124"] * 10,
+        "exposure": ["Long"] * 10,
+        "symbol": ["ABC"] * 10,
+        "ym_key": [202509] * 5 + [202512] * 5,
+        "option_expiry": ["2025-08-26"] * 5 + ["2025-11-25"] * 5,
+        "strike": strikes * 2,
+        "option_type": ["Call", "Put", "Call", "Put", "Call"] * 2,
+        "future_value": [100.0] * 10,
+        "market_price": [20.5, 1.9, 4.6, 6.3, 0.4, 21.4, 4.8, 8.1, 10.2, 2.6],
+        "rf_rate": [0.04] * 10,
+    })
+    held_twice = rows.iloc[[0, 2, 7]].assign(strategy_id="143", exposure="Short")
+    return pd.concat([rows, held_twice], ignore_index=True)
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """
+    OptionsApiClient against the in-process stand-in API (mock_options_server).
+    """
+    server, base_url = serve_in_thread()
+    yield OptionsApiClient(base_url=base_url, rate_per_second=10_000, max_retries=0)
+    server.shutdown()
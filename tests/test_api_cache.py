@@ -0,0 +1,142 @@
+import pytest
+
+import api_cache
+from api_cache import ApiResultCache, cached_call, request_key
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(api_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "api_cache.sqlite")
+
+
+def _rows(*strikes):
+    return [{"strike": strike, "parity": "Call", "future_value": 100.0} for strike in strikes]
+
+
+class Fetcher:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    def __call__(self, rows):
+        self.calls.append([row["strike"] for row in rows])
+        return [RuntimeError("boom") if row["strike"] in self.fail else {"price": row["strike"] / 10} for row in rows]
+
+
+def test_request_key_normalizes_arguments():
+    key = request_key("getIVol", {"strike": 100, "parity": "Call", "flag": True})
+    assert key == request_key("getIVol", {"parity": " Call ", "flag": True, "strike": 100.0})
+    assert key != request_key("getPriceVanilla", {"strike": 100, "parity": "Call", "flag": True})
+    assert key != request_key("getIVol", {"strike": 100.5, "parity": "Call", "flag": True})
+
+
+def test_cached_call_fetches_only_misses(cache_path, clock):
+    cache = ApiResultCache(cache_path)
+    fetch = Fetcher()
+    first = cached_call(cache, "getPriceVanilla", _rows(1.0, 2.0), fetch)
+    second = cached_call(cache, "getPriceVanilla", _rows(2.0, 3.0, 1.0), fetch)
+
+    assert first == [{"price": 0.1}, {"price": 0.2}]
+    assert second == [{"price": 0.2}, {"price": 0.3}, {"price": 0.1}]
+    assert fetch.calls == [[1.0, 2.0], [3.0]]
+    assert (cache.hits, cache.misses) == (2, 3)
+    assert cache.hit_rate() == pytest.approx(0.4)
+
+
+def test_failures_are_not_cached(cache_path, clock):
+    cache = ApiResultCache(cache_path)
+    failing = Fetcher(fail={2.0})
+    results = cached_call(cache, "getIVol", _rows(1.0, 2.0), failing)
+    assert isinstance(results[1], RuntimeError)
+
+    fetch = Fetcher()
+    assert cached_call(cache, "getIVol", _rows(1.0, 2.0), fetch) == [{"price": 0.1}, {"price": 0.2}]
+    assert fetch.calls == [[2.0]]
+
+
+def test_no_cache_always_fetches():
+    fetch = Fetcher()
+    cached_call(None, "getIVol", _rows(1.0), fetch)
+    cached_call(None, "getIVol", _rows(1.0), fetch)
+    assert fetch.calls == [[1.0], [1.0]]
+
+
+def test_entries_persist_across_instances(cache_path, clock):
+    cache = ApiResultCache(cache_path)
+    cached_call(cache, "getIVol", _rows(1.0), Fetcher())
+    cache.close()
+
+    fetch = Fetcher()
+    assert cached_call(ApiResultCache(cache_path), "getIVol", _rows(1.0), fetch) == [{"price": 0.1}]
+    assert fetch.calls == []
+
+
+def test_expired_entries_are_misses_and_purged(cache_path, clock):
+    cache = ApiResultCache(cache_path, ttl_seconds=60)
+    cached_call(cache, "getIVol", _rows(1.0), Fetcher())
+    key = request_key("getIVol", _rows(1.0)[0])
+
+    clock.now += 59
+    assert key in cache.get_many([key])
+    clock.now += 2
+    assert cache.get_many([key]) == {}
+
+    cache.evict()
+    assert cache._conn.execute("SELECT COUNT(*) FROM api_results").fetchone()[0] == 0
+    fetch = Fetcher()
+    cached_call(cache, "getIVol", _rows(1.0), fetch)
+    assert fetch.calls == [[1.0]]
+
+
+def test_least_recently_used_entries_are_dropped_first(cache_path, clock):
+    cache = ApiResultCache(cache_path, max_entries=3)
+    for strike in (1.0, 2.0, 3.0):
+        clock.now += 1
+        cached_call(cache, "getIVol", _rows(strike), Fetcher())
+
+    # Reading 1.0 makes 2.0 the least recently used entry
+    clock.now += 1
+    cached_call(cache, "getIVol", _rows(1.0), Fetcher())
+    clock.now += 1
+    cached_call(cache, "getIVol", _rows(4.0), Fetcher())
+
+    keys = {strike: request_key("getIVol", _rows(strike)[0]) for strike in (1.0, 2.0, 3.0, 4.0)}
+    live = cache.get_many(list(keys.values()))
+    assert {strike for strike, key in keys.items() if key in live} == {1.0, 3.0, 4.0}
+
+
+def test_writes_evict_only_per_interval_or_batch_of_entries(cache_path, clock, monkeypatch):
+    cache = ApiResultCache(cache_path, max_entries=100, evict_interval_seconds=60)
+    evictions = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: evictions.append(clock.now) or evict())
+
+    for strike in range(9):
+        cached_call(cache, "getIVol", _rows(float(strike)), Fetcher())
+    assert evictions == []
+    # max_entries / 10 new entries since the last eviction
+    cached_call(cache, "getIVol", _rows(9.0), Fetcher())
+    assert len(evictions) == 1
+
+    clock.now += 61
+    cached_call(cache, "getIVol", _rows(10.0), Fetcher())
+    assert len(evictions) == 2
+    # Cache hits write nothing
+    clock.now += 61
+    cached_call(cache, "getIVol", _rows(10.0), Fetcher())
+    assert len(evictions) == 2
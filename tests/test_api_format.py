@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from api_format import DEFAULT_RF_RATE, call_ivol_api_and_add_to_df, transform_to_option_api_payloads
+from conftest import AS_OF_DATE
+
+
+def _ivols(df, backend, client=None):
+    return call_ivol_api_and_add_to_df(df.copy(), AS_OF_DATE, backend=backend, client=client, use_cache=False)
+
+
+def _price(df, backend, client=None):
+    return transform_to_option_api_payloads(df, AS_OF_DATE, output_csv=None, backend=backend, client=client, use_cache=False)
+
+
+@pytest.mark.parametrize("backend", ["local", "remote"])
+def test_ivol_then_price_round_trips_market_price(option_rows, api_client, backend):
+    ivols = _ivols(option_rows, backend, api_client)
+    assert ivols["computed_ivol"].dtype == np.float64
+    assert ivols["computed_ivol"].notna().all()
+
+    payloads, priced = _price(ivols, backend, api_client)
+    assert len(payloads) == len(priced) == len(option_rows)
+    assert priced["computed_value"].dtype == np.float64
+    np.testing.assert_allclose(priced["computed_value"].to_numpy(), option_rows["market_price"].to_numpy(), rtol=1e-6)
+    assert [p["exposure"] for p in payloads] == option_rows["exposure"].tolist()
+
+
+def test_local_and_remote_ivols_agree(option_rows, api_client):
+    local = _ivols(option_rows, "local")
+    remote = _ivols(option_rows, "remote", api_client)
+    np.testing.assert_allclose(remote["computed_ivol"], local["computed_ivol"], rtol=1e-9)
+
+
+@pytest.mark.parametrize("backend", ["local", "remote"])
+def test_rejected_and_unsolvable_rows_stay_nan(option_rows, api_client, backend):
+    df = option_rows.copy()
+    df.loc[1, "market_price"] = None
+    df["strike"] = df["strike"].astype(object)
+    df.loc[3, "strike"] = "n/a"
+    # Below intrinsic: no implied vol
+    df.loc[0, "market_price"] = 1.0
+    result = _ivols(df, backend, api_client)
+
+    assert result["computed_ivol"].dtype == np.float64
+    assert result.loc[[0, 1, 3], "computed_ivol"].isna().all()
+    assert result["computed_ivol"].drop([0, 1, 3]).notna().all()
+
+
+def test_remote_pricing_failures_are_nan_not_none(option_rows, api_client):
+    df = _ivols(option_rows, "local")
+    # An infinite vol passes request validation but the API cannot price it
+    df.loc[4, "computed_ivol"] = np.inf
+    _, priced = _price(df, "remote", api_client)
+
+    assert priced["computed_value"].dtype == np.float64
+    assert np.isnan(priced.loc[4, "computed_value"])
+    assert priced["computed_value"].drop(4).notna().all()
+
+
+def test_missing_rf_rate_uses_default(option_rows):
+    df = _ivols(option_rows, "local")
+    df.loc[[0, 1], "rf_rate"] = [np.nan, 0.0]
+    _, priced = _price(df, "local")
+    assert len(priced) == len(df)
+    assert (priced.loc[[0, 1], "rf_rate"] == DEFAULT_RF_RATE).all()
@@ -0,0 +1,73 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import backfill
+from backfill import checkpoint_path, is_done
+
+
+class Workflow:
+    """
+    Stand-in for options_main: prices one row per date and fails the dates in fail.
+    """
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.dates = []
+        self._lock = threading.Lock()
+
+    def __call__(self, valuation_date, expiry, **kwargs):
+        with self._lock:
+            self.dates.append(valuation_date)
+        if valuation_date in self.fail:
+            raise RuntimeError(f"pricing failed for {valuation_date}")
+        return [{"exposure": "Long"}], pd.DataFrame({"computed_value": [1.0]}, index=[0])
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    expiry_dates = []
+    monkeypatch.setattr(backfill, "load_expiries", lambda as_of: expiry_dates.append(as_of) or pd.DataFrame())
+    # Threads share the patched workflow; worker processes would not see it
+    monkeypatch.setattr(backfill, "ProcessPoolExecutor", ThreadPoolExecutor)
+
+    def run(workflow, **kwargs):
+        monkeypatch.setattr(backfill, "options_main", workflow)
+        return backfill.backfill("2025-07-21", "2025-07-25", workers=2, checkpoint_dir=str(tmp_path), **kwargs)
+
+    run.expiry_dates = expiry_dates
+    return run
+
+
+def test_failed_date_is_resumed_and_completed_dates_skipped(run, tmp_path):
+    first = Workflow(fail={"2025-07-23"})
+    summary = run(first)
+    assert sorted(first.dates) == ["2025-07-21", "2025-07-22", "2025-07-23", "2025-07-24", "2025-07-25"]
+    assert summary["valuation_date"].tolist() == sorted(first.dates)
+    assert summary.set_index("valuation_date")["status"].to_dict()["2025-07-23"] == "failed"
+    assert "pricing failed" in summary.set_index("valuation_date").loc["2025-07-23", "error"]
+    assert not is_done("2025-07-23", str(tmp_path))
+    with open(checkpoint_path("2025-07-22", str(tmp_path))) as f:
+        assert json.load(f)["priced_rows"] == 1
+
+    second = Workflow()
+    summary = run(second)
+    assert second.dates == ["2025-07-23"]
+    assert summary["status"].tolist() == ["done"]
+    # The expiry index is extended back to the earliest pending date only
+    assert run.expiry_dates == ["2025-07-21", "2025-07-23"]
+
+    third = Workflow()
+    assert run(third).empty
+    assert third.dates == []
+
+
+def test_force_reruns_completed_dates(run):
+    run(Workflow())
+    again = Workflow()
+    summary = run(again, force=True)
+    assert len(again.dates) == 5
+    assert (summary["status"] == "done").all()
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+import requests
+
+from api_format import call_ivol_api_and_add_to_df, transform_to_option_api_payloads
+from conftest import AS_OF_DATE
+from mock_options_server import serve_in_thread
+from options_api_client import BatchNotSupported, BatchRowError, OptionsApiClient
+from request_batch import build_ivol_requests
+
+
+@pytest.fixture
+def ivol_rows(option_rows):
+    rows = build_ivol_requests(option_rows, AS_OF_DATE)[0].to_request_args()
+    # Below intrinsic value: the API has no implied vol for it
+    rows[0] = dict(rows[0], value=1.0)
+    return rows
+
+
+@pytest.fixture
+def price_rows(ivol_rows):
+    return [dict({k: v for k, v in row.items() if k != "value"}, ivol=0.3) for row in ivol_rows]
+
+
+@pytest.fixture(params=[True, False], ids=["batch", "no_batch"])
+def client(request):
+    server, base_url = serve_in_thread(batch_enabled=request.param)
+    client = OptionsApiClient(base_url=base_url, rate_per_second=10_000, max_retries=0)
+    client.server = server
+    yield client
+    server.shutdown()
+
+
+class PostCounter:
+    def __init__(self, client):
+        self.calls = []
+        self.post_batch = client.post_batch
+
+    def __call__(self, endpoint, rows, fmt="json"):
+        self.calls.append((endpoint, len(rows), fmt))
+        return self.post_batch(endpoint, rows, fmt)
+
+
+def _single_ivols(client, rows):
+    return client.map(lambda c, row: c.get_ivol(**row), rows)
+
+
+@pytest.mark.parametrize("fmt", ["json", "arrow"])
+def test_post_batch_matches_per_row_calls(api_client, ivol_rows, price_rows, fmt):
+    ivols = api_client.post_batch("getIVol", ivol_rows, fmt)
+    single = _single_ivols(api_client, ivol_rows)
+    assert isinstance(ivols[0], BatchRowError) and isinstance(single[0], requests.exceptions.HTTPError)
+    np.testing.assert_allclose(ivols[1:], single[1:], rtol=1e-12)
+
+    prices = api_client.post_batch("getPriceVanilla", price_rows, fmt)
+    expected = [api_client.get_price_vanilla(**row) for row in price_rows]
+    assert [sorted(p) for p in prices] == [sorted(p) for p in expected]
+    np.testing.assert_allclose([p["price"] for p in prices], [p["price"] for p in expected], rtol=1e-12)
+
+
+def test_post_batch_rejects_unknown_format(api_client, ivol_rows):
+    with pytest.raises(ValueError):
+        api_client.post_batch("getIVol", ivol_rows, "csv")
+
+
+@pytest.mark.parametrize("fmt", ["json", "arrow"])
+def test_call_batched_uses_the_batch_route_or_falls_back(client, ivol_rows, fmt, monkeypatch):
+    posts = PostCounter(client)
+    monkeypatch.setattr(client, "post_batch", posts)
+    results = client.get_ivol_batch(ivol_rows, chunk_size=4, fmt=fmt)
+    single = _single_ivols(client, ivol_rows)
+
+    assert isinstance(results[0], Exception)
+    np.testing.assert_allclose(results[1:], single[1:], rtol=1e-12)
+    if client.server.batch_enabled:
+        assert client.batch_supported is True
+        assert posts.calls == [("getIVol", 4, fmt)] * 3 + [("getIVol", 1, fmt)]
+    else:
+        # Probed once, then per-row calls without asking again
+        assert client.batch_supported is False
+        probes = len(posts.calls)
+        assert client.get_ivol_batch(ivol_rows, chunk_size=4, fmt=fmt)[1:] == results[1:]
+        assert len(posts.calls) == probes
+
+
+def test_missing_batch_route_raises_batch_not_supported(ivol_rows):
+    server, base_url = serve_in_thread(batch_enabled=False)
+    try:
+        with pytest.raises(BatchNotSupported):
+            OptionsApiClient(base_url=base_url, max_retries=0).post_batch("getIVol", ivol_rows)
+    finally:
+        server.shutdown()
+
+
+def test_failed_chunk_fails_only_its_rows(api_client, ivol_rows):
+    server, base_url = serve_in_thread()
+    try:
+        client = OptionsApiClient(base_url=base_url, max_retries=0, max_concurrency=1)
+        server.fail_next.append(503)
+        results = client.get_ivol_batch(ivol_rows, chunk_size=5)
+    finally:
+        server.shutdown()
+    assert all(isinstance(r, requests.exceptions.HTTPError) for r in results[:5])
+    np.testing.assert_allclose(results[5:], _single_ivols(api_client, ivol_rows[5:]), rtol=1e-12)
+
+
+@pytest.mark.parametrize("fmt", ["json", "arrow"])
+def test_batched_workflow_matches_per_row_workflow(option_rows, client, fmt):
+    per_row = call_ivol_api_and_add_to_df(option_rows, AS_OF_DATE, client=client, use_cache=False)
+    batched = call_ivol_api_and_add_to_df(option_rows, AS_OF_DATE, client=client, use_cache=False, batch_size=4, batch_format=fmt)
+    np.testing.assert_allclose(batched["computed_ivol"], per_row["computed_ivol"], rtol=1e-12)
+
+    _, priced = transform_to_option_api_payloads(batched, AS_OF_DATE, output_csv=None, client=client, use_cache=False, batch_size=4, batch_format=fmt)
+    np.testing.assert_allclose(priced["computed_value"], option_rows["market_price"], rtol=1e-6)
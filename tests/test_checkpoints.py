@@ -0,0 +1,96 @@
+import os
+
+import pandas as pd
+import pytest
+
+from checkpoints import combine_hash, frame_hash, load_checkpoint, run_batched_stage, run_stage
+
+VALUATION_DATE = "2025-07-21"
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"strike": [80.0, 90.0, 100.0, 110.0, 120.0], "option_type": ["Call", "Put", "Call", "Put", "Call"]})
+
+
+class Doubler:
+    def __init__(self, fail_at=None):
+        self.batches = []
+        self.fail_at = fail_at
+
+    def __call__(self, rows):
+        if self.fail_at is not None and len(self.batches) == self.fail_at:
+            raise ConnectionError("API down")
+        self.batches.append(rows["strike"].tolist())
+        return rows.assign(doubled=rows["strike"] * 2)
+
+
+def test_frame_hash_tracks_values_columns_and_dtypes(frame):
+    assert frame_hash(frame) == frame_hash(frame.copy())
+    assert frame_hash(frame) == frame_hash(frame.set_index(frame.index + 10))
+    assert frame_hash(frame) != frame_hash(frame.assign(strike=[80.0, 90.0, 100.0, 110.0, 121.0]))
+    assert frame_hash(frame) != frame_hash(frame.rename(columns={"strike": "k"}))
+    assert frame_hash(frame) != frame_hash(frame.astype({"option_type": "category"}))
+    assert combine_hash("a", "ivol", 1) == combine_hash("a", "ivol", 1) != combine_hash("a", "ivol", 2)
+
+
+def test_run_stage_reuses_checkpoint_for_same_key(frame, tmp_path):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return frame
+
+    first, reused_first = run_stage("aligned", VALUATION_DATE, "k1", compute, root=str(tmp_path))
+    second, reused_second = run_stage("aligned", VALUATION_DATE, "k1", compute, root=str(tmp_path))
+    assert (reused_first, reused_second) == (False, True)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_new_key_replaces_stale_checkpoint(frame, tmp_path):
+    run_stage("aligned", VALUATION_DATE, "k1", lambda: frame, root=str(tmp_path))
+    _, reused = run_stage("aligned", VALUATION_DATE, "k2", lambda: frame.head(2), root=str(tmp_path))
+
+    assert not reused
+    assert load_checkpoint("aligned", VALUATION_DATE, "k1", root=str(tmp_path)) is None
+    assert len(load_checkpoint("aligned", VALUATION_DATE, "k2", root=str(tmp_path))) == 2
+    assert len(os.listdir(tmp_path / VALUATION_DATE)) == 1
+
+
+def test_batched_stage_matches_unbatched_output(frame, tmp_path):
+    result, reused = run_batched_stage("ivol", VALUATION_DATE, "k", frame, Doubler(), batch_rows=2, root=str(tmp_path))
+    assert not reused
+    pd.testing.assert_frame_equal(result, Doubler()(frame))
+
+    again, reused = run_batched_stage("ivol", VALUATION_DATE, "k", frame, Doubler(fail_at=0), batch_rows=2, root=str(tmp_path))
+    assert reused
+    pd.testing.assert_frame_equal(again, result)
+
+
+def test_batched_stage_resumes_after_failure(frame, tmp_path):
+    with pytest.raises(ConnectionError):
+        run_batched_stage("ivol", VALUATION_DATE, "k", frame, Doubler(fail_at=2), batch_rows=2, root=str(tmp_path))
+
+    rerun = Doubler()
+    result, reused = run_batched_stage("ivol", VALUATION_DATE, "k", frame, rerun, batch_rows=2, root=str(tmp_path))
+    # Only the batch that failed is computed again
+    assert rerun.batches == [[120.0]]
+    assert not reused
+    pd.testing.assert_frame_equal(result, Doubler()(frame))
+    assert os.listdir(tmp_path / VALUATION_DATE) == ["ivol-k.parquet"]
+
+
+def test_batched_stage_parts_are_discarded_with_a_new_key(frame, tmp_path):
+    with pytest.raises(ConnectionError):
+        run_batched_stage("ivol", VALUATION_DATE, "old", frame, Doubler(fail_at=1), batch_rows=2, root=str(tmp_path))
+
+    rerun = Doubler()
+    run_batched_stage("ivol", VALUATION_DATE, "new", frame, rerun, batch_rows=2, root=str(tmp_path))
+    assert rerun.batches == [[80.0, 90.0], [100.0, 110.0], [120.0]]
+    assert os.listdir(tmp_path / VALUATION_DATE) == ["ivol-new.parquet"]
+
+
+def test_batched_stage_with_empty_input(frame, tmp_path):
+    result, _ = run_batched_stage("ivol", VALUATION_DATE, "k", frame.iloc[0:0], Doubler(), root=str(tmp_path))
+    assert result.empty and "doubled" in result.columns
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import option_main
+from conftest import AS_OF_DATE
+from option_main import options_main, options_main_chunked
+from read_aggregated_valuations import POSITION_COLUMNS, read_csv_chunks
+
+
+@pytest.fixture
+def extract(tmp_path):
+    """
+    Aggregated valuations extract: option exposures mixed with futures and
+    non-exposure rows, plus columns the workflow does not read.
+    """
+    strikes = [80.0, 95.0, 100.0, 105.0, 120.0]
+    prices = [20.5, 1.9, 4.6, 6.3, 0.4]
+    rows = []
+    for i in range(20):
+        rows.append({
+            "strategy_id": ["0124", "143"][i % 2],
+            "exposure": ["IPEBRT25Z", "TTF Curve"][i // 10],
+            "end_date": ["2025-09-30", "2025-12-31"][(i // 5) % 2],
+            "market_price": prices[i % 5] + (i // 5) * 0.5,
+            "instrument_type": "Future" if i % 7 == 3 else "Option",
+            "future_value": 100.0,
+            "option_type": ["Call", "Put", "Call", "Put", "Call"][i % 5],
+            "strike": strikes[i % 5],
+            "rf_rate": 0.04,
+            "position_type": "pnl" if i % 6 == 5 else "exposure",
+            "book": f"book-{i}",
+        })
+    path = tmp_path / "aggregated_valuations.csv"
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def expiry():
+    return pd.DataFrame({
+        "future_key": ["B 202509", "B 202512", "TTF 202509", "TTF 202512"],
+        "option_expiry": ["2025-08-26", "2025-11-25", "2025-08-26", "2025-11-25"],
+    })
+
+
+def test_chunks_are_filtered_and_typed_like_the_whole_file(extract):
+    chunks = list(read_csv_chunks(extract, chunksize=4))
+    assert len(chunks) == 5
+
+    whole = pd.read_csv(extract)
+    expected = whole[(whole["instrument_type"] == "Option") & (whole["position_type"] == "exposure")][POSITION_COLUMNS]
+    streamed = pd.concat(chunks, ignore_index=True)
+    assert list(streamed.columns) == POSITION_COLUMNS
+    assert len(streamed) == len(expected) == 15
+    assert isinstance(streamed["strategy_id"].dtype, pd.CategoricalDtype)
+    # strategy_id keeps its leading zeros as a string label
+    assert set(streamed["strategy_id"].astype(str)) == {"0124", "143"}
+    assert streamed["end_date"].dtype == "datetime64[ns]"
+    np.testing.assert_allclose(streamed["strike"], expected["strike"])
+    np.testing.assert_allclose(streamed["market_price"], expected["market_price"])
+
+
+def test_chunked_workflow_matches_whole_book(extract, expiry, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(option_main, "load_expiries", lambda valuation_date: expiry)
+    backends = {"ivol_backend": "local", "pricing_backend": "local", "use_cache": False, "valuation_date": AS_OF_DATE, "persist": False}
+
+    payloads, whole = options_main(
+        **backends, checkpoint=False, expiry=expiry,
+        load_positions=lambda: pd.concat(read_csv_chunks(extract), ignore_index=True),
+    )
+    output_csv = str(tmp_path / "chunked.csv")
+    summary = options_main_chunked(chunks=read_csv_chunks(extract, chunksize=4), output_csv=output_csv, **backends)
+
+    assert summary == {"input_rows": 15, "priced_rows": len(whole), "payloads": len(payloads), "output_csv": output_csv}
+    assert len(whole) == 15
+    chunked = pd.read_csv(output_csv, dtype={"strategy_id": str})
+    columns = ["strategy_id", "exposure", "strike", "option_type", "market_price"]
+    whole = whole.astype({c: str for c in columns}).sort_values(columns).reset_index(drop=True)
+    chunked = chunked.astype({c: str for c in columns}).sort_values(columns).reset_index(drop=True)
+    assert chunked[columns].to_numpy().tolist() == whole[columns].to_numpy().tolist()
+    np.testing.assert_allclose(chunked["computed_ivol"], whole["computed_ivol"])
+    np.testing.assert_allclose(chunked["computed_value"], whole["computed_value"])
@@ -0,0 +1,118 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+import expiry_index
+from expiry_index import INITIAL_WATERMARK, ExpiryIndex
+
+
+class Calendar:
+    """
+    Stand-in for expiry_date(): listings with option_expiry after the watermark.
+    """
+
+    def __init__(self, rows):
+        self.rows = pd.DataFrame(rows, columns=["future_key", "future_expiry", "option_expiry"])
+        self.watermarks = []
+
+    def add(self, *rows):
+        self.rows = pd.concat([self.rows, pd.DataFrame(rows, columns=self.rows.columns)], ignore_index=True)
+
+    def __call__(self, watermark):
+        self.watermarks.append(watermark)
+        return self.rows[pd.to_datetime(self.rows["option_expiry"]) > pd.Timestamp(watermark)].copy()
+
+
+class Registry:
+    def __init__(self, *roots):
+        self.roots = list(roots)
+
+    def option_root_patterns(self):
+        return [f"{root} ______ P%" for root in self.roots]
+
+
+@pytest.fixture
+def calendar():
+    return Calendar([
+        ("B 202508", "2025-08-29", "2025-07-28"),
+        ("B 202509", "2025-09-30", "2025-08-26"),
+        ("G 202509", "2025-09-11", "2025-09-05"),
+    ])
+
+
+@pytest.fixture
+def index(tmp_path, calendar):
+    index = ExpiryIndex(str(tmp_path / "expiries.sqlite"), fetch=calendar, registry=Registry("B", "G"))
+    yield index
+    index.close()
+
+
+def test_incremental_refresh_fetches_beyond_watermark(index, calendar):
+    assert index.refresh() == 3
+    assert index.watermark == "2025-09-05"
+
+    calendar.add(("B 202510", "2025-10-31", "2025-09-25"))
+    assert index.refresh() == 1
+    assert calendar.watermarks == [INITIAL_WATERMARK, "2025-09-05"]
+    loaded = index.load()
+    assert loaded["future_key"].tolist() == ["B 202508", "B 202509", "G 202509", "B 202510"]
+    assert loaded["ym_key"].tolist() == [202508, 202509, 202509, 202510]
+
+
+def test_changed_option_roots_force_a_full_refresh(index, calendar):
+    index.refresh()
+    # A root added to the registry with a listing below the watermark
+    calendar.add(("T 202508", "2025-08-15", "2025-08-08"))
+    index.refresh()
+    assert "T 202508" not in index.load()["future_key"].tolist()
+
+    index.registry.roots.append("T")
+    index.refresh()
+    assert calendar.watermarks[-1] == INITIAL_WATERMARK
+    assert "T 202508" in index.load()["future_key"].tolist()
+
+
+def test_load_before_lower_bound_fails_until_coverage_is_extended(index, calendar):
+    calendar.add(("B 202507", "2025-07-31", "2025-07-10"))
+    index.refresh()
+    with pytest.raises(ValueError):
+        index.load("2025-07-01")
+
+    assert index.ensure_coverage("2025-07-01") == 4
+    assert index.lower_bound == "2025-07-01"
+    assert index.load("2025-07-01")["future_key"].tolist()[0] == "B 202507"
+    # Already covered: no fetch
+    assert index.ensure_coverage("2025-07-05") == 0
+    # Later refreshes keep the extended bound
+    index.refresh(full=True)
+    assert index.lower_bound == "2025-07-01"
+
+
+def test_refresh_if_stale_runs_full_refresh_periodically(index, calendar, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(expiry_index.time, "time", lambda: now[0])
+    index.refresh(full=True)
+
+    now[0] += 60
+    assert index.refresh_if_stale(max_age_seconds=3600, full_max_age_seconds=7200) == 0
+    now[0] += 3600
+    index.refresh_if_stale(max_age_seconds=3600, full_max_age_seconds=7200)
+    assert calendar.watermarks[-1] == "2025-09-05"
+    now[0] += 7200
+    index.refresh_if_stale(max_age_seconds=3600, full_max_age_seconds=7200)
+    assert calendar.watermarks[-1] == INITIAL_WATERMARK
+
+
+def test_lookup_table_groups_expiries_by_symbol_and_month(index, calendar):
+    calendar.add(("B 202509", "2025-09-30", "2025-08-27"))
+    index.refresh()
+    table = index.lookup_table()
+    assert table[("B", 202509)] == ("2025-08-26", "2025-08-27")
+    assert table[("G", 202509)] == ("2025-09-05",)
+
+
+@pytest.mark.parametrize("as_of_date", ["2025-08-26", "20250826", pd.Timestamp("2025-08-26"), datetime(2025, 8, 26, 15, 30), date(2025, 8, 26)])
+def test_load_accepts_any_date_like(index, as_of_date):
+    index.refresh()
+    assert index.load(as_of_date)["future_key"].tolist() == ["G 202509"]
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from expiry_join import ExpiryJoinIndex, map_values, to_ym_key
+
+
+@pytest.fixture
+def expiries():
+    return pd.DataFrame({
+        "future_key": ["B 202509", "B 202510", "WTI 202509", "WTI 202509", "G 202512", "bad key"],
+        "option_expiry": ["2025-08-26", "2025-09-25", "2025-08-15", "2025-08-18", "2025-11-11", "2025-01-01"],
+    })
+
+
+@pytest.fixture
+def positions():
+    return pd.DataFrame({
+        "strategy_id": ["1", "2", "3", "4", "5", "6"],
+        "symbol": ["WTI", "B", None, "B", "XYZ", "G"],
+        "ym_key": np.array([202509, 202510, 202509, -1, 202509, 202512], dtype=np.int32),
+    })
+
+
+def _merge(positions, expiries):
+    # Reference: the object-keyed left merge the index replaces
+    parsed = expiries["future_key"].str.extract(r"^(\S+) (\d{6})$")
+    right = pd.DataFrame({
+        "symbol": parsed[0],
+        "ym_key": pd.to_numeric(parsed[1]).astype("Int32"),
+        "option_expiry": pd.to_datetime(expiries["option_expiry"]).astype("datetime64[ns]"),
+    }).dropna(subset=["symbol"])
+    left = positions.drop(columns=["symbol", "ym_key"]).assign(
+        symbol=positions["symbol"],
+        ym_key=pd.array(np.where(positions["ym_key"] < 0, None, positions["ym_key"]), dtype="Int32"),
+    )
+    return left.merge(right, on=["symbol", "ym_key"], how="left")
+
+
+def test_join_matches_left_merge(expiries, positions):
+    index = ExpiryJoinIndex.from_expiries(expiries)
+    joined = index.join(positions.drop(columns=["symbol", "ym_key"]), positions["symbol"], positions["ym_key"].to_numpy())
+
+    expected = _merge(positions, expiries)
+    assert list(joined.columns) == list(expected.columns)
+    pd.testing.assert_series_equal(joined["strategy_id"], expected["strategy_id"])
+    pd.testing.assert_series_equal(joined["ym_key"], expected["ym_key"])
+    np.testing.assert_array_equal(joined["option_expiry"].to_numpy(), expected["option_expiry"].to_numpy())
+    assert joined["symbol"].fillna("").tolist() == expected["symbol"].fillna("").tolist()
+
+
+def test_join_repeats_positions_with_several_expiries_in_source_order(expiries, positions):
+    index = ExpiryJoinIndex.from_expiries(expiries)
+    joined = index.join(positions, positions["symbol"], positions["ym_key"].to_numpy())
+
+    wti = joined[joined["strategy_id"] == "1"]
+    assert wti["option_expiry"].tolist() == [pd.Timestamp("2025-08-15"), pd.Timestamp("2025-08-18")]
+    # Missing symbol, unknown month and unknown symbol keep one row with no expiry
+    for strategy_id in ("3", "4", "5"):
+        unmatched = joined[joined["strategy_id"] == strategy_id]
+        assert len(unmatched) == 1 and unmatched["option_expiry"].isna().all()
+    assert joined["option_expiry"].dtype == "datetime64[ns]"
+
+
+def test_from_expiries_prefers_symbol_and_ym_key_columns(expiries):
+    typed = pd.DataFrame({"symbol": ["B", "B"], "ym_key": [202509, 202510], "option_expiry": ["2025-08-26", "2025-09-25"]})
+    index = ExpiryJoinIndex.from_expiries(typed)
+    assert len(index) == 2
+    np.testing.assert_array_equal(index.encode(pd.Series(["B", "B", "C"]), [202510, -1, 202510]), [202510, -1, -1])
+    # Invalid future_keys are dropped from the index
+    assert len(ExpiryJoinIndex.from_expiries(expiries)) == len(expiries) - 1
+
+
+def test_index_is_reusable_across_chunks(expiries, positions):
+    index = ExpiryJoinIndex.from_expiries(expiries)
+    whole = index.join(positions, positions["symbol"], positions["ym_key"].to_numpy())
+    chunks = [
+        index.join(chunk, chunk["symbol"], chunk["ym_key"].to_numpy())
+        for chunk in (positions.iloc[:3], positions.iloc[3:])
+    ]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
+
+
+def test_to_ym_key_from_strings_and_datetimes():
+    strings = pd.Series(["2025-09-30", None, "not a date", "2025-09-01", "2026-01-15"])
+    np.testing.assert_array_equal(to_ym_key(strings), [202509, -1, -1, 202509, 202601])
+    np.testing.assert_array_equal(to_ym_key(pd.to_datetime(strings, errors="coerce")), [202509, -1, -1, 202509, 202601])
+    assert to_ym_key(strings).dtype == np.int32
+    np.testing.assert_array_equal(to_ym_key(pd.Series([None, None], dtype=object)), [-1, -1])
+
+
+def test_map_values_maps_distinct_values_once():
+    values = pd.Series(["a", "b", None, "a"], index=[10, 11, 12, 13])
+    calls = []
+
+    def mapping(value):
+        calls.append(value)
+        return value.upper()
+
+    mapped = map_values(values, mapping)
+    assert mapped.tolist()[:2] == ["A", "B"] and pd.isna(mapped[12]) and mapped[13] == "A"
+    assert list(mapped.index) == [10, 11, 12, 13]
+    assert sorted(calls) == ["a", "b"]
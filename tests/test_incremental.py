@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import load_snapshot, reprice_incremental, snapshot_path
+
+VALUATION_DATE = "2025-07-21"
+
+
+@pytest.fixture
+def book():
+    return pd.DataFrame({
+        "strategy_id": ["124", "124", "124", "143", "143"],
+        "exposure": ["Long", "Long", "Short", "Long", "Long"],
+        "end_date": ["2025-09-30"] * 5,
+        "strike": [90.0, 100.0, 100.0, 110.0, 110.0],
+        "option_type": ["Call", "Put", "Put", "Call", "Call"],
+        "market_price": [11.0, 3.0, 3.0, 1.5, 1.7],
+        "future_value": [100.0] * 5,
+        "rf_rate": [0.04] * 5,
+        "option_expiry": ["2025-08-26"] * 5,
+    })
+
+
+class Repricer:
+    """
+    Stand-in for IV solve + pricing: records the rows it sees, drops rows without a market price.
+    """
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, rows):
+        self.seen.append(list(rows.index))
+        rows = rows[rows["market_price"].notna()]
+        return rows.assign(computed_value=rows["market_price"] * 2)
+
+
+def _run(df, root, repricer=None):
+    repricer = repricer or Repricer()
+    return reprice_incremental(df, VALUATION_DATE, repricer, root=str(root)), repricer
+
+
+def test_first_run_prices_every_row(book, tmp_path):
+    priced, repricer = _run(book, tmp_path)
+    assert repricer.seen == [list(book.index)]
+    np.testing.assert_allclose(priced["computed_value"], book["market_price"] * 2)
+    assert load_snapshot(VALUATION_DATE, str(tmp_path)) is not None
+
+
+def test_unchanged_book_is_carried_forward(book, tmp_path):
+    first, _ = _run(book, tmp_path)
+    second, repricer = _run(book, tmp_path)
+    assert repricer.seen == []
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_only_changed_and_new_rows_are_repriced(book, tmp_path):
+    _run(book, tmp_path)
+    moved = book.copy()
+    moved.loc[1, "market_price"] = 3.4
+    moved.loc[5] = ["201", "Long", "2025-12-31", 95.0, "Put", 4.0, 100.0, 0.04, "2025-11-25"]
+
+    priced, repricer = _run(moved, tmp_path)
+    assert repricer.seen == [[1, 5]]
+    np.testing.assert_allclose(priced["computed_value"], moved["market_price"] * 2)
+    assert list(priced.index) == list(moved.index)
+
+
+def test_rows_are_matched_by_key_not_position(book, tmp_path):
+    _run(book, tmp_path)
+    # New order and index, one row removed: nothing to reprice
+    shuffled = book.loc[[3, 4, 2, 1]].reset_index(drop=True)
+    priced, repricer = _run(shuffled, tmp_path)
+
+    assert repricer.seen == []
+    np.testing.assert_allclose(priced["computed_value"], shuffled["market_price"] * 2)
+    assert list(priced.index) == list(shuffled.index)
+
+    # Reversing rows that share a key pairs each with the other's inputs
+    _, repricer = _run(book.loc[[4, 3]].reset_index(drop=True), tmp_path)
+    assert repricer.seen == [[0, 1]]
+
+
+def test_duplicate_keys_pair_up_in_order(book, tmp_path):
+    # Rows 3 and 4 share a ROW_KEY with different market prices
+    _run(book, tmp_path)
+    moved = book.copy()
+    moved.loc[4, "market_price"] = 1.9
+    priced, repricer = _run(moved, tmp_path)
+
+    assert repricer.seen == [[4]]
+    assert priced.loc[3, "computed_value"] == pytest.approx(3.0)
+    assert priced.loc[4, "computed_value"] == pytest.approx(3.8)
+
+
+def test_rows_dropped_by_reprice_are_retried(book, tmp_path):
+    missing = book.copy()
+    missing.loc[2, "market_price"] = np.nan
+    priced, _ = _run(missing, tmp_path)
+    assert 2 not in priced.index
+
+    again, repricer = _run(missing, tmp_path)
+    assert repricer.seen == [[2]]
+    pd.testing.assert_frame_equal(again, priced)
+
+
+def test_snapshot_without_row_identities_reprices_everything(book, tmp_path):
+    _run(book, tmp_path)
+    path = snapshot_path(VALUATION_DATE, str(tmp_path))
+    pd.read_parquet(path).drop(columns=["_row_occurrence"]).to_parquet(path)
+
+    assert load_snapshot(VALUATION_DATE, str(tmp_path)) is None
+    _, repricer = _run(book, tmp_path)
+    assert repricer.seen == [list(book.index)]
+
+
+def test_result_follows_a_non_monotonic_index(book, tmp_path):
+    unsorted = book.set_axis([30, 10, 40, 0, 20])
+    _run(unsorted, tmp_path)
+    moved = unsorted.copy()
+    moved.loc[40, "market_price"] = np.nan
+    moved.loc[10, "market_price"] = 3.4
+
+    priced, repricer = _run(moved, tmp_path)
+    assert repricer.seen == [[10, 40]]
+    assert list(priced.index) == [30, 10, 0, 20]
+    np.testing.assert_allclose(priced["computed_value"], moved.loc[[30, 10, 0, 20], "market_price"] * 2)
+
+
+def test_switching_backend_or_scheme_reprices_everything(book, tmp_path):
+    reprice_incremental(book, VALUATION_DATE, Repricer(), root=str(tmp_path), ivol_backend="local")
+    for variant in ({"ivol_backend": "remote"}, {"pricing_backend": "local", "ivol_backend": "local"}, {"scheme": "European", "ivol_backend": "local"}):
+        repricer = Repricer()
+        reprice_incremental(book, VALUATION_DATE, repricer, root=str(tmp_path), **variant)
+        assert repricer.seen == [list(book.index)], variant
+
+    repricer = Repricer()
+    reprice_incremental(book, VALUATION_DATE, repricer, root=str(tmp_path), ivol_backend="local")
+    assert repricer.seen == []
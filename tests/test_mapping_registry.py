@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+from mapping_registry import DEFAULT_MAPPING_PATH, MAPPING_COLUMNS, MappingRegistry, import_tempest_attributes, validate_mappings
+from tempest_mapping import load_option_roots
+
+
+def _table(*rows):
+    return pd.DataFrame([dict(zip(MAPPING_COLUMNS, row)) for row in rows], columns=MAPPING_COLUMNS)
+
+
+def exposure(key, symbol, match="exact", verified="true"):
+    return ("exposure", key, match, symbol, "", "", "", "", verified, "")
+
+
+def option_root(key, exchange="", scheme="", tempest_code="", commodity_code="", note=""):
+    return ("option_root", key, "", "", exchange, scheme, tempest_code, commodity_code, "", note)
+
+
+@pytest.fixture
+def registry():
+    return MappingRegistry(_table(
+        exposure("IPEBRT25Z", "B"),
+        exposure("IPE", "IPE", match="prefix"),
+        exposure("IPEBRT", "B", match="prefix", verified="false"),
+        exposure("TTF Curve", "TTF"),
+        option_root("B", exchange="ICE", tempest_code="BRN"),
+        option_root("B", exchange="IFEU"),
+        option_root("TFO"),
+    ))
+
+
+def test_exact_beats_prefix_and_longest_prefix_wins(registry):
+    exposures = pd.Series(["IPEBRT25Z", "IPEBRT26F", "IPEGAS", "TTF Curve", "TTF Curve 2", None])
+    mapped = registry.map_exposures(exposures)
+    assert mapped.tolist()[:4] == ["B", "B", "IPE", "TTF"]
+    assert mapped[4:].isna().all()
+    assert registry.unverified == {"IPEBRT"}
+
+
+def test_option_roots_blank_attributes_are_none(registry):
+    roots = registry.option_roots()
+    assert list(roots.columns) == ["opt_symbol", "exchange", "scheme", "tempest_code", "commodity_code"]
+    assert roots["opt_symbol"].tolist() == ["B", "B", "TFO"]
+    assert roots.loc[0, "tempest_code"] == "BRN"
+    assert pd.isna(roots.loc[2, "exchange"])
+    # One pattern per root, whatever the number of exchanges
+    assert registry.option_root_patterns() == ["B ______ P%", "TFO ______ P%"]
+
+
+def test_load_option_roots_reads_the_registry(registry):
+    pd.testing.assert_frame_equal(load_option_roots(registry), registry.option_roots())
+
+
+@pytest.mark.parametrize("rows, message", [
+    ((("future", "X", "exact", "X", "", "", "", "", "true", ""),), "unknown kind"),
+    ((exposure("X", "X", match="regex"),), "unknown match type"),
+    ((exposure("", "X"),), "empty key"),
+    ((exposure("X", ""),), "without a symbol"),
+    ((exposure("X", "X", verified="yes"),), "verified must be true/false"),
+    ((exposure("X", "X"), exposure("X", "Y")), "duplicate rules ['X']"),
+    ((option_root("B", exchange="ICE"), option_root("B", exchange="ICE")), "duplicate rules ['B']"),
+    ((("option_root", "B", "exact", "", "", "", "", "", "true", ""),), "option_root rows must leave"),
+    ((("exposure", "X", "exact", "X", "ICE", "", "", "", "true", ""),), "exposure rows must leave"),
+])
+def test_validation_rejects_bad_rules(rows, message):
+    with pytest.raises(ValueError) as error:
+        validate_mappings(_table(*rows))
+    assert message in str(error.value)
+
+
+def test_validation_requires_every_column():
+    with pytest.raises(ValueError, match="missing columns"):
+        validate_mappings(_table(exposure("X", "X")).drop(columns=["note"]))
+
+
+def test_shipped_mapping_file_is_valid():
+    registry = MappingRegistry.from_csv(DEFAULT_MAPPING_PATH)
+    assert len(registry.exact) > 0
+    assert len(registry.option_root_patterns()) > 0
+
+
+def test_import_tempest_attributes_fills_option_roots(tmp_path):
+    path = tmp_path / "symbol_mappings.csv"
+    _table(exposure("TTF Curve", "TTF"), option_root("B", note="TTF"), option_root("TFO")).to_csv(path, index=False)
+    mapping = pd.DataFrame({
+        "opt_symbol": ["B", "B", "B", "LO"],
+        "exchange": ["ICE", "IFEU", "ICE", "NYMEX"],
+        "scheme": ["American", "American", "American", "American"],
+        "tempest_code": ["BRN", "BRN", "BRN", "CL"],
+        "commodity_code": ["OIL", "OIL", "OIL", "OIL"],
+    })
+    import_tempest_attributes(mapping, path=str(path))
+
+    registry = MappingRegistry.from_csv(str(path))
+    roots = registry.option_roots().set_index(["opt_symbol", "exchange"], drop=False)
+    assert sorted(roots["opt_symbol"]) == ["B", "B", "LO", "TFO"]
+    assert roots.loc[("B", "IFEU"), "tempest_code"] == "BRN"
+    assert roots.loc[("LO", "NYMEX"), "commodity_code"] == "OIL"
+    assert set(registry.table.loc[registry.table["key"] == "B", "note"]) == {"TTF"}
+    assert registry.map_exposures(pd.Series(["TTF Curve"])).tolist() == ["TTF"]
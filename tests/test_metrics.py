@@ -0,0 +1,154 @@
+import json
+import threading
+
+import pytest
+
+import metrics
+from metrics import Histogram, Metrics
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def strftime(self, fmt):
+        return "2025-07-21T18:00:00"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(metrics, "time", clock)
+    return clock
+
+
+def test_counters_and_gauges_are_keyed_by_name_and_labels():
+    collector = Metrics()
+    collector.inc("api_request_retries_total", endpoint="getIVol")
+    collector.inc("api_request_retries_total", 2, endpoint="getIVol")
+    collector.inc("api_request_retries_total", endpoint="getPriceVanilla")
+    collector.set_gauge("api_cache_hit_rate", 0.25)
+    collector.set_gauge("api_cache_hit_rate", 0.75)
+
+    assert collector.counters == {
+        ("api_request_retries_total", (("endpoint", "getIVol"),)): 3,
+        ("api_request_retries_total", (("endpoint", "getPriceVanilla"),)): 1,
+    }
+    assert collector.gauges == {("api_cache_hit_rate", ()): 0.75}
+    # Label order does not matter
+    collector.inc("errors_total", endpoint="getIVol", status=503)
+    collector.inc("errors_total", status=503, endpoint="getIVol")
+    assert collector.counters[("errors_total", (("endpoint", "getIVol"), ("status", 503)))] == 2
+
+    collector.reset()
+    assert collector.counters == collector.gauges == collector.histograms == {}
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.1, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+    # Bucket upper bounds are inclusive, like Prometheus 'le'
+    assert histogram.counts == [2, 2, 1, 0]
+    assert histogram.quantile(0.4) == 0.1
+    assert histogram.quantile(0.8) == 1.0
+    # Capped at the largest observation
+    assert histogram.quantile(1.0) == 3.0
+    histogram.observe(50.0)
+    assert histogram.counts[-1] == 1 and histogram.quantile(1.0) == 50.0
+
+    stats = histogram.to_dict()
+    assert stats["count"] == 6 and stats["max"] == 50.0
+    assert stats["mean"] == pytest.approx((0.05 + 0.1 + 0.5 + 0.7 + 3.0 + 50.0) / 6)
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_timer_and_stage_record_durations_and_throughput(clock):
+    collector = Metrics()
+    with collector.timer("db_query_seconds", query="settlements"):
+        clock.now += 0.2
+    with pytest.raises(RuntimeError):
+        with collector.timer("db_query_seconds", query="settlements"):
+            clock.now += 0.3
+            raise RuntimeError("query failed")
+    with collector.stage("ivol") as stage:
+        clock.now += 2.0
+        stage.rows = 500
+    with collector.stage("align"):
+        clock.now += 1.0
+
+    query = collector.histograms[("db_query_seconds", (("query", "settlements"),))]
+    assert query.count == 2 and query.sum == pytest.approx(0.5)
+    assert collector.histograms[("stage_seconds", (("stage", "ivol"),))].sum == pytest.approx(2.0)
+    assert collector.counters == {("stage_rows_total", (("stage", "ivol"),)): 500}
+    assert collector.gauges == {("stage_rows_per_second", (("stage", "ivol"),)): pytest.approx(250.0)}
+
+
+def test_prometheus_text_output(tmp_path):
+    collector = Metrics()
+    collector.inc("api_request_errors_total", endpoint="getIVol", status=503)
+    collector.inc("stage_rows_total", 13, stage="price")
+    collector.set_gauge("api_cache_hit_rate", 0.5)
+    # Two buckets keep the expected text short
+    collector.histograms[("api_request_seconds", (("endpoint", "getIVol"),))] = Histogram(buckets=(0.1, 1.0))
+    for seconds in (0.0625, 0.5, 2.5):
+        collector.observe("api_request_seconds", seconds, endpoint="getIVol")
+
+    path = str(tmp_path / "options.prom")
+    collector.write(path)
+    with open(path) as f:
+        text = f.read()
+    assert text.splitlines() == [
+        'options_api_request_errors_total{endpoint="getIVol",status="503"} 1',
+        'options_stage_rows_total{stage="price"} 13',
+        "options_api_cache_hit_rate 0.5",
+        'options_api_request_seconds_bucket{endpoint="getIVol",le="0.1"} 1',
+        'options_api_request_seconds_bucket{endpoint="getIVol",le="1.0"} 2',
+        'options_api_request_seconds_bucket{endpoint="getIVol",le="+Inf"} 3',
+        'options_api_request_seconds_sum{endpoint="getIVol"} 3.0625',
+        'options_api_request_seconds_count{endpoint="getIVol"} 3',
+    ]
+    assert text.endswith("\n")
+    assert not (tmp_path / "options.prom.tmp").exists()
+
+
+def test_json_report(tmp_path, clock):
+    collector = Metrics()
+    collector.inc("api_cache_hits_total", 7, endpoint="getIVol")
+    collector.observe("stage_seconds", 1.5, stage="load")
+    path = str(tmp_path / "metrics.json")
+    collector.write(path)
+    with open(path) as f:
+        report = json.load(f)
+
+    assert report["generated_at"] == "2025-07-21T18:00:00"
+    assert report["counters"] == [{"name": "api_cache_hits_total", "labels": {"endpoint": "getIVol"}, "value": 7}]
+    assert report["gauges"] == []
+    [stage] = report["histograms"]
+    assert stage["name"] == "stage_seconds" and stage["labels"] == {"stage": "load"}
+    assert stage["count"] == 1 and stage["max"] == 1.5
+
+
+def test_concurrent_updates_are_not_lost():
+    collector = Metrics()
+
+    def work():
+        for _ in range(1000):
+            collector.inc("requests_total", endpoint="getIVol")
+            collector.observe("api_request_seconds", 0.01, endpoint="getIVol")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert collector.counters[("requests_total", (("endpoint", "getIVol"),))] == 8000
+    assert collector.histograms[("api_request_seconds", (("endpoint", "getIVol"),))].count == 8000
+
+
+def test_get_metrics_is_process_wide():
+    assert metrics.get_metrics() is metrics.get_metrics()
+    assert isinstance(metrics.get_metrics(), Metrics)
@@ -0,0 +1,74 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import option_pipeline_async
+from api_cache import ApiResultCache
+from api_format import call_ivol_api_and_add_to_df
+from conftest import AS_OF_DATE
+from option_pipeline_async import run_async_pipeline
+
+
+class CountingClient:
+    """
+    Passes calls through to the mock server client, recording each endpoint called.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.max_concurrency = client.max_concurrency
+        self.calls = []
+
+    def get_ivol(self, **args):
+        self.calls.append("getIVol")
+        return self.client.get_ivol(**args)
+
+    def get_price_vanilla(self, **args):
+        self.calls.append("getPriceVanilla")
+        return self.client.get_price_vanilla(**args)
+
+
+@pytest.fixture
+def run(option_rows, monkeypatch):
+    # option_rows is already aligned; skip the expiry join
+    monkeypatch.setattr(option_pipeline_async, "align_option_expiries", lambda df, expiry: option_rows.copy())
+
+    def run(client, use_cache=False):
+        return asyncio.run(run_async_pipeline(
+            as_of_date=AS_OF_DATE, client=client, use_cache=use_cache, output_csv=None,
+            load_positions=lambda: option_rows.copy(), load_expiries=lambda as_of: pd.DataFrame(),
+        ))
+
+    return run
+
+
+def test_streamed_rows_match_sequential_pipeline(option_rows, api_client, run):
+    payloads, priced = run(CountingClient(api_client))
+    sequential = call_ivol_api_and_add_to_df(option_rows.copy(), AS_OF_DATE, backend="remote", client=api_client, use_cache=False)
+
+    assert len(payloads) == len(priced) == len(option_rows)
+    np.testing.assert_allclose(priced["computed_ivol"], sequential["computed_ivol"], rtol=1e-12)
+    np.testing.assert_allclose(priced["computed_value"], option_rows["market_price"], rtol=1e-6)
+    assert [p["exposure"] for p in payloads] == option_rows["exposure"].tolist()
+    assert [p["ivol"] for p in payloads] == priced["computed_ivol"].tolist()
+
+
+def test_cache_is_written_once_per_stage_and_reused(api_client, run, tmp_path, monkeypatch):
+    cache = ApiResultCache(str(tmp_path / "api_cache.sqlite"))
+    monkeypatch.setattr(option_pipeline_async, "get_api_cache", lambda: cache)
+    writes = []
+    put_many = cache.put_many
+    monkeypatch.setattr(cache, "put_many", lambda endpoint, items: writes.append((endpoint, len(items))) or put_many(endpoint, items))
+
+    client = CountingClient(api_client)
+    _, first = run(client, use_cache=True)
+    # 13 rows, 10 distinct contracts; concurrent workers may fetch a duplicate before it is cached
+    assert sorted(endpoint for endpoint, _ in writes) == ["getIVol", "getPriceVanilla"]
+    assert all(10 <= count <= 13 for _, count in writes)
+
+    client = CountingClient(api_client)
+    _, second = run(client, use_cache=True)
+    assert client.calls == []
+    pd.testing.assert_frame_equal(second, first)
@@ -0,0 +1,149 @@
+import socket
+import types
+
+import pytest
+import requests
+
+import options_api_client
+from conftest import AS_OF_DATE
+from mock_options_server import serve_in_thread
+from options_api_client import OptionsApiClient, TokenBucket, is_transient_error
+
+IVOL_ARGS = {
+    "as_of_date": AS_OF_DATE, "expiration_date": "2025-8-26", "strike": 100.0, "parity": "Call",
+    "future_value": 100.0, "value": 4.6, "rf_rate": 0.04,
+}
+
+
+class FakeTime:
+    """
+    Stand-in for the time module in options_api_client: sleep advances the clock
+    instead of blocking and is recorded.
+    """
+
+    def __init__(self):
+        # Binary-exact times and rates keep the token arithmetic exact
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(options_api_client, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def full_jitter(monkeypatch):
+    # Every backoff draws the top of its jitter range
+    monkeypatch.setattr(options_api_client, "random", types.SimpleNamespace(uniform=lambda low, high: high))
+
+
+@pytest.fixture
+def server():
+    server, base_url = serve_in_thread()
+    server.base_url = base_url
+    yield server
+    server.shutdown()
+
+
+def _client(base_url, **kwargs):
+    kwargs = {"rate_per_second": 10_000, "max_retries": 3, "backoff_base": 0.5, "backoff_max": 8.0, "max_concurrency": 1, **kwargs}
+    return OptionsApiClient(base_url=base_url, **kwargs)
+
+
+def test_token_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=4, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [0.25]
+
+    # Idle time refills the bucket up to its capacity only
+    clock.now += 64
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps[1:] == [0.25]
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_client_requests_are_rate_limited(server, clock):
+    client = _client(server.base_url, rate_per_second=4, burst=1)
+    for _ in range(3):
+        client.get_ivol(**IVOL_ARGS)
+    assert clock.sleeps == [0.25, 0.25]
+
+
+def test_transient_statuses_are_retried_with_exponential_backoff(server, clock, full_jitter):
+    server.fail_next.extend([503, 429, 502])
+    client = _client(server.base_url)
+    assert client.get_ivol(**IVOL_ARGS) > 0
+    assert clock.sleeps == [0.5, 1.0, 2.0]
+    assert server.fail_next == []
+
+
+def test_backoff_is_jittered_and_capped():
+    client = _client("http://unused", backoff_base=0.5, backoff_max=3.0)
+    draws = [client._backoff(attempt) for attempt in (0, 5) for _ in range(200)]
+    assert all(0.0 <= d <= 0.5 for d in draws[:200])
+    assert all(0.0 <= d <= 3.0 for d in draws[200:])
+    # Full jitter spreads retries instead of repeating the cap
+    assert len(set(draws)) > 100 and max(draws[200:]) > 0.5
+
+
+def test_retries_give_up_after_max_retries(server, clock, full_jitter):
+    server.fail_next.extend([503] * 5)
+    client = _client(server.base_url, max_retries=2)
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        client.get_ivol(**IVOL_ARGS)
+    assert error.value.response.status_code == 503
+    assert is_transient_error(error.value)
+    # Three attempts, two backoffs
+    assert len(server.fail_next) == 2
+    assert clock.sleeps == [0.5, 1.0]
+
+
+@pytest.mark.parametrize("status", [400, 404, 422])
+def test_non_retryable_errors_fail_at_once(server, clock, status):
+    server.fail_next.append(status)
+    client = _client(server.base_url)
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        client.get_ivol(**IVOL_ARGS)
+    assert error.value.response.status_code == status
+    assert not is_transient_error(error.value)
+    assert clock.sleeps == []
+    # The next call goes through
+    assert client.get_ivol(**IVOL_ARGS) > 0
+
+
+def test_unsolvable_request_is_not_retried(server, clock):
+    client = _client(server.base_url)
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        # Below intrinsic value: the API answers 422
+        client.get_ivol(**dict(IVOL_ARGS, strike=80.0, value=1.0))
+    assert error.value.response.status_code == 422
+    assert clock.sleeps == []
+
+
+def test_connection_errors_are_retried(clock, full_jitter):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    client = _client(f"http://127.0.0.1:{port}", max_retries=2)
+    with pytest.raises(requests.exceptions.ConnectionError) as error:
+        client.get_ivol(**IVOL_ARGS)
+    assert is_transient_error(error.value)
+    assert clock.sleeps == [0.5, 1.0]
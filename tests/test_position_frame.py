@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from position_frame import CATEGORY_COLUMNS, DATE_COLUMNS, FLOAT_COLUMNS, as_position_frame
+
+
+def _raw():
+    return pd.DataFrame({
+        "strategy_id": [743, 124, 743, None],
+        "exposure": ["Brent", "Brent", "Gasoil", None],
+        "option_type": ["Call", "Put", "Put", "Call"],
+        "instrument_type": ["Option"] * 4,
+        "strike": ["70", "72.5", "n/a", None],
+        "market_price": [1.25, None, 12, 0.5],
+        "future_value": np.array([71, 71, 640, 71], dtype=np.int64),
+        "rf_rate": [0.04] * 4,
+        "end_date": ["2025-09-30", "2025-09-30", "not a date", None],
+        "quantity": np.array([1, -2, 3, 4], dtype=np.int64),
+    })
+
+
+def test_columns_get_their_typed_layout():
+    df = _raw()
+    typed = as_position_frame(df)
+    assert typed is df
+
+    for column in CATEGORY_COLUMNS:
+        assert isinstance(typed[column].dtype, pd.CategoricalDtype), column
+    for column in FLOAT_COLUMNS:
+        assert typed[column].dtype == np.float64, column
+    for column in DATE_COLUMNS:
+        assert typed[column].dtype == "datetime64[ns]", column
+    # Columns outside the layout are left alone
+    assert typed["quantity"].dtype == np.int64
+
+    assert typed["strategy_id"].cat.categories.tolist() == ["124", "743"]
+    assert typed["strategy_id"].isna().tolist() == [False, False, False, True]
+    assert typed["strike"].tolist()[:2] == [70.0, 72.5] and typed["strike"][2:].isna().all()
+    assert typed["end_date"][2:].isna().all()
+
+
+def test_string_ids_keep_leading_zeros():
+    typed = as_position_frame(pd.DataFrame({"strategy_id": ["0743", "0010", "0743"]}))
+    assert typed["strategy_id"].astype(str).tolist() == ["0743", "0010", "0743"]
+    assert len(typed["strategy_id"].cat.categories) == 2
+
+
+def test_typed_frame_round_trips_unchanged():
+    typed = as_position_frame(_raw())
+    columns = {c: typed[c] for c in typed.columns}
+    again = as_position_frame(typed)
+    # Already typed columns are not reassigned
+    assert all(again[c] is columns[c] or again[c].equals(columns[c]) for c in typed.columns)
+    pd.testing.assert_frame_equal(again, as_position_frame(_raw()))
+
+    restored = as_position_frame(typed.astype({c: str for c in CATEGORY_COLUMNS}).replace("nan", None))
+    for column in CATEGORY_COLUMNS:
+        assert restored[column].astype(str).tolist() == typed[column].astype(str).tolist(), column
+
+
+def test_missing_columns_and_none_are_fine():
+    assert as_position_frame(None) is None
+    typed = as_position_frame(pd.DataFrame({"strike": ["1.5"]}))
+    assert list(typed.columns) == ["strike"] and typed["strike"].dtype == np.float64
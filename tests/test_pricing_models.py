@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+
+from conftest import AS_OF_DATE
+from pricing_models import (
+    baw_greeks,
+    baw_price,
+    black76_greeks,
+    black76_price,
+    implied_vol,
+    option_price,
+    price_vanilla,
+    year_fraction,
+)
+
+
+def binomial_american(F, K, T, r, sigma, is_call, steps=2000):
+    """
+    Cox-Ross-Rubinstein tree for an American option on a future (no drift under the measure).
+    """
+    dt = T / steps
+    u = np.exp(sigma * np.sqrt(dt))
+    d = 1.0 / u
+    p = (1.0 - d) / (u - d)
+    discount = np.exp(-r * dt)
+    sign = 1.0 if is_call else -1.0
+    levels = F * u ** np.arange(steps, -steps - 1, -2)
+    values = np.maximum(sign * (levels - K), 0.0)
+    for _ in range(steps):
+        levels = levels[:-1] * d
+        values = np.maximum(discount * (p * values[:-1] + (1.0 - p) * values[1:]), sign * (levels - K))
+    return values[0]
+
+
+def test_black76_reference_value():
+    # ATM: discount * F * (2 N(sigma sqrt(T) / 2) - 1)
+    price = black76_price(100.0, 100.0, 1.0, 0.05, 0.2, True)
+    assert price[0] == pytest.approx(7.577082, abs=1e-6)
+
+
+def test_black76_put_call_parity():
+    F, K, T, r, sigma = 100.0, np.array([70.0, 95.0, 100.0, 130.0]), 0.75, 0.03, 0.35
+    call = black76_price(F, K, T, r, sigma, True)
+    put = black76_price(F, K, T, r, sigma, False)
+    np.testing.assert_allclose(call - put, np.exp(-r * T) * (F - K), atol=1e-10)
+
+
+def test_expired_or_zero_vol_rows_are_intrinsic():
+    price = black76_price(100.0, [90.0, 110.0, 90.0], [0.0, -0.1, 0.5], 0.04, [0.3, 0.3, 0.0], [True, False, True])
+    np.testing.assert_allclose(price, [10.0, 10.0, 10.0 * np.exp(-0.02)])
+    np.testing.assert_allclose(baw_price(100.0, 90.0, 0.0, 0.04, 0.3, True), [10.0])
+
+
+@pytest.mark.parametrize("K, T, sigma, is_call", [
+    (100.0, 0.5, 0.25, True),
+    (100.0, 0.5, 0.25, False),
+    (80.0, 1.0, 0.40, False),
+    (120.0, 1.0, 0.40, True),
+    (110.0, 2.0, 0.15, False),
+])
+def test_baw_close_to_binomial_tree(K, T, sigma, is_call):
+    # BAW is an approximation: within a couple of percent of the tree, and above the European price
+    r = 0.08
+    reference = binomial_american(100.0, K, T, r, sigma, is_call)
+    price = baw_price(100.0, K, T, r, sigma, is_call)[0]
+    assert price == pytest.approx(reference, rel=0.02)
+    assert price > black76_price(100.0, K, T, r, sigma, is_call)[0]
+
+
+def test_baw_bounds():
+    rng = np.random.default_rng(3)
+    n = 2000
+    F, K = rng.uniform(20, 120, n), rng.uniform(20, 120, n)
+    T, r, sigma = rng.uniform(0.01, 2, n), rng.uniform(0.0, 0.08, n), rng.uniform(0.05, 1.0, n)
+    is_call = rng.random(n) < 0.5
+
+    american = baw_price(F, K, T, r, sigma, is_call)
+    european = black76_price(F, K, T, r, sigma, is_call)
+    intrinsic = np.where(is_call, np.maximum(F - K, 0.0), np.maximum(K - F, 0.0))
+    assert np.isfinite(american).all()
+    assert (american >= european - 1e-12).all()
+    assert (american >= intrinsic - 1e-12).all()
+
+
+def test_baw_without_rates_is_black76():
+    K = np.array([80.0, 100.0, 120.0])
+    np.testing.assert_allclose(baw_price(100.0, K, 0.5, 0.0, 0.3, False), black76_price(100.0, K, 0.5, 0.0, 0.3, False))
+
+
+def test_unsupported_scheme_or_model_raises():
+    with pytest.raises(ValueError):
+        option_price(100.0, 100.0, 1.0, 0.05, 0.2, True, scheme="Bermudan")
+    with pytest.raises(ValueError):
+        implied_vol(5.0, 100.0, 100.0, 1.0, 0.05, True, model="Heston")
+
+
+@pytest.mark.parametrize("scheme", ["European", "American"])
+def test_implied_vol_recovers_pricing_vol(scheme):
+    rng = np.random.default_rng(11)
+    n = 500
+    F = rng.uniform(50, 150, n)
+    K = F * rng.uniform(0.7, 1.3, n)
+    T, r, sigma = rng.uniform(0.05, 2, n), rng.uniform(0.0, 0.06, n), rng.uniform(0.05, 1.5, n)
+    is_call = rng.random(n) < 0.5
+
+    price = option_price(F, K, T, r, sigma, is_call, scheme)
+    # Prices at the low-vol floor carry no vol information
+    informative = price - option_price(F, K, T, r, 1e-4, is_call, scheme) > 1e-6
+
+    solved = implied_vol(price, F, K, T, r, is_call, scheme)
+    assert informative.mean() > 0.9
+    assert np.isfinite(solved[informative]).all()
+    np.testing.assert_allclose(option_price(F, K, T, r, solved, is_call, scheme)[informative], price[informative], atol=1e-7)
+    # The solve stops on the price residual, so the vol is exact only where vega is not tiny
+    sensitive = informative & (black76_greeks(F, K, T, r, sigma, is_call)["vega"] > 1.0)
+    np.testing.assert_allclose(solved[sensitive], sigma[sensitive], rtol=1e-5)
+
+
+@pytest.mark.parametrize("scheme", ["European", "American"])
+def test_implied_vol_converges_on_hard_rows(scheme):
+    # Deep OTM with tiny vega, very short and very long expiries
+    F = np.array([100.0, 100.0, 100.0, 100.0])
+    K = np.array([200.0, 40.0, 100.0, 100.0])
+    T = np.array([1.0, 1.0, 1.0 / 365, 10.0])
+    sigma = np.array([0.3, 0.5, 0.8, 0.2])
+    is_call = np.array([True, False, True, False])
+    price = option_price(F, K, T, 0.03, sigma, is_call, scheme)
+    np.testing.assert_allclose(implied_vol(price, F, K, T, 0.03, is_call, scheme), sigma, rtol=1e-5)
+
+
+def test_implied_vol_returns_nan_for_unsolvable_rows():
+    price = np.array([np.nan, -1.0, 0.0, 5.0, 5.0, 5.0, 150.0, 0.01])
+    F = np.array([100.0, 100.0, 100.0, np.nan, 100.0, 100.0, 100.0, 100.0])
+    T = np.array([1.0, 1.0, 1.0, 1.0, 0.0, -0.5, 1.0, 1.0])
+    K = np.array([100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 50.0])
+    # 150 is above the IVOL_UPPER price of an ATM call; 0.01 is below intrinsic of a deep ITM call
+    solved = implied_vol(price, F, K, T, 0.04, True)
+    assert np.isnan(solved).all()
+
+    mixed = implied_vol([np.nan, 8.0], 100.0, 100.0, 1.0, 0.04, True, "European")
+    assert np.isnan(mixed[0]) and np.isfinite(mixed[1])
+
+
+def test_black76_greeks_match_finite_differences():
+    F, K, T, r, sigma = 100.0, np.array([85.0, 100.0, 115.0]), 0.5, 0.04, 0.3
+    for is_call in (True, False):
+        g = black76_greeks(F, K, T, r, sigma, is_call)
+        h = 1e-3
+        up, down = black76_price(F + h, K, T, r, sigma, is_call), black76_price(F - h, K, T, r, sigma, is_call)
+        np.testing.assert_allclose(g["delta"], (up - down) / (2 * h), rtol=1e-6)
+        np.testing.assert_allclose(g["gamma"], (up - 2 * g["price"] + down) / h ** 2, rtol=1e-4)
+        vol_up, vol_down = black76_price(F, K, T, r, sigma + 1e-5, is_call), black76_price(F, K, T, r, sigma - 1e-5, is_call)
+        np.testing.assert_allclose(g["vega"], (vol_up - vol_down) / 2e-5, rtol=1e-6)
+
+
+def test_baw_greeks_without_rates_match_black76():
+    K = np.array([85.0, 100.0, 115.0])
+    baw = baw_greeks(100.0, K, 0.5, 0.0, 0.3, False)
+    black = black76_greeks(100.0, K, 0.5, 0.0, 0.3, False)
+    for greek in ("price", "delta", "gamma", "vega"):
+        np.testing.assert_allclose(baw[greek], black[greek], rtol=1e-3, atol=1e-6)
+
+
+@pytest.mark.parametrize("scheme", ["European", "American"])
+def test_implied_vol_to_price_round_trip(option_rows, scheme):
+    T = year_fraction(AS_OF_DATE, option_rows["option_expiry"])
+    is_call = option_rows["option_type"].eq("Call").to_numpy()
+    F, K = option_rows["future_value"].to_numpy(), option_rows["strike"].to_numpy()
+    r, market = option_rows["rf_rate"].to_numpy(), option_rows["market_price"].to_numpy()
+
+    ivols = implied_vol(market, F, K, T, r, is_call, scheme)
+    assert np.isfinite(ivols).all()
+    priced = price_vanilla(K, option_rows["option_type"], F, ivols, r, option_rows["option_expiry"], AS_OF_DATE, scheme)
+    np.testing.assert_allclose(priced["price"].to_numpy(), market, rtol=1e-7, atol=1e-8)
+
+
+def test_price_vanilla_leaves_missing_inputs_nan():
+    priced = price_vanilla(
+        strike=[100.0, np.nan], parity=["Call", "Put"], future_value=[100.0, 100.0], ivol=[0.3, 0.3],
+        rf_rate=[0.04, 0.04], expiry=["2026-01-20", "2026-01-20"], as_of_date=AS_OF_DATE,
+    )
+    assert np.isfinite(priced.loc[0]).all()
+    assert np.isnan(priced.loc[1, "price"])
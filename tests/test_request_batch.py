@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from api_format import call_ivol_api_and_add_to_df, transform_to_option_api_payloads
+from conftest import AS_OF_DATE
+from request_batch import CONTRACT_FIELDS, build_ivol_requests, build_price_requests
+
+
+def test_deduplicate_collapses_identical_requests(option_rows):
+    batch, rejections = build_ivol_requests(option_rows, AS_OF_DATE)
+    unique, inverse = batch.deduplicate()
+
+    assert len(rejections) == 0
+    assert len(batch) == len(option_rows)
+    # The three rows held by a second strategy are repeats of rows 0, 2 and 7
+    assert len(unique) == len(option_rows) - 3
+    np.testing.assert_array_equal(inverse[-3:], inverse[[0, 2, 7]])
+    # First-seen order
+    np.testing.assert_array_equal(inverse[:10], np.arange(10))
+
+
+def test_inverse_broadcasts_distinct_requests_back(option_rows):
+    batch, _ = build_price_requests(option_rows.assign(computed_ivol=0.3), AS_OF_DATE)
+    unique, inverse = batch.deduplicate()
+
+    for field in CONTRACT_FIELDS:
+        np.testing.assert_array_equal(unique.records[field][inverse], batch.records[field])
+    assert [unique.to_request_args()[i] for i in inverse] == batch.to_request_args()
+
+
+def test_deduplicate_empty_batch(option_rows):
+    batch, rejections = build_ivol_requests(option_rows.assign(market_price=np.nan), AS_OF_DATE)
+    unique, inverse = batch.deduplicate()
+    assert len(rejections) == len(option_rows)
+    assert len(unique) == 0 and len(inverse) == 0
+
+
+def test_rejections_report_each_problem(option_rows):
+    df = option_rows.copy()
+    df["strike"] = df["strike"].astype(object)
+    df.loc[2, "strike"] = "abc"
+    df.loc[5, ["market_price", "option_expiry"]] = [np.nan, "not a date"]
+    batch, rejections = build_ivol_requests(df, AS_OF_DATE)
+
+    assert list(batch.index) == [i for i in df.index if i not in (2, 5)]
+    assert rejections.loc[2, "reason"] == "invalid strike"
+    assert rejections.loc[5, "reason"] == "missing market_price, invalid option_expiry"
+
+
+def test_request_args_use_api_formats(option_rows):
+    batch, _ = build_ivol_requests(option_rows.iloc[[0]], AS_OF_DATE, scheme="European")
+    assert batch.to_request_args() == [{
+        "as_of_date": AS_OF_DATE,
+        "expiration_date": "2025-8-26",
+        "strike": 80.0,
+        "parity": "Call",
+        "future_value": 100.0,
+        "value": 20.5,
+        "rf_rate": 0.04,
+        "scheme": "European",
+        "model": "BSM",
+    }]
+
+
+def _solve_row_by_row(df, api_client, **kwargs):
+    rows = [call_ivol_api_and_add_to_df(df.iloc[[i]].copy(), AS_OF_DATE, client=api_client, use_cache=False, **kwargs) for i in range(len(df))]
+    return pd.concat(rows)
+
+
+def test_deduplicated_ivols_match_row_by_row(option_rows, api_client):
+    deduplicated = call_ivol_api_and_add_to_df(option_rows.copy(), AS_OF_DATE, client=api_client, use_cache=False)
+    pd.testing.assert_series_equal(deduplicated["computed_ivol"], _solve_row_by_row(option_rows, api_client)["computed_ivol"])
+
+    local = call_ivol_api_and_add_to_df(option_rows.copy(), AS_OF_DATE, backend="local")
+    row_by_row = _solve_row_by_row(option_rows, api_client, backend="local")
+    pd.testing.assert_series_equal(local["computed_ivol"], row_by_row["computed_ivol"])
+
+
+def test_deduplicated_prices_match_row_by_row(option_rows, api_client):
+    df = call_ivol_api_and_add_to_df(option_rows.copy(), AS_OF_DATE, backend="local")
+    for backend in ("local", "remote"):
+        payloads, priced = transform_to_option_api_payloads(df, AS_OF_DATE, output_csv=None, backend=backend, client=api_client, use_cache=False)
+        singles = [
+            transform_to_option_api_payloads(df.iloc[[i]], AS_OF_DATE, output_csv=None, backend=backend, client=api_client, use_cache=False)
+            for i in range(len(df))
+        ]
+        assert payloads == [p for single_payloads, _ in singles for p in single_payloads]
+        pd.testing.assert_frame_equal(priced, pd.concat([single for _, single in singles]))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import AS_OF_DATE
+from pricing_models import baw_price, baw_price_ladder, option_price, option_price_ladder, price_vanilla
+from scenarios import SCENARIO_COLUMNS, pnl_cube, run_scenarios, scenario_grid, spot_ladder
+
+
+@pytest.fixture
+def book(option_rows):
+    """
+    Priced book: option_rows with a vol per row, one row without one and position sizes.
+    """
+    book = option_rows.assign(computed_ivol=0.25 + option_rows["strike"] / 1000, quantity=np.arange(1.0, len(option_rows) + 1))
+    book.loc[6, "computed_ivol"] = np.nan
+    return book
+
+
+@pytest.fixture
+def grid():
+    return scenario_grid((-0.05, 0.0, 0.05), (-0.02, 0.03), (0.0, 0.01), (0, 7))
+
+
+def test_spot_ladder_is_symmetric_around_zero():
+    np.testing.assert_allclose(spot_ladder(0.02, 0.01), [-0.02, -0.01, 0.0, 0.01, 0.02])
+    ladder = spot_ladder()
+    assert len(ladder) == 21 and 0.0 in ladder
+    np.testing.assert_allclose(ladder, -ladder[::-1])
+
+
+def test_scenario_grid_shape_and_labels(grid):
+    assert grid.shape == (24, 4)
+    assert list(grid.columns) == SCENARIO_COLUMNS
+    assert grid.index.name == "scenario_id" and list(grid.index) == list(range(24))
+    # spot_shift varies slowest, time_decay_days fastest
+    assert grid["spot_shift"].tolist() == [-0.05] * 8 + [0.0] * 8 + [0.05] * 8
+    assert grid["time_decay_days"].tolist()[:4] == [0, 7, 0, 7]
+    assert len(grid.drop_duplicates()) == len(grid)
+    assert scenario_grid().to_numpy().tolist() == [[0.0, 0.0, 0.0, 0.0]]
+
+
+@pytest.mark.parametrize("scheme", ["American", "European"])
+def test_price_ladder_matches_pricing_each_level(scheme):
+    rng = np.random.default_rng(3)
+    n = 40
+    K = rng.uniform(60, 140, n)
+    T = rng.uniform(0.0, 2.0, n)
+    r = rng.uniform(0.0, 0.08, n)
+    sigma = rng.uniform(0.05, 0.8, n)
+    is_call = rng.random(n) < 0.5
+    F = 100.0 * (1.0 + spot_ladder(0.1, 0.05))[None, :] * rng.uniform(0.8, 1.2, n)[:, None]
+
+    ladder = option_price_ladder(F, K, T, r, sigma, is_call, scheme=scheme)
+    assert ladder.shape == F.shape
+    for level in range(F.shape[1]):
+        np.testing.assert_allclose(ladder[:, level], option_price(F[:, level], K, T, r, sigma, is_call, scheme=scheme), rtol=1e-10)
+    if scheme == "American":
+        for level in range(F.shape[1]):
+            np.testing.assert_allclose(baw_price_ladder(F, K, T, r, sigma, is_call)[:, level], baw_price(F[:, level], K, T, r, sigma, is_call), rtol=1e-10)
+
+
+def _repriced_pnl(book, scenario, base_prices, quantity_column):
+    """
+    Per-strategy PnL of one scenario by pricing every row on its own with price_vanilla.
+    """
+    spot, vol, rate, decay = (scenario[c] for c in SCENARIO_COLUMNS)
+    as_of = (pd.Timestamp(AS_OF_DATE) + pd.Timedelta(days=decay)).strftime("%Y-%m-%d")
+    prices = price_vanilla(
+        book["strike"], book["option_type"], book["future_value"] * (1 + spot), book["computed_ivol"] + vol,
+        book["rf_rate"] + rate, book["option_expiry"], as_of_date=as_of,
+    )["price"].to_numpy()
+    weights = book[quantity_column].to_numpy() if quantity_column else 1.0
+    return pd.Series((prices - base_prices) * weights, index=book["strategy_id"]).groupby(level=0).sum()
+
+
+@pytest.mark.parametrize("quantity_column", [None, "quantity"])
+def test_run_scenarios_matches_pricing_each_scenario(book, grid, quantity_column):
+    pnl = run_scenarios(book, grid, as_of_date=AS_OF_DATE, quantity_column=quantity_column, workers=1)
+    assert pnl.shape == (2, len(grid))
+    assert list(pnl.index) == ["124", "143"] and pnl.index.name == "strategy_id"
+    assert list(pnl.columns) == list(grid.index)
+
+    # The row without a vol is rejected; decay days roll the valuation date forward
+    priced = book.drop(index=6)
+    base = price_vanilla(
+        priced["strike"], priced["option_type"], priced["future_value"], priced["computed_ivol"],
+        priced["rf_rate"], priced["option_expiry"], as_of_date=AS_OF_DATE,
+    )["price"].to_numpy()
+    for scenario_id, scenario in grid.iterrows():
+        expected = _repriced_pnl(priced, scenario, base, quantity_column)
+        np.testing.assert_allclose(pnl[scenario_id].to_numpy(), expected.loc[pnl.index].to_numpy(), rtol=1e-8, atol=1e-10)
+
+
+def test_blocked_and_parallel_runs_match_single_block(book, grid):
+    single = run_scenarios(book, grid, as_of_date=AS_OF_DATE, workers=1)
+    blocked = run_scenarios(book, grid, as_of_date=AS_OF_DATE, workers=1, chunk_elements=7)
+    parallel = run_scenarios(book, grid, as_of_date=AS_OF_DATE, workers=2, chunk_elements=50)
+    pd.testing.assert_frame_equal(blocked, single)
+    pd.testing.assert_frame_equal(parallel, single)
+
+
+def test_pnl_cube_axes_follow_the_grid(book, grid):
+    pnl = run_scenarios(book, grid, as_of_date=AS_OF_DATE, workers=1)
+    cube, axes = pnl_cube(pnl, grid)
+
+    assert cube.shape == (2, 3, 2, 2, 2)
+    assert list(axes) == ["strategy_id"] + SCENARIO_COLUMNS
+    assert axes["strategy_id"].tolist() == ["124", "143"]
+    assert axes["vol_shift"].tolist() == [-0.02, 0.03]
+    for scenario_id, scenario in grid.iterrows():
+        at = tuple(list(axes[c]).index(scenario[c]) for c in SCENARIO_COLUMNS)
+        np.testing.assert_array_equal(cube[(slice(None),) + at], pnl[scenario_id].to_numpy())
+
+    with pytest.raises(ValueError):
+        pnl_cube(pnl.drop(columns=[3]), grid.drop(index=3))
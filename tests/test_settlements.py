@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+import crate_download
+from crate_download import fetch_settlements_for_symbols
+
+TRADE_DATE = "2025-07-21"
+
+
+@pytest.fixture
+def crate(monkeypatch):
+    """
+    In-memory SQLite stand-in for CrateDB with a settles."values" table; records every executed statement.
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ATTACH DATABASE ':memory:' AS settles")
+        connection.exec_driver_sql(
+            'CREATE TABLE settles."values" (instrument_key TEXT, source TEXT, date TEXT, field TEXT, label TEXT, value REAL)'
+        )
+        rows = [
+            ("B 202509 P70", "ICE", TRADE_DATE, "Price", "Settlement", 1.5),
+            ("B 202509 C80", "ICE", TRADE_DATE, "Price", "Settlement", 0.7),
+            ("B 202509 C90", "ICE", TRADE_DATE, "Price", "Settlement", 0.2),
+            ("B 202509 P70", "ICE", "2025-07-18", "Price", "Settlement", 1.9),
+            ("B 202509 P70", "ICE", TRADE_DATE, "Volume", "Settlement", 100.0),
+            ("B 202509 P70", "EEX", TRADE_DATE, "Price", "Settlement", 1.6),
+            ("TFO 202509 P25", "EEX", TRADE_DATE, "Price", "Settlement", 0.9),
+        ]
+        connection.exec_driver_sql('INSERT INTO settles."values" VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, parameters, *args: statements.append(parameters))
+    monkeypatch.setattr(crate_download, "connect_crate_db", lambda: engine)
+    engine.statements = statements
+    return engine
+
+
+def test_settlements_are_fetched_per_source_in_bound_chunks(crate, monkeypatch):
+    monkeypatch.setattr(crate_download, "SETTLEMENT_QUERY_CHUNK", 2)
+    positions = pd.DataFrame({
+        "opt_symbol_code": ["B 202509 P70", "B 202509 C80", "B 202509 P70", "B 202509 C90", "B 202509 P70", "TFO 202509 P25", "TFO 202509 C30", None],
+        "source": ["ICE", "ICE", "ICE", "ICE", "EEX", "EEX", "EEX", "ICE"],
+    })
+    result = fetch_settlements_for_symbols(positions, trade_date=TRADE_DATE, persist=False)
+
+    # ICE: 3 distinct keys in chunks of 2; EEX: 3 keys in chunks of 2
+    assert len(crate.statements) == 4
+    # Every key is a bound parameter of an expanded IN list, plus source and trade_date
+    assert sorted(len(params) for params in crate.statements) == [3, 3, 4, 4]
+    assert all(TRADE_DATE in params for params in crate.statements)
+
+    settled = result.set_index(["opt_symbol_code", "source"])["value"].sort_index()
+    assert settled.to_dict() == {
+        ("B 202509 C80", "ICE"): 0.7,
+        ("B 202509 C90", "ICE"): 0.2,
+        ("B 202509 P70", "EEX"): 1.6,
+        ("B 202509 P70", "ICE"): 1.5,
+        ("TFO 202509 P25", "EEX"): 0.9,
+    }
+
+
+def test_keys_with_quotes_are_bound_not_interpolated(crate):
+    positions = pd.DataFrame({"opt_symbol_code": ["B 202509 P70", "X' OR '1'='1"], "source": ["ICE", "ICE"]})
+    result = fetch_settlements_for_symbols(positions, trade_date=TRADE_DATE, persist=False)
+    assert result["opt_symbol_code"].tolist() == ["B 202509 P70"]
+
+
+def test_missing_columns_raise(crate):
+    with pytest.raises(ValueError):
+        fetch_settlements_for_symbols(pd.DataFrame({"opt_symbol_code": ["B 202509 P70"]}), persist=False)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from position_frame import as_position_frame
+from storage import read_stage, stage_exists, write_stage
+
+VALUATION_DATE = "2025-07-21"
+
+
+@pytest.fixture
+def positions():
+    return as_position_frame(pd.DataFrame({
+        "strategy_id": ["0743", "124", "0743", "0010"],
+        "exposure": ["Brent", "Brent", "Gasoil", "Brent"],
+        "option_type": ["Call", "Put", "Put", "Call"],
+        "instrument_type": ["Option"] * 4,
+        "strike": [70.0, 72.5, 650.0, 80.0],
+        "market_price": [1.25, np.nan, 12.0, 0.5],
+        "future_value": [71.0, 71.0, 640.0, 71.0],
+        "rf_rate": [0.04] * 4,
+        "end_date": ["2025-09-30", "2025-09-30", "2025-10-31", None],
+        "quantity": np.array([1, -2, 3, 4], dtype=np.int64),
+    }))
+
+
+def _sorted(df):
+    return df.sort_values(["strategy_id", "strike"]).reset_index(drop=True)
+
+
+def test_round_trip_keeps_values_and_dtypes(positions, tmp_path):
+    write_stage(positions, "positions", VALUATION_DATE, root=str(tmp_path))
+    loaded = _sorted(read_stage("positions", VALUATION_DATE, root=str(tmp_path)))
+    expected = _sorted(positions.assign(valuation_date=VALUATION_DATE))
+
+    # strategy_id is a partition column: its labels, leading zeros included, come back as strings
+    assert loaded["strategy_id"].astype(str).tolist() == expected["strategy_id"].astype(str).tolist()
+    assert set(loaded["strategy_id"].astype(str)) == {"0743", "124", "0010"}
+    for column in ("strike", "market_price", "future_value", "rf_rate", "quantity", "end_date"):
+        assert loaded[column].dtype == expected[column].dtype, column
+        pd.testing.assert_series_equal(loaded[column], expected[column], check_names=False)
+    for column in ("exposure", "option_type", "instrument_type"):
+        assert isinstance(loaded[column].dtype, pd.CategoricalDtype), column
+        assert loaded[column].astype(str).tolist() == expected[column].astype(str).tolist()
+    assert (loaded["valuation_date"] == VALUATION_DATE).all()
+
+
+def test_partition_values_are_read_as_strings(positions, tmp_path):
+    write_stage(positions, "positions", VALUATION_DATE, root=str(tmp_path))
+    write_stage(positions, "positions", "2025-07-22", root=str(tmp_path))
+
+    every_date = read_stage("positions", root=str(tmp_path))
+    assert sorted(every_date["valuation_date"].astype(str).unique()) == [VALUATION_DATE, "2025-07-22"]
+    assert "0743" in set(every_date["strategy_id"].astype(str))
+
+    pruned = read_stage("positions", VALUATION_DATE, columns=["strategy_id", "strike"], filters=[("strategy_id", "in", ["0743"])], root=str(tmp_path))
+    assert sorted(pruned["strike"]) == [70.0, 650.0]
+    assert list(pruned.columns) == ["strategy_id", "strike"]
+
+
+def test_frame_without_strategy_id_round_trips(tmp_path):
+    df = pd.DataFrame({"code": ["0743", "0010"], "value": [1.0, 2.0]})
+    write_stage(df, "settlements", VALUATION_DATE, root=str(tmp_path))
+    loaded = read_stage("settlements", VALUATION_DATE, root=str(tmp_path))
+    assert loaded["code"].tolist() == ["0743", "0010"]
+    assert loaded["valuation_date"].tolist() == [VALUATION_DATE] * 2
+
+
+def test_rewrite_replaces_and_append_adds(positions, tmp_path):
+    write_stage(positions, "priced", VALUATION_DATE, root=str(tmp_path))
+    write_stage(positions.head(1), "priced", VALUATION_DATE, root=str(tmp_path))
+    assert len(read_stage("priced", VALUATION_DATE, root=str(tmp_path))) == 1
+
+    write_stage(positions.tail(2), "priced", VALUATION_DATE, root=str(tmp_path), append=True)
+    assert len(read_stage("priced", VALUATION_DATE, root=str(tmp_path))) == 3
+    assert stage_exists("priced", VALUATION_DATE, root=str(tmp_path))
+    assert not stage_exists("priced", "2025-07-22", root=str(tmp_path))
+
+
+def test_appended_categoricals_with_many_categories(tmp_path):
+    # pandas picks int8 codes up to 127 categories and int16 above; appends must still read back as one dataset
+    small = pd.DataFrame({"strategy_id": ["1", "2"], "label": pd.Categorical(["a", "b"])})
+    labels = [f"label-{i}" for i in range(200)]
+    large = pd.DataFrame({"strategy_id": ["1"] * 200, "label": pd.Categorical(labels)})
+    write_stage(small, "chunks", VALUATION_DATE, root=str(tmp_path))
+    write_stage(large, "chunks", VALUATION_DATE, root=str(tmp_path), append=True)
+
+    loaded = read_stage("chunks", VALUATION_DATE, root=str(tmp_path))
+    assert len(loaded) == 202
+    assert sorted(loaded["label"].astype(str)) == sorted(["a", "b"] + labels)
+
+
+def test_missing_stage_reads_empty(tmp_path):
+    loaded = read_stage("never_written", VALUATION_DATE, columns=["strike"], root=str(tmp_path))
+    assert loaded.empty and list(loaded.columns) == ["strike"]
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import symbol_keys
+from symbol_keys import OptSymbolIndex, format_strikes, opt_symbol_codes
+
+
+def test_format_strikes_drops_trailing_zeros():
+    formatted = format_strikes([25.0, 10.05, 0.5, 100.125, 1e-5, -2.5, np.nan])
+    assert formatted[:6].tolist() == ["25", "10.05", "0.5", "100.125", "0", "-2.5"]
+    assert pd.isna(formatted[6])
+
+
+def test_format_strikes_snaps_float_noise_to_ticks():
+    noisy = [68.43000000001, 68.42999999999, 0.1 + 0.2, 1234.5678]
+    assert format_strikes(noisy).tolist() == ["68.43", "68.43", "0.3", "1234.5678"]
+    assert format_strikes(noisy, decimals=2).tolist() == ["68.43", "68.43", "0.3", "1234.57"]
+    assert format_strikes([2.4, 99.99], decimals=0).tolist() == ["2", "100"]
+
+
+def test_codes_use_root_and_exchange_tick_precision(monkeypatch):
+    monkeypatch.setitem(symbol_keys.STRIKE_DECIMALS_BY_ROOT, "TFO", 3)
+    codes = opt_symbol_codes(
+        roots=["B", "B", "TFO", "XYZ"],
+        ym_keys=[202508, 202508, 202508, 202508],
+        option_types=["Put", "call", "Put", "Call"],
+        strikes=[70.125, 70.125, 25.1256, 1.23456],
+        exchanges=["ICE", "ICE", "ICE", None],
+    )
+    # ICE strikes at 2 decimals, TFO's root entry wins over ICE, others at the default 4
+    assert codes.tolist() == ["B 202508 P70.12", "B 202508 C70.12", "TFO 202508 P25.126", "XYZ 202508 C1.2346"]
+
+
+def test_codes_normalize_components_and_flag_missing():
+    codes = opt_symbol_codes(
+        roots=[" TFO", "TFO", None, "TFO", "TFO"],
+        ym_keys=[202508, "202508", 202508, None, 202508],
+        option_types=["put", "Put ", "Put", "Put", None],
+        strikes=[25.0, 25.00000001, 25.0, 25.0, 25.0],
+    )
+    assert codes.tolist()[:2] == ["TFO 202508 P25", "TFO 202508 P25"]
+    assert codes[2:].isna().all()
+
+
+def test_vectorized_codes_match_row_by_row_formatting():
+    rng = np.random.default_rng(5)
+    n = 500
+    roots = rng.choice(["B", "T", "G", "TFO"], n)
+    ym_keys = rng.choice([202508, 202509, 202612], n)
+    option_types = rng.choice(["Put", "Call", "P", "c"], n)
+    strikes = np.round(rng.uniform(0.5, 150, n), 4) + rng.normal(0, 1e-9, n)
+
+    codes = opt_symbol_codes(roots, ym_keys, option_types, strikes)
+    expected = [
+        f"{root} {ym} {option_type[0].upper()}{format_strikes([strike])[0]}"
+        for root, ym, option_type, strike in zip(roots, ym_keys, option_types, strikes)
+    ]
+    assert codes.tolist() == expected
+
+
+def test_index_decodes_and_joins_settlements():
+    positions = pd.DataFrame({
+        "crate_ticks": ["B", "B", "TFO", "B"],
+        "ym_key": [202508, 202508, 202509, 202508],
+        "option_type": ["Put", "Put", "Call", "Call"],
+        "strike": [70.0, 70.0, 25.5, np.nan],
+        "exchange": ["ICE", "ICE", "EEX", "ICE"],
+        "strategy_id": ["1", "2", "3", "4"],
+    })
+    index = OptSymbolIndex.from_frame(positions)
+    assert len(index) == 2
+    np.testing.assert_array_equal(index.row_ids, [0, 0, 1, -1])
+
+    decoded = index.decode(["TFO 202509 C25.5", "unknown"])
+    assert decoded.loc[0, ["root", "ym_key", "parity"]].tolist() == ["TFO", 202509, "C"]
+    assert decoded.loc[0, "strike"] == pytest.approx(25.5)
+    assert decoded.loc[1].isna().all()
+
+    settlements = pd.DataFrame({"opt_symbol_code": ["B 202508 P70", "TFO 202509 C25.5", "G 202508 P1"], "settlement": [1.5, 0.7, 9.9]})
+    joined = index.join(positions, settlements)
+    assert joined["strategy_id"].tolist() == ["1", "2", "3"]
+    assert joined["settlement"].tolist() == [1.5, 1.5, 0.7]
+
+
+def test_same_contract_across_exchanges_has_one_key():
+    positions = pd.DataFrame({
+        "crate_ticks": ["B", "B", "B"],
+        "ym_key": [202510, 202510, 202510],
+        "option_type": ["Put", "Put", "Put"],
+        "strike": [25.0, 25.0, 25.0],
+        "exchange": ["ICE", "OTHER", None],
+        "strategy_id": ["1", "2", "3"],
+    })
+    index = OptSymbolIndex.from_frame(positions)
+    assert list(index.codes) == ["B 202510 P25"]
+    np.testing.assert_array_equal(index.row_ids, [0, 0, 0])
+    np.testing.assert_array_equal(index.key_ids(["B 202510 P25", "B 202510 C25"]), [0, -1])
+
+    joined = index.join(positions, pd.DataFrame({"opt_symbol_code": ["B 202510 P25"], "settlement": [0.8]}))
+    assert joined["strategy_id"].tolist() == ["1", "2", "3"]
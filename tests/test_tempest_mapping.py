@@ -0,0 +1,101 @@
+import re
+import threading
+
+import pandas as pd
+import pytest
+
+import tempest_mapping
+from tempest_mapping import _symbols_pattern, fetch_expiry_data_with_exchange
+
+LISTINGS = {
+    "B": [("B 202509", "2025-09-30", "2025-08-26"), ("B 202510", "2025-10-31", "2025-09-25")],
+    "TFO": [("TFO 202509", "2025-09-29", "2025-08-27")],
+    "LO": [("CL 202509", "2025-09-22", "2025-08-15")],
+    "ON": [],
+    "OG": [("GC 202512", "2025-12-29", "2025-11-24")],
+}
+
+
+class ChunkQuery:
+    """
+    Stand-in for _fetch_expiry_chunk: listings of the requested symbols; fails the chunks containing fail.
+    """
+
+    def __init__(self, fail=()):
+        self.chunks = []
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, symbols, start_date, end_date):
+        with self._lock:
+            self.chunks.append(list(symbols))
+        if self.fail & set(symbols):
+            raise RuntimeError("query failed")
+        rows = [(symbol,) + listing for symbol in symbols for listing in LISTINGS.get(symbol, [])]
+        return pd.DataFrame(rows, columns=["opt_symbol", "future_key", "future_expiry", "option_expiry"])
+
+
+@pytest.fixture
+def roots():
+    return pd.DataFrame({
+        "opt_symbol": ["B", "B", "TFO", "LO", "ON", "OG"],
+        "exchange": ["ICE", "IFEU", "EEX", "NYMEX", "ICE", "CMX"],
+        "scheme": ["American"] * 6,
+        "tempest_code": ["BRN", "BRN", "EUA", "CL", "NG", "GC"],
+        "commodity_code": ["OIL", "OIL", "EMS", "OIL", "GAS", "MET"],
+    })
+
+
+@pytest.fixture
+def fetch(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tempest_mapping, "connect_crate_db", lambda: None)
+    monkeypatch.setattr(tempest_mapping, "EXPIRY_QUERY_CHUNK", 2)
+
+    def fetch(roots, query):
+        monkeypatch.setattr(tempest_mapping, "_fetch_expiry_chunk", query)
+        return fetch_expiry_data_with_exchange(roots)
+
+    return fetch
+
+
+def test_symbols_pattern_matches_put_keys_of_listed_roots_only():
+    pattern = re.compile(_symbols_pattern(["B", "C.5"]))
+    assert pattern.fullmatch("B 202509 P70")
+    assert pattern.fullmatch("C.5 202509 P1.5")
+    assert not pattern.fullmatch("B 202509 C70")
+    assert not pattern.fullmatch("CX5 202509 P1")
+    # Longer roots ending in a listed one still match; fetches drop them by exact root
+    assert pattern.search("XB 202509 P70")
+
+
+def test_chunks_are_merged_with_every_exchange_of_a_root(roots, fetch, tmp_path):
+    query = ChunkQuery()
+    combined = fetch(roots, query)
+
+    assert sorted(map(sorted, query.chunks)) == [["B", "TFO"], ["LO", "ON"], ["OG"]]
+    assert list(combined.columns) == [
+        "opt_symbol", "future_key", "future_expiry", "option_expiry", "scheme", "tempest_code", "commodity_code", "exchange",
+    ]
+    # B has two exchanges and two listings; ON has no listings
+    assert len(combined) == 2 * 2 + 1 + 1 + 1
+    assert set(combined.loc[combined["opt_symbol"] == "B", "exchange"]) == {"ICE", "IFEU"}
+    assert combined.loc[combined["opt_symbol"] == "LO", "tempest_code"].tolist() == ["CL"]
+    assert combined["option_expiry"].is_monotonic_increasing
+    assert len(list(tmp_path.glob("expiry_data_output_*.csv"))) == 1
+
+
+def test_failed_chunk_is_skipped(roots, fetch):
+    combined = fetch(roots, ChunkQuery(fail={"LO"}))
+    assert set(combined["opt_symbol"]) == {"B", "TFO", "OG"}
+
+
+def test_no_listings_returns_empty_frame_with_columns(roots, fetch):
+    combined = fetch(roots[roots["opt_symbol"] == "ON"], ChunkQuery())
+    assert combined.empty
+    assert "tempest_code" in combined.columns
+
+
+def test_input_needs_symbol_and_exchange(fetch):
+    with pytest.raises(ValueError):
+        fetch(pd.DataFrame({"opt_symbol": ["B"]}), ChunkQuery())
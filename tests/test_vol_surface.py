@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from vol_surface import VolSurface, load_surface, row_signatures, solve_with_surface, surface_path
+
+VALUATION_DATE = "2025-07-21"
+
+
+@pytest.fixture
+def smile_rows():
+    strikes = [80.0, 90.0, 100.0, 110.0, 120.0]
+    return pd.DataFrame({
+        "symbol": ["B"] * 5 + ["G"] * 2,
+        "ym_key": [202509] * 5 + [202512] * 2,
+        "strike": strikes + [100.0, 100.0],
+        "option_type": ["Call"] * 7,
+        "future_value": [100.0] * 7,
+        "market_price": [20.0, 11.0, 4.0, 1.0, 0.2, 5.0, 5.0],
+        "rf_rate": [0.04] * 7,
+        "option_expiry": ["2025-08-26"] * 5 + ["2025-11-25"] * 2,
+    })
+
+
+class Solver:
+    """
+    IV solve stand-in: vol 0.2 + strike / 1000 for every row with a market price.
+    """
+
+    def __init__(self, fail=()):
+        self.seen = []
+        self.fail = set(fail)
+
+    def __call__(self, rows):
+        self.seen.append(list(rows.index))
+        ivols = 0.2 + rows["strike"] / 1000
+        return rows.assign(computed_ivol=ivols.where(~rows.index.isin(self.fail)))
+
+
+def test_interpolates_linearly_in_moneyness_with_flat_wings(smile_rows):
+    surface = VolSurface.from_rows(smile_rows.assign(computed_ivol=0.2 + smile_rows["strike"] / 1000))
+    query = pd.DataFrame({
+        "symbol": ["B", "B", "B", "B", "G", "X"],
+        "ym_key": [202509, 202509, 202509, 202509, 202512, 202509],
+        "strike": [100.0, 95.0, 50.0, 200.0, 100.0, 100.0],
+        "future_value": [100.0] * 6,
+    })
+    x = np.log(np.array([90.0, 95.0, 100.0]) / 100.0)
+    expected_95 = np.interp(x[1], [x[0], x[2]], [0.29, 0.3])
+
+    result = surface.interpolate(query)
+    np.testing.assert_allclose(result[:4], [0.3, expected_95, 0.28, 0.32])
+    # G has one distinct moneyness (below MIN_SMILE_POINTS); X has no smile
+    assert np.isnan(result[4:]).all()
+
+
+def test_points_at_same_moneyness_are_averaged(smile_rows):
+    rows = smile_rows.assign(computed_ivol=[0.3, 0.3, 0.3, 0.3, 0.3, 0.2, 0.4])
+    x, iv = VolSurface.from_rows(rows).smile("G", 202512)
+    np.testing.assert_allclose(x, [0.0])
+    np.testing.assert_allclose(iv, [0.3])
+    assert VolSurface.from_rows(rows).smile("G", 202601)[0].size == 0
+
+
+def test_save_load_round_trip(smile_rows, tmp_path):
+    surface = VolSurface.from_rows(smile_rows.assign(computed_ivol=0.25))
+    path = str(tmp_path / "surface.npz")
+    surface.save(path)
+    loaded = VolSurface.load(path)
+
+    assert len(loaded) == len(surface)
+    np.testing.assert_array_equal(loaded.offsets, surface.offsets)
+    np.testing.assert_allclose(loaded.cached_ivols(row_signatures(smile_rows)), np.full(len(smile_rows), 0.25))
+    np.testing.assert_allclose(loaded.interpolate(smile_rows), surface.interpolate(smile_rows))
+
+
+def test_row_signatures_track_iv_inputs_only(smile_rows):
+    base = row_signatures(smile_rows)
+    assert (row_signatures(smile_rows.assign(strategy_id="x")) == base).all()
+    moved = row_signatures(smile_rows.assign(market_price=smile_rows["market_price"] + 0.01))
+    assert (moved != base).all()
+
+
+def test_second_run_reuses_cached_vols(smile_rows, tmp_path):
+    first = solve_with_surface(smile_rows, VALUATION_DATE, Solver(), root=str(tmp_path))
+    assert (first["ivol_source"] == "solved").all()
+
+    moved = smile_rows.copy()
+    moved.loc[2, "market_price"] = 4.2
+    solver = Solver()
+    second = solve_with_surface(moved, VALUATION_DATE, solver, root=str(tmp_path))
+
+    assert solver.seen == [[2]]
+    assert second["ivol_source"].tolist() == ["cached", "cached", "solved", "cached", "cached", "cached", "cached"]
+    np.testing.assert_allclose(second["computed_ivol"], first["computed_ivol"])
+
+
+def test_stale_and_unpriced_rows_are_interpolated_failed_solves_stay_nan(smile_rows, tmp_path):
+    df = smile_rows.copy()
+    df.loc[3, "market_price"] = np.nan
+    stale = np.zeros(len(df), dtype=bool)
+    stale[1] = True
+    solver = Solver(fail={2})
+    result = solve_with_surface(df, VALUATION_DATE, solver, stale=stale, root=str(tmp_path))
+
+    assert solver.seen == [[0, 2, 4, 5, 6]]
+    assert result["ivol_source"].fillna("none").tolist()[:5] == ["solved", "interpolated", "none", "interpolated", "solved"]
+    assert np.isnan(result.loc[2, "computed_ivol"])
+    # Interpolated between the solved 80 and 120 strikes in log-moneyness
+    x = np.log(np.array([80.0, 90.0, 100.0, 110.0, 120.0]) / 100.0)
+    expected = np.interp(x, x[[0, 4]], [0.28, 0.32])
+    np.testing.assert_allclose(result["computed_ivol"].to_numpy()[[0, 1, 3, 4]], expected[[0, 1, 3, 4]])
+
+
+def test_surfaces_are_kept_per_scheme_model_and_backend(smile_rows, tmp_path):
+    solve_with_surface(smile_rows, VALUATION_DATE, Solver(), root=str(tmp_path), backend="local")
+    assert os.path.exists(surface_path(VALUATION_DATE, str(tmp_path), backend="local"))
+    assert load_surface(VALUATION_DATE, str(tmp_path)) is None
+
+    for variant in ({"backend": "remote"}, {"scheme": "European", "backend": "local"}):
+        solver = Solver()
+        solve_with_surface(smile_rows, VALUATION_DATE, solver, root=str(tmp_path), **variant)
+        assert solver.seen == [list(smile_rows.index)]
+
+    solver = Solver()
+    solve_with_surface(smile_rows, VALUATION_DATE, solver, root=str(tmp_path), backend="local")
+    assert solver.seen == []
@@ -0,0 +1,220 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from storage import STORAGE_ROOT
+
+logger = logging.getLogger(__name__)
+
+
+SURFACE_ROOT = os.path.join(STORAGE_ROOT, "_surfaces")
+# Smiles with fewer distinct strikes are not used for interpolation
+MIN_SMILE_POINTS = 2
+# Inputs of the IV solve; a row with the same values reuses the cached vol
+SIGNATURE_COLUMNS = ["symbol", "ym_key", "strike", "option_type", "future_value", "market_price", "rf_rate", "option_expiry"]
+IVOL_SOURCES = ("solved", "cached", "interpolated")
+
+
+def _moneyness(df):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(df["strike"].to_numpy(dtype=float) / df["future_value"].to_numpy(dtype=float))
+
+
+def _ym_keys(df):
+    ym = pd.to_numeric(df["ym_key"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return np.where(np.isnan(ym), -1, ym).astype(np.int64)
+
+
+def row_signatures(df):
+    """
+    uint64 hash of the IV inputs of every row (SIGNATURE_COLUMNS present in df).
+    """
+    columns = [c for c in SIGNATURE_COLUMNS if c in df.columns]
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+class VolSurface:
+    """
+    Implied vol smiles per (symbol, ym_key), in log-moneyness ln(K/F).
+
+    Stored array-backed: the smile keys sorted by (symbol, ym_key), an offsets
+    array into one x/iv pair of arrays sorted by key then moneyness (smile i is
+    x[offsets[i]:offsets[i + 1]]), and the input signature -> vol table of the
+    rows the smiles were built from. Interpolation is linear in moneyness with
+    flat wings.
+    """
+
+    def __init__(self, symbols, ym_keys, offsets, x, iv, signatures, signature_iv):
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.ym_keys = np.asarray(ym_keys, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.x = np.asarray(x, dtype=float)
+        self.iv = np.asarray(iv, dtype=float)
+        self.signatures = pd.Index(np.asarray(signatures, dtype=np.uint64))
+        self.signature_iv = np.asarray(signature_iv, dtype=float)
+        self._keys = pd.MultiIndex.from_arrays([self.symbols, self.ym_keys])
+
+    @classmethod
+    def from_rows(cls, df, ivol_column="computed_ivol", signatures=None):
+        """
+        Build smiles from rows with symbol, ym_key, strike, future_value and a solved vol.
+        Points at the same moneyness are averaged.
+        """
+        signatures = row_signatures(df) if signatures is None else np.asarray(signatures)
+        iv = df[ivol_column].to_numpy(dtype=float, na_value=np.nan)
+        x = _moneyness(df)
+        ym = _ym_keys(df)
+        ok = np.isfinite(iv) & (iv > 0) & np.isfinite(x) & (ym >= 0) & df["symbol"].notna().to_numpy()
+
+        points = (
+            pd.DataFrame({"symbol": df["symbol"].to_numpy(dtype=object)[ok], "ym_key": ym[ok], "x": x[ok].round(10), "iv": iv[ok]})
+            .groupby(["symbol", "ym_key", "x"], sort=True)["iv"].mean()
+            .reset_index()
+        )
+        sizes = points.groupby(["symbol", "ym_key"], sort=True).size()
+        table = pd.DataFrame({"signature": signatures[ok], "iv": iv[ok]}).drop_duplicates("signature")
+        return cls(
+            sizes.index.get_level_values("symbol"),
+            sizes.index.get_level_values("ym_key"),
+            np.concatenate([[0], np.cumsum(sizes.to_numpy())]),
+            points["x"].to_numpy(),
+            points["iv"].to_numpy(),
+            table["signature"].to_numpy(),
+            table["iv"].to_numpy(),
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def smile(self, symbol, ym_key):
+        """
+        (moneyness, iv) arrays of one smile; empty arrays when there is none.
+        """
+        i = self._keys.get_indexer([(symbol, int(ym_key))])[0]
+        if i < 0:
+            return np.empty(0), np.empty(0)
+        return self.x[self.offsets[i]:self.offsets[i + 1]], self.iv[self.offsets[i]:self.offsets[i + 1]]
+
+    def cached_ivols(self, signatures):
+        """
+        Vol of every row whose IV inputs match a row the surface was built from; NaN otherwise.
+        """
+        positions = self.signatures.get_indexer(pd.Index(np.asarray(signatures, dtype=np.uint64)))
+        return np.where(positions >= 0, self.signature_iv[positions] if len(self.signature_iv) else np.nan, np.nan)
+
+    def interpolate(self, df):
+        """
+        Vol per row from its (symbol, ym_key) smile at the row's moneyness; NaN
+        where there is no smile with MIN_SMILE_POINTS points or no valid moneyness.
+        """
+        result = np.full(len(df), np.nan)
+        if not len(self) or not len(df):
+            return result
+        smile_ids = self._keys.get_indexer(pd.MultiIndex.from_arrays([df["symbol"].to_numpy(dtype=object), _ym_keys(df)]))
+        x = _moneyness(df)
+        usable = np.flatnonzero((smile_ids >= 0) & np.isfinite(x))
+        for smile_id, rows in pd.Series(usable).groupby(smile_ids[usable]).indices.items():
+            start, end = self.offsets[smile_id], self.offsets[smile_id + 1]
+            if end - start < MIN_SMILE_POINTS:
+                continue
+            rows = usable[rows]
+            result[rows] = np.interp(x[rows], self.x[start:end], self.iv[start:end])
+        return result
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                symbols=self.symbols.astype(str),
+                ym_keys=self.ym_keys,
+                offsets=self.offsets,
+                x=self.x,
+                iv=self.iv,
+                signatures=self.signatures.to_numpy(dtype=np.uint64),
+                signature_iv=self.signature_iv,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+def surface_path(valuation_date, root=SURFACE_ROOT, scheme="American", model="BSM", backend="remote"):
+    """
+    File of the surface of valuation_date solved with scheme, model and backend;
+    vols of different exercise schemes, models or solvers are never mixed.
+    """
+    return os.path.join(root, f"{valuation_date}-{scheme}-{model}-{backend}.npz")
+
+
+def load_surface(valuation_date, root=SURFACE_ROOT, scheme="American", model="BSM", backend="remote"):
+    path = surface_path(valuation_date, root, scheme, model, backend)
+    return VolSurface.load(path) if os.path.exists(path) else None
+
+
+def solve_with_surface(df, valuation_date, solve, stale=None, root=SURFACE_ROOT, scheme="American", model="BSM", backend="remote"):
+    """
+    Fill computed_ivol using the cached vol surface of valuation_date.
+
+    Rows whose IV inputs match a row of the cached surface reuse its vol; the
+    other rows with a market price go through solve (IV solve, e.g.
+    call_ivol_api_and_add_to_df). The surface is rebuilt from the reused and
+    solved vols and cached for the next run, then rows without a market price
+    or flagged stale are interpolated from their smile. Rows whose solve
+    failed keep a NaN vol, as without the surface. ivol_source records which
+    of IVOL_SOURCES each vol came from.
+
+    Parameters:
+        df (pd.DataFrame): Aligned positions with a unique index
+        solve (callable): Maps a subset of df to the same rows with computed_ivol
+        stale (array-like): Optional boolean mask of rows whose market price is
+            not trusted; they are always interpolated
+        scheme, model, backend (str): How solve computes vols; each combination
+            has its own cached surface
+
+    Returns:
+        pd.DataFrame: df with computed_ivol and ivol_source
+    """
+    signatures = row_signatures(df)
+    stale = np.zeros(len(df), dtype=bool) if stale is None else np.asarray(stale, dtype=bool)
+    previous = load_surface(valuation_date, root, scheme, model, backend)
+
+    cached = previous.cached_ivols(signatures) if previous is not None else np.full(len(df), np.nan)
+    reuse = np.isfinite(cached) & ~stale
+    has_price = df["market_price"].notna().to_numpy()
+    to_solve = ~reuse & ~stale & has_price
+
+    result = df.copy(deep=False)
+    ivols = np.where(reuse, cached, np.nan)
+    if to_solve.any():
+        solved = solve(df[to_solve])
+        ivols[result.index.get_indexer(solved.index)] = solved["computed_ivol"].to_numpy(dtype=float, na_value=np.nan)
+    source = np.where(reuse, "cached", np.where(to_solve & np.isfinite(ivols), "solved", None)).astype(object)
+
+    market = np.isin(source, ["cached", "solved"])
+    surface = VolSurface.from_rows(result[market].assign(computed_ivol=ivols[market]), signatures=signatures[market])
+    if len(surface):
+        surface.save(surface_path(valuation_date, root, scheme, model, backend))
+
+    # Only rows without a usable market price; failed solves stay NaN
+    missing = ~np.isfinite(ivols) & (stale | ~has_price)
+    if missing.any():
+        interpolated = surface.interpolate(result[missing])
+        ivols[np.flatnonzero(missing)] = interpolated
+        source[np.flatnonzero(missing)[np.isfinite(interpolated)]] = "interpolated"
+
+    counts = pd.Series(source).value_counts()
+    logger.info(
+        f"Vol surface for {valuation_date}: {len(surface)} smiles; {counts.get('cached', 0)} cached, "
+        f"{counts.get('solved', 0)} solved, {counts.get('interpolated', 0)} interpolated, "
+        f"{int((~np.isfinite(ivols)).sum())} without a vol"
+    )
+    result["computed_ivol"] = ivols
+    result["ivol_source"] = source
+    return result